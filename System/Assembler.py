@@ -0,0 +1,184 @@
+import argparse
+import os
+import struct
+from constants import instructions
+from hardware.CPU import THREE_REGISTER_OPS, TWO_REGISTER_OPS, IMMEDIATE_OPS, BRANCH_OPS
+
+OPCODES = {name: opcode for opcode, name in instructions.items()}
+PAD = 0x20 # Unused bytes of instructions and .SPACE are filled with spaces
+
+
+class AssemblerError(ValueError):
+    """ Raised for a line of assembly that can not be assembled. """
+    def __init__(self, message, line=None, source=None):
+        self.line = line
+        where = f"{source or 'line'}:{line}: " if line is not None else ""
+        super().__init__(f"{where}{message}")
+
+
+class Assembler:
+    """
+        Assembles the osX assembly of programs/ into .osx images, byte for
+        byte the same as the osx tool.
+
+        A line is an optional label, with or without a colon, then an
+        instruction or a directive, and an optional ; comment:
+            RESULT  .WORD 0           ; 4 bytes, little endian
+            CHAR    .BYTE 'a'         ; 1 byte
+            BUFFER  .SPACE 10         ; 10 bytes of spaces
+            START:  MVI R1 100        ; 32-bit immediate
+                    ADR R3 RESULT     ; address of a label
+                    STR R1 [R3]
+                    EOR R0 R1 Z       ; Z is R9, also SP FP SL SB PC
+                    BEQ START
+        Data comes first in the image, and the program starts at the first
+        instruction. Labels are offsets from the start of the image, which is
+        loaded at the loader address given with the source.
+
+        The image is a header of the byte size, the offset of the first
+        instruction and the loader address, then 6 bytes per instruction:
+        the opcode and its registers, or a 32-bit immediate after the opcode
+        (branches, SWI) or after the register (MVI, ADR).
+
+        With an optimizer, see Optimizer, the statements are optimized
+        before they are laid out.
+    """
+    num_registers = 12
+    aliases = {'SP': 6, 'FP': 7, 'SL': 8, 'Z': 9, 'SB': 10, 'PC': 11} # Registers with a name of their own
+
+    def __init__(self, optimizer=None):
+        self.optimizer = optimizer
+
+    def assemble(self, source, loader=0, filename=None):
+        """ The .osx image of the assembly source text. """
+        statements, labels = self._parse(source, filename)
+        if self.optimizer is not None:
+            statements, labels = self.optimizer.optimize(statements, labels, loader, filename)
+        offsets = [0]
+        for line, name, args in statements:
+            offsets.append(offsets[-1] + self._size(name, args, line, filename))
+        labels = {label: offsets[index] for label, index in labels.items()}
+
+        image = bytearray()
+        pc = None
+        for line, name, args in statements:
+            if name.startswith('.'):
+                image += self._directive(name, args, line, filename)
+                continue
+            if pc is None:
+                pc = len(image)
+            image += self._instruction(name, args, labels, line, filename)
+        pc = len(image) if pc is None else pc
+        return struct.pack('III', len(image), pc, loader) + bytes(image)
+
+    def assemble_file(self, filepath, loader=0, output=None):
+        """ Assemble filepath to output, by default the same path with .osx, and return the output path. """
+        with open(filepath) as f:
+            image = self.assemble(f.read(), loader, filepath)
+        output = output or os.path.splitext(filepath)[0] + '.osx'
+        with open(output, 'wb') as f:
+            f.write(image)
+        return output
+
+    def _parse(self, source, filename):
+        """ The (line, mnemonic, arguments) of every statement, and the index of the statement of every label. """
+        statements = []
+        labels = {}
+        pending = [] # Labels on lines of their own, waiting for the next statement
+        for number, text in enumerate(source.splitlines(), 1):
+            tokens = text.split(';', 1)[0].split()
+            if not tokens:
+                continue
+            first = tokens[0]
+            if first.endswith(':') or (first.upper() not in OPCODES and not first.startswith('.')):
+                pending.append(first.rstrip(':'))
+                tokens = tokens[1:]
+                if not tokens:
+                    continue
+            name, args = tokens[0].upper(), tokens[1:]
+            if name not in OPCODES and name not in ('.WORD', '.BYTE', '.SPACE'):
+                raise AssemblerError(f"Unknown instruction {tokens[0]}", number, filename)
+            for label in pending:
+                if label in labels:
+                    raise AssemblerError(f"Label {label} is defined twice", number, filename)
+                labels[label] = len(statements)
+            pending = []
+            statements.append((number, name, args))
+        return statements, labels
+
+    def _size(self, name, args, line, filename):
+        if name == '.WORD':
+            return 4
+        if name == '.BYTE':
+            return 1
+        if name == '.SPACE':
+            return self._number(self._arg(args, 0, name, line, filename), line, filename)
+        return 6
+
+    def _directive(self, name, args, line, filename):
+        value = self._arg(args, 0, name, line, filename)
+        if name == '.SPACE':
+            return bytes([PAD]) * self._number(value, line, filename)
+        if name == '.BYTE':
+            return bytes([self._number(value, line, filename) & 0xFF])
+        return struct.pack('<I', self._number(value, line, filename) & 0xFFFFFFFF)
+
+    def _instruction(self, name, args, labels, line, filename):
+        opcode = OPCODES[name]
+        if name in IMMEDIATE_OPS:
+            register = self._register(self._arg(args, 0, name, line, filename), line, filename)
+            value = self._value(self._arg(args, 1, name, line, filename), labels, line, filename)
+            return struct.pack('<BBI', opcode, register, value)
+        if name in BRANCH_OPS or name == 'SWI':
+            value = self._value(self._arg(args, 0, name, line, filename), labels, line, filename)
+            return struct.pack('<BIB', opcode, value, PAD)
+
+        # Register operands, as many as are written (EOR R0 R1 Z), and at least as many as the CPU reads
+        needed = 3 if name in THREE_REGISTER_OPS else 2 if name in TWO_REGISTER_OPS else 1
+        self._arg(args, needed - 1, name, line, filename)
+        if len(args) > 3:
+            raise AssemblerError(f"{name} has too many operands", line, filename)
+        registers = [self._register(arg, line, filename) for arg in args]
+        return bytes([opcode, *registers]).ljust(6, bytes([PAD]))
+
+    def _arg(self, args, index, name, line, filename):
+        if index >= len(args):
+            raise AssemblerError(f"{name} is missing an operand", line, filename)
+        return args[index]
+
+    def _register(self, token, line, filename):
+        token = token.strip('[]').upper()
+        if token in self.aliases:
+            return self.aliases[token]
+        if not token.startswith('R') or not token[1:].isdigit() or int(token[1:]) >= self.num_registers:
+            raise AssemblerError(f"Invalid register {token}", line, filename)
+        return int(token[1:])
+
+    def _value(self, token, labels, line, filename):
+        """ A label's offset or a number, as an unsigned 32-bit value. """
+        if token in labels:
+            return labels[token]
+        return self._number(token, line, filename) & 0xFFFFFFFF
+
+    def _number(self, token, line, filename):
+        if len(token) == 3 and token[0] == token[2] == "'":
+            return ord(token[1])
+        try:
+            return int(token, 0) if token[:2].lower() in ('0x', '0b', '0o') else int(token)
+        except ValueError:
+            raise AssemblerError(f"Unknown label or invalid number {token}", line, filename) from None
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Assemble osX assembly into a .osx program.")
+    parser.add_argument('source', help="assembly file")
+    parser.add_argument('loader', nargs='?', type=int, default=0, help="address the program is loaded at")
+    parser.add_argument('-o', '--output', help="file to write the program to, the source with .osx by default")
+    args = parser.parse_args(args)
+
+    output = Assembler().assemble_file(args.source, args.loader, args.output)
+    print(f"Assembled {args.source} to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+class CoreQueues:
+    """
+        One ready queue per CPU core, each owned by its own instance of the
+        scheduling policy. New and returning processes are balanced onto the
+        least loaded core, and a core whose queue is empty steals the next
+        process from the busiest queue.
+    """
+    def __init__(self, policies):
+        self.policies = policies
+        self.name = policies[0].name
+        self.busy = [False] * len(policies)
+        self.steals = 0
+
+    def load(self, core):
+        return len(self.policies[core]) + self.busy[core]
+
+    def enqueue(self, pcb):
+        core = min(range(len(self.policies)), key=self.load)
+        self.policies[core].enqueue(pcb)
+
+    def dequeue(self, core=0):
+        if self.policies[core]:
+            return self.policies[core].dequeue()
+
+        victim = max(self.policies, key=len)
+        self.steals += 1
+        return victim.dequeue()
+
+    def remove(self, pcb):
+        """ Take pcb out of the queue of whichever core holds it. """
+        for policy in self.policies:
+            if any(queued is pcb for queued in policy):
+                policy.remove(pcb)
+                return
+        raise ValueError(f"{pcb} is not in the queue")
+
+    def peek(self, core=0):
+        if self.policies[core]:
+            return self.policies[core].peek()
+        return max(self.policies, key=len).peek()
+
+    def time_quantum(self, pcb):
+        return self.policies[0].time_quantum(pcb)
+
+    def update(self, pcb, burst, time):
+        self.policies[0].update(pcb, burst, time)
+
+    def age(self, time):
+        for policy in self.policies:
+            policy.age(time)
+
+    def __len__(self):
+        return sum(len(policy) for policy in self.policies)
+
+    def __iter__(self):
+        return (pcb for policy in self.policies for pcb in policy)
+
+    def __repr__(self):
+        return repr([list(policy) for policy in self.policies])
@@ -0,0 +1,167 @@
+import mmap
+import os
+import struct
+from constants import instructions
+from hardware.CPU import CPU, THREE_REGISTER_OPS, TWO_REGISTER_OPS, IMMEDIATE_OPS, BRANCH_OPS
+
+
+class DecodedImage:
+    """
+        The code of a program image decoded and validated once, and saved
+        next to the .osx file as a .osxc cache file, like a .pyc for a .py.
+
+        The file is a header followed by one fixed size record for each
+        instruction slot of the code, so it is mapped and read in place:
+            header  magic b'OSXC', version, flags, SHA-256 of the .osx
+                    file, records, byte size, pc, loader, problems   (HEADER)
+            record  opcode, flags, 3 register operands, immediate,
+                    static branch target                             (RECORD)
+            problem code, whether it rejects the image, address     (PROBLEM)
+        Record flags say whether the opcode is one of constants.instructions
+        (VALID) and whether it is a branch with a target known at load time
+        (BRANCH). Records are unpacked one at a time when asked for by
+        address, so loading a cache file reads its header and nothing else,
+        and the instruction cache reads an entry the first time the CPU gets
+        to it. A cache file is only used when its version and the hash of the
+        .osx file it was built from match, so copying or touching the file
+        keeps it; otherwise it is built again from the image and rewritten.
+        Once the Verifier checked the code, the header flags say so (VERIFIED)
+        and its problems follow the records, so it is not checked again.
+    """
+    MAGIC = b'OSXC'
+    VERSION = 5
+    SUFFIX = 'c'
+    HEADER = struct.Struct('<4sHH32sIIIII')
+    RECORD = struct.Struct('<BBBBBxxxIq')
+    PROBLEM = struct.Struct('<HBxI')
+    VERIFIED = 1
+    VALID = 1
+    BRANCH = 2
+
+    def __init__(self, digest, byte_size, pc, loader, data):
+        self.digest = digest # Hash of the .osx file the records were decoded from
+        self.byte_size = byte_size
+        self.pc = pc
+        self.loader = loader
+        self.data = data # The packed records, from pc on
+        self.count = len(data) // self.RECORD.size
+        self.problems = None # [(code, fatal, address)] the Verifier found, None until it checked the code
+        self.file = None # Cache file the records were read from or written to
+
+    @classmethod
+    def build(cls, image):
+        """ Decode and validate the code of image. """
+        body, loader = image.body, image.loader
+        end = loader + image.byte_size - 1
+        records = []
+        for address in range(image.pc, end - 4, 6):
+            instruction = body[address - loader:address - loader + 6]
+            name = instructions.get(instruction[0]) if len(instruction) == 6 else None
+            if name is None:
+                records.append((0, 0, 0, 0, 0, 0, -1))
+                continue
+            a, b, c = instruction[1:4]
+            immediate = struct.unpack_from('<I', instruction, 2 if name in IMMEDIATE_OPS else 1)[0]
+            flags, target = cls.VALID, -1
+            if name in BRANCH_OPS:
+                flags |= cls.BRANCH
+                target = immediate + loader if name == 'BEQ' else immediate
+            records.append((instruction[0], flags, a, b, c, immediate, target))
+        data = b''.join(cls.RECORD.pack(*record) for record in records)
+        return cls(image.digest, image.byte_size, image.pc, image.loader, data)
+
+    @classmethod
+    def path(cls, filepath):
+        return filepath + cls.SUFFIX
+
+    @classmethod
+    def load(cls, image):
+        """ The decoded code of image from its cache file, rebuilding the file when it is missing or stale. """
+        try:
+            decoded = cls.read(cls.path(image.path))
+            if decoded.digest == image.digest:
+                return decoded
+        except (OSError, ValueError, struct.error):
+            pass
+
+        decoded = cls.build(image)
+        try:
+            decoded.write(cls.path(image.path))
+        except OSError:
+            pass # Like a .pyc, a cache file that can not be written is just not kept
+        return decoded
+
+    @classmethod
+    def read(cls, filepath):
+        with open(filepath, 'rb') as f:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) # Stays mapped once the file is closed
+        magic, version, flags, digest, count, byte_size, pc, loader, problems = cls.HEADER.unpack_from(view)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError(f"{filepath} is not a version {cls.VERSION} image cache file")
+        end = cls.HEADER.size + count * cls.RECORD.size
+        if len(view) != end + problems * cls.PROBLEM.size:
+            raise ValueError(f"{filepath} is truncated")
+        decoded = cls(digest, byte_size, pc, loader, memoryview(view)[cls.HEADER.size:end])
+        if flags & cls.VERIFIED:
+            decoded.problems = [(code, bool(fatal), address) for code, fatal, address in cls.PROBLEM.iter_unpack(view[end:])]
+        decoded.file = filepath
+        return decoded
+
+    def write(self, filepath):
+        temporary = filepath + '.tmp'
+        problems = self.problems or []
+        flags = self.VERIFIED if self.problems is not None else 0
+        with open(temporary, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, flags, self.digest, self.count, self.byte_size, self.pc, self.loader, len(problems)))
+            f.write(self.data)
+            f.write(b''.join(self.PROBLEM.pack(*problem) for problem in problems))
+        os.replace(temporary, filepath)
+        self.file = filepath
+
+    def save(self):
+        """ Rewrite the cache file the records came from, so that it keeps what was added since, like the problems. """
+        if self.file is not None:
+            try:
+                self.write(self.file)
+            except OSError:
+                pass
+
+    def record(self, address):
+        """ (opcode, flags, a, b, c, immediate, target) of the instruction at address, None outside of the code. """
+        i, offset = divmod(address - self.pc, 6)
+        if offset or not 0 <= i < self.count:
+            return None
+        return self.RECORD.unpack_from(self.data, i * self.RECORD.size)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return self.RECORD.iter_unpack(self.data)
+
+    def entry(self, address, handlers=CPU.handlers):
+        """ The instruction cache entry (handler, operands) of the instruction at address, None if it is not a valid one. """
+        record = self.record(address)
+        if record is None or not record[1] & self.VALID:
+            return None
+        return self._entry(record, handlers)
+
+    def entries(self, handlers=CPU.handlers):
+        """ The instruction cache entries of the valid instructions, by address. """
+        return {self.pc + 6 * i: self._entry(record, handlers) for i, record in enumerate(self) if record[1] & self.VALID}
+
+    @staticmethod
+    def _entry(record, handlers):
+        opcode, _, a, b, c, immediate, _ = record
+        name = instructions[opcode]
+        if name in THREE_REGISTER_OPS:
+            operands = (a, b, c)
+        elif name in TWO_REGISTER_OPS:
+            operands = (a, b)
+        elif name in IMMEDIATE_OPS:
+            operands = (a, immediate)
+        elif name in BRANCH_OPS:
+            operands = (immediate,)
+        else:
+            operands = (a,) # BX register, SWI code
+        return (handlers[name], operands)
@@ -0,0 +1,63 @@
+import heapq
+from itertools import count
+
+
+class EventQueue:
+    """
+        Min-heap of PCBs keyed on one of their attributes, such as
+        arrival_time for the job queue or wait_until for the I/O queue.
+        PCBs with equal keys come out in the order they were pushed.
+    """
+    def __init__(self, key):
+        self.key = key
+        self._heap = []
+        self._counter = count()
+
+    def push(self, pcb):
+        heapq.heappush(self._heap, (getattr(pcb, self.key), next(self._counter), pcb))
+
+    def pop(self):
+        return heapq.heappop(self._heap)[2]
+
+    def peek(self):
+        return self._heap[0][2]
+
+    def pop_due(self, time):
+        """ Pop every PCB whose key is at or before time, in key order."""
+        due = []
+        while self._heap and self._heap[0][0] <= time:
+            due.append(heapq.heappop(self._heap)[2])
+        return due
+
+    def next_key(self):
+        """ Smallest key in the queue, None if it is empty."""
+        return self._heap[0][0] if self._heap else None
+
+    def remove(self, pcb):
+        """ Take pcb out of the queue. Raises ValueError, like list.remove, if it is not in it. """
+        heap = [entry for entry in self._heap if entry[2] is not pcb]
+        if len(heap) == len(self._heap):
+            raise ValueError(f"{pcb} is not in the queue")
+        self._heap = heap
+        heapq.heapify(self._heap)
+
+    def __getstate__(self):
+        return {'key': self.key, 'heap': self._heap}
+
+    def __setstate__(self, state):
+        """ Carry on numbering pushes after the ones already in the heap. """
+        self.key = state['key']
+        self._heap = state['heap']
+        self._counter = count(max((entry[1] for entry in self._heap), default=-1) + 1)
+
+    def __iter__(self):
+        return (entry[2] for entry in sorted(self._heap, key=lambda entry: entry[:2]))
+
+    def __getitem__(self, index):
+        return list(self)[index]
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __repr__(self):
+        return repr(list(self))
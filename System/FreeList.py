@@ -0,0 +1,278 @@
+import random
+
+
+class _Node:
+    __slots__ = ('key', 'value', 'weight', 'longest', 'priority', 'left', 'right')
+
+    def __init__(self, key, value, weight, priority):
+        self.key = key
+        self.value = value
+        self.weight = weight
+        self.longest = weight # Largest weight in the subtree
+        self.priority = priority
+        self.left = None
+        self.right = None
+
+
+def _update(node):
+    longest = node.weight
+    if node.left is not None and node.left.longest > longest:
+        longest = node.left.longest
+    if node.right is not None and node.right.longest > longest:
+        longest = node.right.longest
+    node.longest = longest
+
+def _split(node, key):
+    """ The nodes of node's subtree with keys below key, and the rest. """
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        _update(node)
+        return node, right
+    left, node.left = _split(node.left, key)
+    _update(node)
+    return left, node
+
+def _merge(left, right):
+    """ Join two subtrees, every key of left being below every key of right. """
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+def _insert(node, new):
+    if node is None:
+        return new
+    if new.priority > node.priority:
+        new.left, new.right = _split(node, new.key)
+        _update(new)
+        return new
+    if new.key < node.key:
+        node.left = _insert(node.left, new)
+    else:
+        node.right = _insert(node.right, new)
+    _update(node)
+    return node
+
+def _remove(node, key):
+    if node.key == key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    else:
+        node.right = _remove(node.right, key)
+    _update(node)
+    return node
+
+def _copy(node):
+    if node is None:
+        return None
+    copy = _Node(node.key, node.value, node.weight, node.priority)
+    copy.longest = node.longest
+    copy.left = _copy(node.left)
+    copy.right = _copy(node.right)
+    return copy
+
+
+class _Treap:
+    """
+        Balanced search tree of keys with a value and a weight each, every
+        node also knowing the largest weight below it. Random priorities keep
+        it balanced, so updates and searches take O(log n) expected.
+    """
+    priorities = random.Random(0) # Its own generator, the simulation's random numbers stay the same
+
+    def __init__(self):
+        self.root = None
+        self.count = 0
+
+    def insert(self, key, value, weight):
+        self.root = _insert(self.root, _Node(key, value, weight, self.priorities.random()))
+        self.count += 1
+
+    def remove(self, key):
+        """ Remove key, which must be in the tree. Returns its value. """
+        value = self.get(key).value
+        self.root = _remove(self.root, key)
+        self.count -= 1
+        return value
+
+    def get(self, key):
+        node = self.floor(key)
+        return node if node is not None and node.key == key else None
+
+    def floor(self, key):
+        """ The node with the largest key at or below key, None if there is none. """
+        node, found = self.root, None
+        while node is not None:
+            if node.key <= key:
+                found, node = node, node.right
+            else:
+                node = node.left
+        return found
+
+    def ceiling(self, key):
+        """ The node with the smallest key at or above key, None if there is none. """
+        node, found = self.root, None
+        while node is not None:
+            if node.key >= key:
+                found, node = node, node.left
+            else:
+                node = node.right
+        return found
+
+    def first(self, weight):
+        """ The node with the smallest key whose weight is at least weight, None if there is none. """
+        node = self.root
+        if node is None or node.longest < weight:
+            return None
+        while True:
+            if node.left is not None and node.left.longest >= weight:
+                node = node.left
+            elif node.weight >= weight:
+                return node
+            else:
+                node = node.right
+
+    def longest(self):
+        return self.root.longest if self.root is not None else 0
+
+    def copy(self):
+        treap = _Treap()
+        treap.root = _copy(self.root)
+        treap.count = self.count
+        return treap
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        """ The nodes in key order. """
+        stack, node = [], self.root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node
+            node = node.right
+
+
+class FreeList:
+    """
+        The free holes of memory, kept in two balanced trees: one by address
+        and one by size.
+
+        Holes are half-open intervals [start, end). The address tree knows the
+        longest hole under each of its nodes, so first fit walks down to the
+        lowest hole that is large enough, and freeing finds the neighbours to
+        merge with, in O(log n) for n holes. Best fit takes the smallest hole
+        that is large enough from the size tree, also in O(log n). Adding or
+        removing a hole is O(log n) in both. The free total is kept as holes
+        come and go.
+    """
+    policies = ('best', 'first')
+
+    def __init__(self, size, policy='best'):
+        if policy not in self.policies:
+            raise ValueError(f"Unknown allocation policy: {policy}. Choose from {', '.join(self.policies)}")
+        self.size = size
+        self.policy = policy
+        self.holes = _Treap() # start -> end, weighed by length
+        self.by_size = _Treap() # (length, start) -> start
+        self.free_total = 0 # Total length of the holes
+        if size > 0:
+            self._add(0, size)
+
+    def _add(self, start, end):
+        self.holes.insert(start, end, end - start)
+        self.by_size.insert((end - start, start), start, end - start)
+        self.free_total += end - start
+
+    def _remove(self, start):
+        end = self.holes.remove(start)
+        self.by_size.remove((end - start, start))
+        self.free_total -= end - start
+        return end
+
+    def copy(self):
+        """ A free list with the same holes, to try out changes on. """
+        free_list = FreeList(0, self.policy)
+        free_list.size = self.size
+        free_list.holes = self.holes.copy()
+        free_list.by_size = self.by_size.copy()
+        free_list.free_total = self.free_total
+        return free_list
+
+    def hole_at(self, address):
+        """ Start of the hole containing address, None if address is allocated. """
+        hole = self.holes.floor(address)
+        if hole is not None and hole.value > address:
+            return hole.key
+        return None
+
+    def fits_at(self, start, length):
+        """ Whether start..start+length-1 is entirely free. """
+        hole = self.holes.floor(start)
+        return hole is not None and hole.value > start and start + length <= hole.value
+
+    def find(self, length):
+        """ Start of the hole the policy picks for length bytes, None if none is large enough. """
+        if self.policy == 'best':
+            hole = self.by_size.ceiling((length, -1))
+            return hole.value if hole is not None else None
+
+        hole = self.holes.first(length)
+        return hole.key if hole is not None else None
+
+    def allocate(self, length, start=None):
+        """ Allocate length bytes, at start if given. Returns the start address or None. """
+        if start is None:
+            start = self.find(length)
+        if start is None or not self.fits_at(start, length):
+            return None
+
+        hole = self.hole_at(start)
+        end = self._remove(hole)
+        if hole < start:
+            self._add(hole, start)
+        if start + length < end:
+            self._add(start + length, end)
+        return start
+
+    def free(self, start, length):
+        """ Return start..start+length-1 to the free list, merging it with adjacent holes. """
+        end = start + length
+        if length <= 0:
+            return
+        if self.holes.get(end) is not None:
+            end = self._remove(end)
+        before = self.holes.floor(start - 1)
+        if before is not None and before.value == start:
+            start = before.key
+            self._remove(start)
+        self._add(start, end)
+
+    def free_space(self):
+        return self.free_total
+
+    def largest(self):
+        """ Length of the largest hole. """
+        return self.holes.longest()
+
+    def __len__(self):
+        return len(self.holes)
+
+    def __iter__(self):
+        return ((hole.key, hole.value) for hole in self.holes)
+
+    def __repr__(self):
+        return repr(list(self))
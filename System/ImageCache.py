@@ -0,0 +1,103 @@
+import os
+import hashlib
+from collections import OrderedDict
+from struct import unpack
+
+try:
+    from .DecodedImage import DecodedImage
+except ImportError:
+    from DecodedImage import DecodedImage
+
+
+class Image:
+    """ A parsed .osx file: its header, the bytes of its body and the stat it was read with. """
+    def __init__(self, path, mtime, size, data):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.digest = hashlib.sha256(data).digest() # What its .osxc file is keyed on
+        # Header of 3 integers (12 bytes), the pc is relative to the loader
+        self.byte_size, pc, self.loader = unpack('III', data[:12])
+        self.pc = pc + self.loader
+        self.body = data[12:12 + self.byte_size]
+        self.decoded = None # DecodedImage of the code, from its .osxc file when the cache uses them
+        self.entries = None # address -> instruction cache entry of the code, when decoded without a DecodedImage
+        self.problems = None # What the Verifier found wrong with it, once it was verified
+        self.warnings = None # What the Verifier found that does not stop it from running
+
+    def __repr__(self):
+        return f"<Image {self.path} byte_size={self.byte_size} loader={self.loader}>"
+
+
+class ImageCache:
+    """
+        Programs read from disk, kept so that loading the same program again
+        costs a stat instead of a read. An image is read again when the
+        file's modification time or size has changed.
+
+        Images are dropped least recently used first once their bodies take
+        up more than budget bytes. An image larger than the budget is not
+        kept at all, and a budget of 0 turns the cache off.
+
+        With files set, the code of an image read from disk is taken from
+        the .osxc file next to it, already decoded and validated, and the
+        file is written when it is missing or stale, see DecodedImage.
+    """
+    def __init__(self, budget=16 * 1024 * 1024, decoder=None, files=False):
+        self.budget = budget
+        self.decoder = decoder
+        self.files = files
+        self.images = OrderedDict() # path -> Image, least recently used first
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path):
+        """ The Image of the file at path. Raises FileNotFoundError if there is none. """
+        stat = os.stat(path)
+        image = self.images.get(path)
+        if image is not None and image.mtime == stat.st_mtime_ns and image.size == stat.st_size:
+            self.hits += 1
+            self.images.move_to_end(path)
+            return image
+
+        self.misses += 1
+        self.discard(path)
+        with open(path, 'rb') as f:
+            image = Image(path, stat.st_mtime_ns, stat.st_size, f.read())
+        if self.files:
+            image.decoded = DecodedImage.load(image)
+        if len(image.body) <= self.budget:
+            self.images[path] = image
+            self.used += len(image.body)
+            while self.used > self.budget:
+                self.discard(next(iter(self.images)))
+                self.evictions += 1
+        return image
+
+    def decode(self, image):
+        """
+            The instruction cache entries of the code of image: its DecodedImage,
+            which the instruction cache reads an entry at a time, or else the
+            entries decoded once per image. None without a decoder or decoded image.
+        """
+        if image.decoded is not None:
+            return image.decoded
+        if image.entries is None and self.decoder is not None:
+            body, loader = image.body, image.loader
+            end = loader + image.byte_size - 1
+            entries = ((address, self.decoder(body[address - loader:address - loader + 6])) for address in range(image.pc, end - 4, 6))
+            image.entries = {address: entry for address, entry in entries if entry is not None}
+        return image.entries
+
+    def discard(self, path):
+        image = self.images.pop(path, None)
+        if image is not None:
+            self.used -= len(image.body)
+
+    def __len__(self):
+        return len(self.images)
+
+    def __repr__(self):
+        return f"<ImageCache images={len(self.images)} used={self.used}/{self.budget} hits={self.hits} misses={self.misses} evictions={self.evictions}>"
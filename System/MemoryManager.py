@@ -1,12 +1,35 @@
+from bisect import bisect_left, insort
+from collections import deque
 from hardware.Memory import Memory
-from struct import unpack
 from constants import PCBState
 
+try:
+    from .FreeList import FreeList
+    from .ImageCache import ImageCache
+except ImportError:
+    from FreeList import FreeList
+    from ImageCache import ImageCache
+
 class MemoryManager:
-    def __init__(self, system, size):
-        self.memory = Memory(size)
+    fragmentation_history_size = 1024 # Latest samples kept for inspection, the averages use running totals
+
+    def __init__(self, system, size, allocation_policy='best', compaction=False, compaction_cost=1, backend=None, path=None):
+        self.memory = size if isinstance(size, Memory) else Memory(size, backend, path)
         self.system = system
-        self.memory_map = []
+        self.free_list = FreeList(self.memory.size, allocation_policy)
+        self.memory_map = {} # start -> {'start', 'end', 'pcb'}
+        self.allocated = [] # Sorted start of every allocation
+        self.instruction_cache = None
+        self.image_cache = ImageCache() # Programs read from disk, shared with the system
+        self.verifier = None # Checks programs as they are loaded, when set
+
+        self.compaction = compaction
+        self.compaction_cost = compaction_cost # Clock ticks per word moved
+        self.compactions = 0
+        self.compaction_time = 0
+        self.bytes_compacted = 0
+        self.fragmentation_history = deque(maxlen=self.fragmentation_history_size) # The latest (time, fragmentation()), after allocations and frees
+        self.reset_fragmentation_totals()
 
     def prepare_program(self, filepath):
         """Validate program file and memory availability before loading."""
@@ -15,23 +38,25 @@ class MemoryManager:
             return self.system_code(103, "Please specify the file path.")
                 
         try:
-            with open(filepath, 'rb') as f:
-                # Unpack header, which consists of 3 integers (12 bytes)
-                byte_size, pc, loader = self._read_header(f)
-                
-                if not self._is_valid_loader(loader, byte_size, filepath):
-                    return None
-                
-                return {
-                    'filepath': filepath,
-                    'byte_size': byte_size,
-                    'loader': loader,
-                    'pc': pc,
-                    'code_start': pc,
-                    'code_end': loader + byte_size - 1,
-                    'data_start': loader,
-                    'data_end': pc - 1
-                }
+            image = self.image_cache.get(filepath)
+            byte_size, pc, loader = image.byte_size, image.pc, image.loader
+
+            if not self._is_valid_loader(loader, byte_size, filepath):
+                return None
+
+            if self.verifier is not None and not self._is_verified(image, filepath):
+                return None
+
+            return {
+                'filepath': filepath,
+                'byte_size': byte_size,
+                'loader': loader,
+                'pc': pc,
+                'code_start': pc,
+                'code_end': loader + byte_size - 1,
+                'data_start': loader,
+                'data_end': pc - 1
+            }
 
         except FileNotFoundError:
             # print("File not found")
@@ -43,12 +68,6 @@ class MemoryManager:
             print(e)
             return None
         
-    def _read_header(self, f):
-        header = f.read(12)
-        byte_size, pc, loader = unpack('III', header) 
-        pc += loader
-        return byte_size, pc, loader
-    
     def _is_valid_loader(self, loader, byte_size, filepath):
         if loader > self.memory.size:
             self.system_code(110, f"Loader address {loader} is out of bounds.", filepath)
@@ -60,14 +79,43 @@ class MemoryManager:
                 
         return True
     
+    def _is_verified(self, image, filepath):
+        problems = self.verifier.verify(image)
+        if problems:
+            code, message = problems[0]
+            more = f" ({len(problems) - 1} more problems)" if len(problems) > 1 else ""
+            self.system_code(code, f"{message}{more}", filepath)
+            return False
+        for code, message in self.verifier.warnings(image):
+            self.system.print(f"Warning: {message}")
+        return True
+
     def allocate_memory(self, pcb):
         """ Allocate memory if available and update memory map. """
-        start = pcb.loader
-        end = start + pcb.byte_size
-        if self.check_memory_available(pcb):
-            self.memory_map.append({'start': start, 'end': end, 'pcb': pcb})
-            return True
-        return False
+        # A process that execs a new program gives up its old image, unless forked children still use it
+        if pcb.base is not None and self.memory_map.get(pcb.base, {}).get('pcb') is pcb:
+            self.free_memory(pcb)
+
+        plan = self.plan(pcb)
+        if plan is None:
+            return False
+        reclaim, compact = plan
+        for alloc in reclaim:
+            self._release(alloc['start'])
+        if compact:
+            self.compact()
+
+        start, size = pcb.loader, pcb.byte_size
+        base = start if self.free_list.fits_at(start, size) else self.free_list.find(size)
+        if base is None:
+            return False
+
+        self.free_list.allocate(size, base)
+        self.memory_map[base] = {'start': base, 'end': base + size, 'pcb': pcb}
+        insort(self.allocated, base)
+        pcb.base = base
+        self.record_fragmentation()
+        return True
     
     def load_to_memory(self, pcb):
         """ Load program into memory if space is available. """
@@ -75,45 +123,211 @@ class MemoryManager:
             self.system_code(102, f"Failed to allocate memory for {pcb.file}")
             return None
         try :
-            with open(pcb.file, 'rb') as f:
-                f.seek(12) # Skip header
-                self.memory[pcb.loader : pcb.loader + pcb.byte_size] = f.read(pcb.byte_size)
-                self.system.print(f"Loaded {pcb.file} to memory")
-                return True
+            image = self.image_cache.get(pcb.file)
+            self.write_image(pcb, image.body[:pcb.byte_size])
+            if self.instruction_cache is not None:
+                decoded = self.image_cache.decode(image) if image.pc == pcb.code_start else None
+                self.instruction_cache.load(pcb.code_start, pcb.code_end, pcb.mapping(), decoded)
+            self.system.print(f"Loaded {pcb.file} to memory")
+            return True
         except Exception as e:
             self.system_code(100, f"Error loading {pcb['file']}: {e}")
             self.free_memory(pcb)
             return None
         
+    def write_image(self, pcb, data):
+        """ Copy the program image into the memory allocated for pcb. """
+        self.memory[pcb.base : pcb.base + len(data)] = data
+
+    def read_image(self, pcb):
+        """ A copy of pcb's image, None if pcb shares its memory with a forked child that is still running. """
+        alloc = self.memory_map.get(pcb.base)
+        if alloc is None or alloc['pcb'] is not pcb:
+            return None
+        if any(user is not pcb and user.state != PCBState.TERMINATED for user in self._users(pcb, alloc['start'])):
+            return None
+        return bytes(self.memory[alloc['start']:alloc['end']])
+
+    def regions(self):
+        """ (pcb, start, end) of the memory of each process, in address order. """
+        return [(self.memory_map[start]['pcb'], start, self.memory_map[start]['end']) for start in self.allocated]
+
+    def fork(self, parent, child):
+        """ Called when parent forks child. Without paging the child shares its parent's memory. """
+        pass
+
     def free_memory(self, pcb):
         """ Free memory and update memory map. """
-        start = pcb.loader
-        end = start + pcb.byte_size
-        self.memory_map = [alloc for alloc in self.memory_map if alloc['pcb'].pid != pcb.pid]
-        self.memory[start:end] = [0] * (end - start) # Clear memory
+        alloc = self.memory_map.get(pcb.base)
+        if alloc is None or alloc['pcb'] is not pcb:
+            return True # Forked children share their parent's memory
+        if any(user is not pcb and user.state != PCBState.TERMINATED for user in self._users(pcb, alloc['start'])):
+            return True # Still used by forked children, reclaimed once they terminated
+
+        self._release(alloc['start'])
         return True
         # return False
+
+    def _release(self, start):
+        """ Return the allocation at start to the free list. """
+        end = self.memory_map.pop(start)['end']
+        del self.allocated[bisect_left(self.allocated, start)]
+        self.free_list.free(start, end - start)
+        self.memory.zero(start, end) # Clear memory
+        if self.instruction_cache is not None:
+            self.instruction_cache.release(start, end - 1)
+        self.record_fragmentation()
     
+    def plan(self, pcb, swappable=()):
+        """
+            What placing pcb's image takes, without changing anything: the
+            allocations of terminated processes to reclaim first and whether
+            memory has to be compacted, or None if there is no room even then.
+            The loader address from the header is used whenever it is free, so
+            programs only move when they would overlap a running process.
+            Terminated processes keep their memory until the space is needed.
+            The memory of the processes in swappable counts as reclaimable
+            too, as if they had been swapped out.
+        """
+        start = pcb.loader
+        size = pcb.byte_size
+        swapped = {process.base for process in swappable}
+
+        if self.free_list.fits_at(start, size):
+            return [], False
+
+        overlapping = self.overlapping(start, start + size)
+        if overlapping and start + size <= self.memory.size and all(self._reclaimable(alloc, swapped) for alloc in overlapping):
+            return overlapping, False
+
+        if self.free_list.find(size) is not None:
+            return [], False
+
+        reclaim = [alloc for alloc in self.memory_map.values() if self._reclaimable(alloc, swapped)]
+        if reclaim:
+            holes = self.free_list.copy()
+            for alloc in reclaim:
+                holes.free(alloc['start'], alloc['end'] - alloc['start'])
+            if holes.find(size) is not None:
+                return reclaim, False
+        if self.compaction and self._compacted_hole(reclaim) >= size:
+            # Enough memory is free, just not in one piece
+            return reclaim, True
+        return None
+
+    def _reclaimable(self, alloc, swapped=()):
+        """ Whether every process using the image of alloc has terminated, or alloc is one of the swapped allocation starts. """
+        return alloc['start'] in swapped or all(user.state == PCBState.TERMINATED for user in self._users(alloc['pcb'], alloc['start']))
+
+    def _compacted_hole(self, reclaim):
+        """ Size of the hole compact() would leave at the end once the allocations in reclaim are freed. """
+        gone = {alloc['start'] for alloc in reclaim}
+        largest = cursor = 0
+        for start in self.allocated:
+            if start in gone:
+                continue
+            alloc = self.memory_map[start]
+            if start == cursor or self._pinned(alloc):
+                largest = max(largest, start - cursor)
+                cursor = alloc['end']
+            else:
+                cursor += alloc['end'] - start
+        return max(largest, self.memory.size - cursor)
+
+    def _pinned(self, alloc):
+        """ Whether a running process uses the image of alloc, so that it can not be moved. """
+        return any(user.state == PCBState.RUNNING for user in self._users(alloc['pcb'], alloc['start']))
+
+    def compact(self):
+        """
+            Slide every image down towards address 0 so the free memory forms
+            one hole at the end. Images of running processes stay where they
+            are. The bytes moved are charged to the clock.
+        """
+        view = self.memory.view
+        moved = 0
+        cursor = 0
+        for start in list(self.allocated):
+            alloc = self.memory_map[start]
+            end = alloc['end']
+            if start == cursor or self._pinned(alloc):
+                cursor = end
+                continue
+
+            length = end - start
+            if self.instruction_cache is not None:
+                self.instruction_cache.release(start, end - 1)
+            view[cursor:cursor + length] = view[start:end]
+            self.memory.mark(cursor, length)
+            self.memory.zero(max(cursor + length, start), end) # Clear memory
+            self.free_list.free(start, length)
+            self.free_list.allocate(length, cursor)
+
+            del self.memory_map[start]
+            self.memory_map[cursor] = {'start': cursor, 'end': cursor + length, 'pcb': alloc['pcb']}
+            for pcb in self._users(alloc['pcb'], start):
+                pcb.base = cursor
+            moved += length
+            cursor += length
+
+        self.allocated = sorted(self.memory_map)
+        cost = -(-moved // 4) * self.compaction_cost
+        self.system.clock += cost
+        self.compactions += 1
+        self.compaction_time += cost
+        self.bytes_compacted += moved
+        self.record_fragmentation()
+        self.system.print(f"Compacted memory, moved {moved} bytes in {cost} time units")
+        return moved
+
+    def _users(self, pcb, base):
+        """ pcb and its forked descendants whose image is the one at base, those that exec'd another program are not. """
+        users = [pcb] if pcb.base == base else []
+        for child in pcb.children:
+            users += self._users(child, base)
+        return users
+
+    def fragmentation(self):
+        """ Statistics of the free memory: its size, hole count, largest hole and how much memory is in use. """
+        free = self.free_list.free_space()
+        largest = self.free_list.largest()
+        return {
+            'free': free,
+            'holes': len(self.free_list),
+            'largest_hole': largest,
+            'utilization': 1 - free / self.memory.size,
+            'external_fragmentation': 1 - largest / free if free else 0,
+        }
+
+    def record_fragmentation(self):
+        stats = self.fragmentation()
+        self.fragmentation_history.append((self.system.clock.time, stats))
+        self.fragmentation_samples += 1
+        for key in self.fragmentation_totals:
+            self.fragmentation_totals[key] += stats[key]
+
+    def reset_fragmentation_totals(self):
+        """ Start the sums the fragmentation averages of the metrics are taken from over. """
+        self.fragmentation_samples = 0
+        self.fragmentation_totals = {'holes': 0, 'largest_hole': 0, 'utilization': 0}
+
+    def overlapping(self, start, end):
+        """ Allocations overlapping start..end-1, in address order. """
+        i = max(bisect_left(self.allocated, start) - 1, 0)
+        allocs = []
+        while i < len(self.allocated) and self.allocated[i] < end:
+            alloc = self.memory_map[self.allocated[i]]
+            if alloc['end'] > start:
+                allocs.append(alloc)
+            i += 1
+        return allocs
 
     def system_code(self, code, *args):
         self.system.system_code(code, *args)
 
-    def check_memory_available(self, pcb):
-        start = pcb.loader
-        end = start + pcb.byte_size
-
-        for alloc in self.memory_map:
-            alloc_start = alloc['start']
-            alloc_end = alloc['end']
-
-            # if (end <= alloc['start'] or start >= alloc['end']):
-            if (start < alloc_end) and (alloc_start < end):
-                if alloc['pcb'].state == PCBState.TERMINATED:
-                    self.free_memory(alloc['pcb'])
-                    return True
-                else:
-                    return False
-        return True
+    def check_memory_available(self, pcb, swappable=()):
+        """ Whether pcb's image can be placed, once the processes in swappable are swapped out if any, see plan. Changes nothing. """
+        return self.plan(pcb, swappable) is not None
     
             
 
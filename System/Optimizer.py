@@ -0,0 +1,330 @@
+import argparse
+from collections import defaultdict
+from tabulate import tabulate
+from hardware.CPU import THREE_REGISTER_OPS, IMMEDIATE_OPS, BRANCH_OPS
+
+try:
+    from .Assembler import Assembler
+except ImportError:
+    from Assembler import Assembler
+
+CONDITIONAL_OPS = ("BNE", "BGT", "BLT", "BEQ")
+REMOVABLE_OPS = ("ADD", "SUB", "MUL", "AND", "MOV", "MVI", "ADR", "CMP", "ORR", "EOR") # No fault, no memory, one register written
+Z, LINK, PC = 9, 5, 11
+ALL_REGISTERS = frozenset(range(Assembler.num_registers))
+
+
+class Instruction:
+    """ A statement of the code being optimized, with its operands parsed and the labels that point at it. """
+    def __init__(self, line, name, args, registers, value, labels):
+        self.line = line
+        self.name = name
+        self.args = args
+        self.registers = registers # As written, EOR R0 R1 Z has 3
+        self.value = value # Label or number of an immediate, branch or SWI
+        self.labels = labels
+
+    def reads(self):
+        name, registers = self.name, self.registers
+        if name in THREE_REGISTER_OPS:
+            return set(registers[1:3])
+        if name in ("MOV", "LDR", "LDRB"):
+            return {registers[1]}
+        if name in ("STR", "STRB", "CMP", "ORR", "EOR"):
+            return set(registers[:2])
+        if name == "BX":
+            return {registers[0]}
+        if name in CONDITIONAL_OPS:
+            return {Z}
+        if name == "SWI":
+            return set(ALL_REGISTERS) # Printed, saved for I/O, copied by fork
+        return set()
+
+    def writes(self):
+        name = self.name
+        if name in THREE_REGISTER_OPS or name in IMMEDIATE_OPS or name in ("MOV", "LDR", "LDRB"):
+            return self.registers[0]
+        if name in ("CMP", "ORR", "EOR"):
+            return Z
+        if name == "BL":
+            return LINK
+        return None
+
+    def statement(self):
+        return self.line, self.name, self.args
+
+
+class Optimizer:
+    """
+        Peephole and data flow passes over the parsed statements of a
+        program, between the Assembler reading the source and laying out
+        the image, so that labels are still names and every branch follows
+        the code it jumps to when the code gets shorter:
+            - ADD and SUB of registers known to hold MVI constants become
+              an MVI of the result, within a basic block
+            - branches to a B go straight to where that B goes
+            - MOV Rx Rx, and branches to the next instruction, are removed
+            - code that no branch, fall through or BL return reaches is removed
+            - writes to registers that are written again before being read
+              are removed; SWI and the end of the program read every register
+        The passes are repeated until none of them changes anything. Data is
+        left as it is, so the final registers, memory and SWI 2 output are
+        those of the original program.
+
+        Branches go where the CPU takes them: BEQ adds the loader to its
+        operand and the other branches do not, so with a loader that is not
+        0 they rarely land on the label they name. A branch that lands on an
+        instruction follows it as the code moves, and one that lands outside
+        of the code keeps its address; that code is unknown, so every
+        register is live there and no code is taken to be unreachable. Code
+        addresses are otherwise only taken from labels and BL, and programs
+        the passes can not follow (data after the code, the PC register,
+        branches between instructions, or code labels loaded into registers
+        when the loader is not 0) are left as they are.
+
+        Every program optimized adds a row of its instruction counts to
+        reports, see report().
+    """
+    def __init__(self):
+        self.assembler = Assembler()
+        self.reports = []
+
+    def optimize(self, statements, labels, loader=0, filename=None):
+        """ The statements and label indexes of the optimized program, from those of Assembler._parse. """
+        start = next((i for i, (_, name, _) in enumerate(statements) if not name.startswith('.')), len(statements))
+        at = defaultdict(list)
+        for label, index in labels.items():
+            at[index].append(label)
+        base = loader + sum(self.assembler._size(name, args, line, filename) for line, name, args in statements[:start]) # Address of the code
+        end = [] # Labels that end up past the last instruction
+        if any(name.startswith('.') for _, name, _ in statements[start:]):
+            code, reason = [], "data after the code"
+        else:
+            code = [self._instruction(*statement, at[index], labels, filename) for index, statement in enumerate(statements[start:], start)]
+            reason = self._unsupported(code, labels, start, loader) or self._resolve(code, end, statements, labels, loader, base, filename)
+
+        before = after = len(statements) - start
+        if reason is None:
+            self._optimize(code, end)
+            self._place(code, end, loader, base)
+            after = len(code)
+            statements = statements[:start] + [instruction.statement() for instruction in code]
+            labels = {label: index for label, index in labels.items() if index < start}
+            for index, instruction in enumerate(code, start):
+                labels.update(dict.fromkeys(instruction.labels, index))
+            labels.update(dict.fromkeys(end, len(statements)))
+            labels = {label: index for label, index in labels.items() if not label.startswith(' ')}
+        self.reports.append({'program': filename or '<source>', 'before': before, 'after': after,
+                             'removed': before - after, 'note': reason or ''})
+        return statements, labels
+
+    def report(self):
+        """ Instruction counts before and after, for each program optimized. """
+        return tabulate(self.reports, headers='keys', tablefmt='grid')
+
+    def _instruction(self, line, name, args, labels_here, labels, filename):
+        registers, value = (), None
+        if name in IMMEDIATE_OPS:
+            registers = (self.assembler._register(self.assembler._arg(args, 0, name, line, filename), line, filename),)
+            value = self._value(self.assembler._arg(args, 1, name, line, filename), labels, line, filename)
+        elif name in BRANCH_OPS or name == 'SWI':
+            value = self._value(self.assembler._arg(args, 0, name, line, filename), labels, line, filename)
+        else:
+            registers = tuple(self.assembler._register(arg, line, filename) for arg in args)
+        return Instruction(line, name, args, registers, value, list(labels_here))
+
+    def _value(self, token, labels, line, filename):
+        return token if token in labels else self.assembler._number(token, line, filename) & 0xFFFFFFFF
+
+    def _unsupported(self, code, labels, start, loader):
+        """ Why the passes can not follow the code, None when they can. """
+        for instruction in code:
+            if PC in instruction.registers:
+                return "uses the PC register"
+            if loader and instruction.name in IMMEDIATE_OPS and isinstance(instruction.value, str) and labels[instruction.value] >= start:
+                return "loads a code label, which does not add the loader"
+        return None
+
+    def _resolve(self, code, end, statements, labels, loader, base, filename):
+        """
+            Point every branch at the instruction the CPU takes it to. Those
+            that do not land on the label they name get a label of their own,
+            named with a space so that it can not clash with one of the
+            source, and branches out of the code keep their address as a
+            number. Returns why the passes can not follow the code, None
+            when they can.
+        """
+        offsets = [0]
+        for line, name, args in statements:
+            offsets.append(offsets[-1] + self.assembler._size(name, args, line, filename))
+        start = len(statements) - len(code)
+        for instruction in code:
+            if instruction.name not in BRANCH_OPS:
+                continue
+            value = instruction.value
+            operand = offsets[labels[value]] if isinstance(value, str) else value
+            index, between = divmod((operand + loader if instruction.name == 'BEQ' else operand) - base, 6)
+            if not 0 <= index <= len(code):
+                instruction.value, instruction.args = operand, [str(operand)]
+            elif between:
+                return "branches between instructions"
+            elif not isinstance(value, str) or labels[value] != start + index:
+                label = f" {index}"
+                if label not in self._indexes(code, end):
+                    (code[index].labels if index < len(code) else end).append(label)
+                instruction.value, instruction.args = label, [label]
+        return None
+
+    def _place(self, code, end, loader, base):
+        """ Give the branches to labels of their own, see _resolve, the address of where their instruction ended up. """
+        indexes = self._indexes(code, end)
+        for instruction in code:
+            if instruction.name in BRANCH_OPS and isinstance(instruction.value, str) and instruction.value.startswith(' '):
+                address = base + 6 * indexes[instruction.value]
+                instruction.args = [str(address - loader if instruction.name == 'BEQ' else address)]
+
+    def _optimize(self, code, end):
+        passes = (self._fold, self._identity_moves, self._thread, self._branches_to_next, self._unreachable, self._dead_writes)
+        changed = True
+        while changed:
+            changed = False
+            for optimization in passes:
+                dead = optimization(code, self._indexes(code, end))
+                if dead:
+                    self._remove(code, dead, end)
+                changed |= dead is None or bool(dead)
+
+    def _indexes(self, code, end):
+        indexes = {label: i for i, instruction in enumerate(code) for label in instruction.labels}
+        indexes.update(dict.fromkeys(end, len(code)))
+        return indexes
+
+    def _remove(self, code, dead, end):
+        """ Drop the instructions at the indexes in dead, moving their labels to the next instruction kept. """
+        kept, labels = [], []
+        for i, instruction in enumerate(code):
+            if i in dead:
+                labels += instruction.labels
+                continue
+            instruction.labels = labels + instruction.labels
+            labels = []
+            kept.append(instruction)
+        end[:0] = labels
+        code[:] = kept
+
+    def _successors(self, code, indexes, i):
+        """
+            Indexes the instruction at i can continue at, len(code) for the
+            end of the program or code outside of it. BX is followed by none.
+        """
+        instruction = code[i]
+        if instruction.name in BRANCH_OPS:
+            target = indexes[instruction.value] if isinstance(instruction.value, str) else len(code)
+            return [target] if instruction.name in ("B", "BL") else [target, i + 1]
+        if instruction.name == "BX" or (instruction.name == "SWI" and instruction.value == 1):
+            return []
+        return [i + 1]
+
+    # Every pass returns the indexes of the instructions to remove, or None when it only changed instructions in place
+
+    def _fold(self, code, indexes):
+        known = {}
+        folded = False
+        for i, instruction in enumerate(code):
+            if instruction.labels or (i and (code[i - 1].name in BRANCH_OPS or code[i - 1].name in ("BX", "SWI"))):
+                known = {} # A basic block starts here
+            name = instruction.name
+            if name == "MVI" and not isinstance(instruction.value, str):
+                known[instruction.registers[0]] = instruction.value
+                continue
+            if name in ("ADD", "SUB") and instruction.registers[1] in known and instruction.registers[2] in known:
+                a, b = known[instruction.registers[1]], known[instruction.registers[2]]
+                value = a + b if name == "ADD" else a - b
+                if 0 <= value <= 0xFFFFFFFF: # What an MVI can hold
+                    register = instruction.registers[0]
+                    instruction.name, instruction.registers, instruction.value = "MVI", (register,), value
+                    instruction.args = [f"R{register}", str(value)]
+                    known[register] = value
+                    folded = True
+                    continue
+            if name == "SWI":
+                known = {}
+            known.pop(instruction.writes(), None)
+        return None if folded else set()
+
+    def _identity_moves(self, code, indexes):
+        return {i for i, instruction in enumerate(code) if instruction.name == "MOV" and instruction.registers[0] == instruction.registers[1]}
+
+    def _thread(self, code, indexes):
+        threaded = False
+        for instruction in code:
+            if instruction.name not in BRANCH_OPS or not isinstance(instruction.value, str):
+                continue
+            label, seen = instruction.value, set()
+            while indexes[label] < len(code) and code[indexes[label]].name == "B" and isinstance(code[indexes[label]].value, str) and label not in seen:
+                seen.add(label)
+                label = code[indexes[label]].value
+            if label != instruction.value:
+                instruction.value, instruction.args = label, [label]
+                threaded = True
+        return None if threaded else set()
+
+    def _branches_to_next(self, code, indexes):
+        return {i for i, instruction in enumerate(code)
+                if (instruction.name == "B" or instruction.name in CONDITIONAL_OPS) and isinstance(instruction.value, str) and indexes[instruction.value] == i + 1}
+
+    def _unreachable(self, code, indexes):
+        if any(instruction.name in BRANCH_OPS and not isinstance(instruction.value, str) for instruction in code):
+            return set() # The code outside may come back anywhere
+        # BX only goes back after a BL or to a label loaded into a register
+        entries = {0} | {i + 1 for i, instruction in enumerate(code) if instruction.name == "BL"}
+        entries |= {indexes[instruction.value] for instruction in code if instruction.name in IMMEDIATE_OPS and isinstance(instruction.value, str) and instruction.value in indexes}
+        reached, stack = set(), [i for i in entries if i < len(code)]
+        while stack:
+            i = stack.pop()
+            if i in reached:
+                continue
+            reached.add(i)
+            stack += [j for j in self._successors(code, indexes, i) if j < len(code)]
+        return set(range(len(code))) - reached
+
+    def _dead_writes(self, code, indexes):
+        successors = [self._successors(code, indexes, i) for i in range(len(code))]
+        live_in = [set() for _ in code]
+        live_out = [set() for _ in code]
+        changed = True
+        while changed:
+            changed = False
+            for i in reversed(range(len(code))):
+                if code[i].name == "BX":
+                    out = set(ALL_REGISTERS)
+                else:
+                    out = set().union(*(live_in[j] if j < len(code) else ALL_REGISTERS for j in successors[i]))
+                written = code[i].writes()
+                live = code[i].reads() | (out - {written})
+                if out != live_out[i] or live != live_in[i]:
+                    live_out[i], live_in[i] = out, live
+                    changed = True
+        return {i for i, instruction in enumerate(code) if instruction.name in REMOVABLE_OPS and instruction.writes() not in live_out[i]}
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Report how much shorter the optimizer makes osX assembly programs.")
+    parser.add_argument('sources', nargs='+', help="assembly files")
+    parser.add_argument('-l', '--loader', type=int, default=0, help="address the programs are loaded at")
+    parser.add_argument('-w', '--write', action='store_true', help="also write the optimized .osx programs next to the sources")
+    args = parser.parse_args(args)
+
+    optimizer = Optimizer()
+    assembler = Assembler(optimizer)
+    for source in args.sources:
+        if args.write:
+            assembler.assemble_file(source, args.loader)
+        else:
+            with open(source) as f:
+                assembler.assemble(f.read(), args.loader, source)
+    print(optimizer.report())
+
+
+if __name__ == '__main__':
+    main()
@@ -14,10 +14,17 @@ class PCB:
 
         # States
         self.state = state
+        self.priority = 0 # Lower values run first under Priority scheduling
+        self.burst_estimate = None # Estimated next CPU burst, used by SJF
+        self.level = 0 # Multi-level feedback queue level
+        self.level_history = [] # (time, level) each time the process entered a level
+        self.level_time = {} # level -> time units run at that level
         # self.states = ['NEW', 'READY', 'RUNNING', 'WAITING', 'TERMINATED']
 
         # Code Sections
         self.loader = None
+        self.base = None # Physical address the image was placed at, the loader unless it was relocated
+        self.page_table = None # Set instead of base when memory is paged
         self.byte_size = None
         self.data_start = None
         self.data_end = None
@@ -32,6 +39,10 @@ class PCB:
         self.execution_time = 0
         self.response_time = None
         self.turnaround_time = None
+        self.preemptions = 0
+        self.page_faults = 0
+        self.page_fault_time = 0 # Clock ticks spent loading pages on demand
+        self.cow_copies = 0 # Pages copied on the first write after a fork
 
         # Children
         self.children = []
@@ -62,6 +73,10 @@ class PCB:
         if self.response_time == None:
             self.response_time = self.start_time - self.arrival_time
 
+    def preempted(self):
+        self.state = PCBState.READY
+        self.preemptions += 1
+
     def waiting(self):
         self.state = PCBState.WAITING
 
@@ -71,6 +86,18 @@ class PCB:
         self.turnaround_time = self.end_time - self.arrival_time
         self.waiting_time = self.turnaround_time - self.execution_time
 
+    def relocation(self):
+        """ Offset the CPU adds to every address, from where the program was compiled for to where it is. """
+        if self.base is None:
+            return 0
+        return self.base - self.loader
+
+    def mapping(self):
+        """ How the program's addresses map to physical memory, its page table or its relocation. """
+        if self.page_table is not None:
+            return self.page_table
+        return self.relocation()
+
     def set_arrival_time(self, time):    
         self.arrival_time = time
 
@@ -80,12 +107,17 @@ class PCB:
     def make_child(self, pid, pc):
         child = PCB(pid, pc, self.registers.copy(), self.state)
         child.loader = self.loader
+        child.base = self.base
+        child.page_table = self.page_table
         child.byte_size = self.byte_size
         child.data_start = self.data_start
         child.data_end = self.data_end
         child.code_start = self.code_start
         child.code_end = self.code_end
         child.file = self.file + " (child)"
+        child.priority = self.priority
+        child.burst_estimate = self.burst_estimate
+        child.level = self.level
 
         self.add_child(child)
 
@@ -0,0 +1,249 @@
+import heapq
+from constants import PCBState
+from hardware.Memory import MemoryAccessError
+from hardware.PageTable import PageTable
+
+try:
+    from .MemoryManager import MemoryManager
+except ImportError:
+    from MemoryManager import MemoryManager
+
+
+class PagedMemoryManager(MemoryManager):
+    """
+        Memory manager for paged memory. Memory is split into fixed size
+        frames and every page of a program gets any free frame, so a program
+        fits whenever there are enough free frames and never has to wait for
+        a contiguous hole. The lowest free frame is handed out first.
+
+        With demand paging nothing is read when a program is loaded. Each
+        page is read from the program's .osx file the first time it is used,
+        which costs page_fault_cost clock ticks. When no frame is free the
+        oldest clean page is dropped, since it can be read again from the file.
+
+        A forked child gets a copy of its parent's page table, with every page
+        shared copy-on-write. A frame is freed once no page table maps it.
+    """
+    def __init__(self, system, size, page_size=64, demand_paging=False, page_fault_cost=10, backend=None, path=None):
+        super().__init__(system, size, backend=backend, path=path)
+        self.page_size = page_size
+        PageTable(page_size) # Validates the page size
+        self.demand_paging = demand_paging
+        self.page_fault_cost = page_fault_cost
+        self.free_frames = list(range(self.memory.size // page_size)) # Min-heap of free frames
+        self.resident = {} # pid -> pcb owning a page table
+        self.images = {} # page table -> (filepath, loader, byte_size, code_start, code_end) of its program
+        self.loaded = {} # frame -> [(page table, page)] mapping it, oldest frame first
+
+    def pages_needed(self, pcb):
+        return len(range(pcb.loader // self.page_size, (pcb.loader + pcb.byte_size - 1) // self.page_size + 1))
+
+    def check_memory_available(self, pcb, swappable=()):
+        needed = self.pages_needed(pcb)
+        if self.demand_paging:
+            # Pages come and go while it runs, the program only has to fit in memory by itself
+            return needed <= self.memory.size // self.page_size
+
+        return len(self.free_frames) + self.reclaimable(swappable) >= needed
+
+    def reclaimable(self, swappable=()):
+        """ Frames that only terminated processes map, freed by reclaim, and the processes in swappable once swapped out. """
+        dead = {owner.page_table for owner in self.resident.values() if owner.state == PCBState.TERMINATED}
+        dead.update(process.page_table for process in swappable)
+        return sum(1 for mappings in self.loaded.values() if all(page_table in dead for page_table, _ in mappings))
+
+    def reclaim(self):
+        """ Terminated processes keep their memory until the space is needed. """
+        for owner in list(self.resident.values()):
+            if owner.state == PCBState.TERMINATED:
+                self.free_memory(owner)
+
+    def allocate_memory(self, pcb):
+        """ Map every page of the program to a free frame, or none of them with demand paging. """
+        # A process that execs a new program gives up its old pages
+        if self.resident.get(pcb.pid) is pcb:
+            self.free_memory(pcb)
+
+        if not self.check_memory_available(pcb):
+            return False
+        if not self.demand_paging and len(self.free_frames) < self.pages_needed(pcb):
+            self.reclaim()
+
+        page_table = PageTable(self.page_size)
+        if not self.demand_paging:
+            for page in page_table.pages(pcb.loader, pcb.loader + pcb.byte_size - 1):
+                self._map(page_table, page, heapq.heappop(self.free_frames))
+        pcb.page_table = page_table
+        self.resident[pcb.pid] = pcb
+        self.images[page_table] = (pcb.file, pcb.loader, pcb.byte_size, pcb.code_start, pcb.code_end)
+        return True
+
+    def load_to_memory(self, pcb):
+        if not self.demand_paging:
+            return super().load_to_memory(pcb)
+
+        if not self.allocate_memory(pcb):
+            self.system_code(102, f"Failed to allocate memory for {pcb.file}")
+            return None
+        if self.instruction_cache is not None:
+            self.instruction_cache.load(pcb.code_start, pcb.code_end, pcb.page_table)
+        self.system.print(f"Mapped {pcb.file}, pages are loaded on first use")
+        return True
+
+    def write_image(self, pcb, data):
+        page_table = pcb.page_table
+        for start, end, offset in page_table.segments(pcb.loader, pcb.loader + len(data) - 1):
+            self.memory[start:end + 1] = data[start - offset - pcb.loader:end + 1 - offset - pcb.loader]
+
+    def read_image(self, pcb):
+        """ A copy of pcb's image, None if any of it is shared copy-on-write or not loaded. """
+        if self.resident.get(pcb.pid) is not pcb or pcb.page_table.cow:
+            return None
+        data = pcb.page_table.read(self.memory.view, pcb.loader, pcb.byte_size)
+        return bytes(data) if data is not None else None
+
+    def regions(self):
+        """ (pcb, start, end) of each run of frames holding part of a process's image, by pid. """
+        regions = []
+        for pid in sorted(self.resident):
+            pcb = self.resident[pid]
+            for start, end, _ in pcb.page_table.segments(pcb.loader, pcb.loader + pcb.byte_size - 1):
+                regions.append((pcb, start, end + 1))
+        return regions
+
+    def fork(self, parent, child):
+        """ Give child a copy of parent's page table, sharing every mapped page copy-on-write. """
+        page_table = parent.page_table
+        if page_table not in self.images:
+            return
+
+        child_table = page_table.copy()
+        for page, frame in page_table:
+            self.loaded[frame].append((child_table, page))
+        page_table.cow.update(page_table.frames)
+        child_table.cow.update(child_table.frames)
+
+        child.page_table = child_table
+        self.resident[child.pid] = child
+        self.images[child_table] = self.images[page_table]
+        self.system.print(f"Forked {child} sharing {len(child_table)} pages copy-on-write")
+
+    def copy_on_write(self, pcb, page):
+        """ Give pcb a frame of its own for page before it is written. Returns the frame. """
+        page_table = pcb.page_table
+        page_table.cow.discard(page)
+        frame = page_table.lookup(page)
+        mappings = self.loaded[frame]
+        if len(mappings) == 1:
+            return frame # Every other page table let go of it already
+
+        new_frame = self._free_frame(page_table, page)
+        if new_frame is None:
+            raise MemoryAccessError(f"No frame can be freed to copy page {page}")
+        start, new_start = frame * self.page_size, new_frame * self.page_size
+        self.memory[new_start:new_start + self.page_size] = self.memory[start:start + self.page_size]
+
+        mappings.remove((page_table, page))
+        self._map(page_table, page, new_frame)
+        self._refresh_code(page_table, page)
+        pcb.cow_copies += 1
+        self.system.print(f"Copy-on-write: copied page {page} of {pcb} into frame {new_frame}")
+        return new_frame
+
+    def page_fault(self, pcb, page):
+        """
+            Map page of the running pcb. Returns its frame and the clock ticks
+            the fault took, or raises MemoryAccessError if the page is not part
+            of the program or no frame can be freed for it.
+        """
+        page_table = pcb.page_table
+        if not self.demand_paging or page_table not in self.images:
+            raise MemoryAccessError(f"Page fault on page {page}")
+
+        filepath, loader, byte_size, _, _ = self.images[page_table]
+        if page not in page_table.pages(loader, loader + byte_size - 1):
+            raise MemoryAccessError(f"Page fault on page {page}, outside of {filepath}")
+
+        frame = self._free_frame(page_table, page)
+        if frame is None:
+            raise MemoryAccessError(f"No frame can be freed for page {page}")
+
+        # Read the part of the image on this page, the rest of the frame stays zero
+        first = max(page * self.page_size, loader)
+        last = min((page + 1) * self.page_size, loader + byte_size)
+        data = self.image_cache.get(filepath).body[first - loader:last - loader]
+        physical = frame * self.page_size + first - page * self.page_size
+        self.memory[physical:physical + len(data)] = data
+
+        self._map(page_table, page, frame)
+        self._refresh_code(page_table, page)
+
+        pcb.page_faults += 1
+        pcb.page_fault_time += self.page_fault_cost
+        self.system.print(f"Page fault: loaded page {page} of {pcb} into frame {frame}")
+        return frame, self.page_fault_cost
+
+    def _refresh_code(self, page_table, page):
+        """ Let the instruction cache know page of page_table moved to a new frame. """
+        _, _, _, code_start, code_end = self.images[page_table]
+        first = page * self.page_size
+        last = first + self.page_size - 1
+        if self.instruction_cache is not None and first <= code_end and code_start <= last:
+            self.instruction_cache.refresh(code_start, code_end, page_table, first, last)
+
+    def _map(self, page_table, page, frame):
+        page_table.map(page, frame)
+        self.loaded.setdefault(frame, []).append((page_table, page))
+
+    def _free_frame(self, page_table, page):
+        """ A free frame, reclaiming terminated processes or dropping the oldest clean page if needed. """
+        if not self.free_frames:
+            self.reclaim()
+        if not self.free_frames:
+            for frame, mappings in self.loaded.items():
+                if len(mappings) > 1:
+                    continue # Shared copy-on-write
+                victim_table, victim_page = mappings[0]
+                if victim_page in victim_table.dirty:
+                    continue
+                if victim_table is page_table and victim_page == page - 1:
+                    continue # May hold the first part of the access that faulted
+                self._evict(frame)
+                break
+        if not self.free_frames:
+            return None
+        return heapq.heappop(self.free_frames)
+
+    def _evict(self, frame):
+        """ Drop a clean page, it is read from the program file again when it is next used. """
+        for page_table, page in self.loaded[frame]:
+            page_table.unmap(page)
+            for cpu in self.system.cores:
+                if cpu.page_table is page_table:
+                    cpu.tlb.invalidate(page)
+        self._release_frame(frame)
+
+    def _release_frame(self, frame):
+        del self.loaded[frame]
+        start = frame * self.page_size
+        self.memory.zero(start, start + self.page_size) # Clear memory
+        if self.instruction_cache is not None:
+            self.instruction_cache.drop(start, start + self.page_size - 1)
+        heapq.heappush(self.free_frames, frame)
+
+    def free_memory(self, pcb):
+        """ Unmap the pages of pcb, freeing the frames no other page table maps. """
+        if self.resident.get(pcb.pid) is not pcb:
+            return True # Forked children without paging share their parent's pages
+        del self.resident[pcb.pid]
+
+        page_table = pcb.page_table
+        _, _, _, code_start, code_end = self.images.pop(page_table)
+        if self.instruction_cache is not None:
+            self.instruction_cache.discard(code_start, code_end, page_table)
+        for page, frame in page_table:
+            mappings = self.loaded[frame]
+            mappings.remove((page_table, page))
+            if not mappings:
+                self._release_frame(frame)
+        return True
@@ -1,67 +1,205 @@
 import random
 from constants import PCBState
 
+try:
+    from .SchedulingPolicy import SCHEDULING_POLICIES
+    from .CoreQueues import CoreQueues
+except ImportError:
+    from SchedulingPolicy import SCHEDULING_POLICIES
+    from CoreQueues import CoreQueues
+
 class Scheduler:
-    def __init__(self, system):
+    def __init__(self, system, scheduling_algorithm='FCFS', quantum=None, cores=1):
         self.system = system
-        self.scheduling_algorithms = ['FCFS', 'SJF', 'RR', 'Priority']
-        self.scheduling_algorithm = 'FCFS'
+        self.quantum = quantum # Overrides the policy's own time quantum when set
+        self.cores = cores
+        self.scheduling_algorithms = list(SCHEDULING_POLICIES)
+        self.scheduling_algorithm = scheduling_algorithm
+        self.policy = self._make_policy(scheduling_algorithm)
+        self.idle_time = 0
+        self.metrics = None # Metrics of the last schedule_jobs run
+        self.start_time = 0 # Clock time the last schedule_jobs run started at
+        self.next_snapshot = None # Clock time of the next periodic snapshot, see check_snapshot
+        self.waiting = [] # Arrived jobs that do not fit in memory yet, in arrival order
+        self.memory_freed = False # Set when memory may have been freed since the waiting jobs last tried
+
+    def _make_policy(self, scheduling_algorithm):
+        """ A policy instance, or one per core behind CoreQueues when there are several cores."""
+        policy = SCHEDULING_POLICIES[scheduling_algorithm]
+        if self.cores > 1:
+            return CoreQueues([policy() for _ in range(self.cores)])
+        return policy()
+
+    def set_algorithm(self, scheduling_algorithm):
+        """ Switch to another scheduling policy, moving the ready queue over to it."""
+        if scheduling_algorithm not in SCHEDULING_POLICIES:
+            self.system.system_code(103, f"Unknown scheduling algorithm: {scheduling_algorithm}. Choose from {', '.join(self.scheduling_algorithms)}")
+            return False
+
+        policy = self._make_policy(scheduling_algorithm)
+        for pcb in self.policy:
+            policy.enqueue(pcb)
+        self.scheduling_algorithm = scheduling_algorithm
+        self.policy = policy
+        self.system.ready_queue = policy
+        return True
 
 
-    def schedule_jobs(self):
-        """ Schedule jobs in the system."""
-        start_time = self.system.clock.time
-        self._sort_ready_queue()
+    def schedule_jobs(self, resume=False):
+        """ Schedule jobs in the system. When resuming a restored snapshot, the run it was taken in carries on."""
+        if resume:
+            self._schedule()
+            return
+        self.start_time = self.system.clock.time
+        if self.system.snapshot_interval:
+            self.next_snapshot = self.start_time + self.system.snapshot_interval
+        self.idle_time = 0
+        for core in self.system.cores:
+            core.context_switches = 0
+            core.context_switch_time = 0
+            core.busy_time = 0
+            if self.system.paging:
+                core.tlb.hits = 0
+                core.tlb.misses = 0
+        if not self.system.paging:
+            self.system.memory_manager.compactions = 0
+            self.system.memory_manager.compaction_time = 0
+            self.system.memory_manager.bytes_compacted = 0
+            self.system.memory_manager.reset_fragmentation_totals()
+        self._schedule()
+
+    def _schedule(self):
+        if len(self.system.cores) > 1:
+            self.schedule_jobs_lockstep()
+            self.print_metrics(self.start_time)
+            return
 
         while self.jobs_in_any_queue(): # If theres programs one of the queues
+            self.check_snapshot()
             self.print_time()
             self.check_new_jobs()
             self.check_io_complete()
 
-            # Run the next job in the ready queue, FCFS
+            # Run the next job picked by the scheduling policy
             if self.jobs_in_ready_queue():
                 pcb = self.schedule_job()
                 self.handle_process_state(pcb)
                 if self.system.verbose:
                     self.system.display_state_table()
             else:
-                # If no job is ready increment clock
-                self.system.clock += 1
-                self.system.print("No jobs ready to run")
-        self.print_metrics(start_time)
-        
+                # If no job is ready skip ahead to the next arrival or I/O completion
+                self.fast_forward()
+        self.print_metrics(self.start_time)
+
+    def check_snapshot(self):
+        """ Snapshot the system every snapshot_interval clock ticks, between processes."""
+        if self.next_snapshot is not None and self.system.clock.time >= self.next_snapshot:
+            self.next_snapshot = self.system.clock.time + self.system.snapshot_interval # Saved with the snapshot
+            self.system.snapshot()
+
+
+    def schedule_jobs_lockstep(self):
+        """
+            Schedule jobs on several cores sharing the clock. Every tick each
+            core with a process runs one instruction, then the clock advances.
+        """
+        cores = self.system.cores
+        running = [None] * len(cores) # (pcb, execution time when dispatched) per core
+
+        while self.jobs_in_any_queue() or any(running):
+            if not any(running):
+                self.check_snapshot()
+            self.check_new_jobs()
+            self.check_io_complete()
+
+            if any(running[i] is None for i in range(len(cores))) and self.jobs_in_ready_queue():
+                self.print_time()
+                self.policy.age(self.system.clock.time)
+                for i, core in enumerate(cores):
+                    if running[i] is None and self.jobs_in_ready_queue():
+                        pcb = self.policy.dequeue(i)
+                        pcb.ready(self.system.clock.time)
+                        pcb.running()
+                        self.system.print(f"\nScheduling {pcb} on core {i}")
+                        core.dispatch(pcb, self.system.verbose, self.time_quantum(pcb))
+                        running[i] = (pcb, pcb.execution_time)
+                        self.policy.busy[i] = True
+
+            if not any(running):
+                # If no job is ready skip ahead to the next arrival or I/O completion
+                self.fast_forward()
+                continue
+
+            for i, core in enumerate(cores):
+                if running[i] is None:
+                    continue
+                core.busy_time += 1
+                if not core.step():
+                    pcb, execution_time = running[i]
+                    running[i] = None
+                    self.policy.busy[i] = False
+                    self.policy.update(pcb, pcb.execution_time - execution_time, self.system.clock.time)
+                    self.handle_process_state(pcb)
+
+            self.system.clock += 1
+
+    def next_event_time(self):
+        """ Earliest future job arrival or I/O completion, None if there is none. Due ones have already been taken out."""
+        events = [self.system.job_queue.next_key(), self.system.io_queue.next_key()]
+        return min([time for time in events if time is not None], default=None)
+
+    def fast_forward(self):
+        """ Move the clock to the next event, counting the jump as idle time."""
+        next_time = self.next_event_time()
+        idle = next_time - self.system.clock.time if next_time is not None else 1
+        self.system.clock += idle
+        self.idle_time += idle
+        self.system.print(f"No jobs ready to run, idle for {idle} time units")
 
     def check_new_jobs(self):
         """ Move jobs from job queue to ready queue, if current time is past programs arrival time."""
-        i = 0
-        while i < len(self.system.job_queue): # Iterate through job queue
-            pcb = self.system.job_queue[i]
-            if self.system.clock.time < pcb.arrival_time: # Once we find a job that has not arrived yet, break out of loop
-                break
+        arrived = self.system.job_queue.pop_due(self.system.clock.time) # Jobs that have arrived, in arrival order
+        if self.memory_freed and self.waiting:
+            # Jobs waiting for memory only fit once some was freed, they go in arrival order with the new ones
+            arrived = sorted(arrived + self.waiting, key=lambda pcb: pcb.arrival_time)
+            self.waiting = []
+        self.memory_freed = False
 
+        for i, pcb in enumerate(arrived):
             # Ensure memory is available without overlapping with other processes
-            if self.system.handle_check_memory_available(pcb):
-                if self.system.handle_load_to_memory(pcb):
-                    self.system.ready_queue.append(self.system.job_queue.pop(i)) # move job from job queue to ready queue
-                else:
-                    self.system.print(f"Error loading {pcb} to memory")
-                    return None
+            if not self.system.handle_check_memory_available(pcb) and not self.make_room(pcb):
+                self.waiting.append(pcb) # keep waiting for memory
+                continue
+
+            if self.system.handle_load_to_memory(pcb):
+                self.system.ready_queue.enqueue(pcb) # move job from job queue to ready queue
             else:
-                i += 1
+                self.system.print(f"Error loading {pcb} to memory")
+                self.waiting = sorted(self.waiting + arrived[i:], key=lambda pcb: pcb.arrival_time)
+                self.memory_freed = True # Tried again on the next tick
+                return None
         
 
+    def make_room(self, pcb):
+        """ Swap out processes blocked on I/O to fit pcb in memory, when swapping is on."""
+        return self.system.swapper is not None and self.system.swapper.make_room(pcb)
+
     def schedule_job(self):
         """ Schedule the next job in the ready queue."""
-        pcb = self.system.ready_queue.pop(0)
+        self.policy.age(self.system.clock.time)
+        pcb = self.policy.dequeue()
         pcb.ready(self.system.clock.time) # mark it as ready
         self.system.print(f"\nScheduling {pcb}")
-        self.system.run_pcb(pcb)
+        execution_time = pcb.execution_time
+        self.system.run_pcb(pcb, self.time_quantum(pcb))
+        self.policy.update(pcb, pcb.execution_time - execution_time, self.system.clock.time)
         return pcb
-        
-        
-    def _sort_ready_queue(self):
-        """ Sort the ready queue by arrival time."""
-        self.system.ready_queue.sort(key=lambda x: x.arrival_time)
+
+    def time_quantum(self, pcb):
+        """ Number of instructions pcb may run before it is preempted, None for no limit."""
+        if self.quantum is not None:
+            return self.quantum
+        return self.policy.time_quantum(pcb)
 
     def handle_process_state(self, pcb):
         """ Handle the state of the process after running."""
@@ -69,13 +207,15 @@ class Scheduler:
             if pcb.state == PCBState.TERMINATED:
                 # self.system.handle_free_memory(pcb)
                 self.system.terminated_queue.append(pcb)
+                self.memory_freed = True # Its memory is reclaimed when a waiting job needs it
             elif pcb.state == PCBState.WAITING:
+                self.memory_freed = self.memory_freed or self.system.swapper is not None # It can be swapped out now
                 wait_until = self.system.clock.time + random.randint(1, 50)
                 pcb.wait_until = wait_until
                 self.system.print(f"{pcb} waiting until {wait_until}")
-                self.system.io_queue.append(pcb)
+                self.system.io_queue.push(pcb)
             elif pcb.state == PCBState.READY:
-                self.system.ready_queue.append(pcb)
+                self.system.ready_queue.enqueue(pcb)
             else:
                 self.system.print(f"Error: Invalid state {pcb.state} for {pcb}")
             
@@ -89,18 +229,81 @@ class Scheduler:
     
     def jobs_in_any_queue(self):
         """ Check if there are jobs in the system."""
-        return self.system.job_queue or self.system.ready_queue or self.system.io_queue
+        swapped = self.system.swapper is not None and self.system.swapper.pending
+        return self.system.job_queue or self.waiting or self.system.ready_queue or self.system.io_queue or swapped
 
     def check_io_complete(self):
-        for i, pcb in enumerate(self.system.io_queue):
-            if self.system.clock.time >= pcb.wait_until:
-                self.system.io_queue.pop(i)
-                self.system.ready_queue.append(pcb)
-                self.system.print(f"IO complete for {pcb}")
+        """ Move processes whose I/O has completed to the ready queue, in completion order."""
+        completed = self.system.io_queue.pop_due(self.system.clock.time)
+        if self.system.swapper is not None:
+            completed = self.system.swapper.io_complete(completed) # Swapped out processes come back in first
+        for pcb in completed:
+            self.system.ready_queue.enqueue(pcb)
+            self.system.print(f"IO complete for {pcb}")
 
-    def print_metrics(self, start_time):
+    def compute_metrics(self, start_time):
+        """ Metrics of the jobs that ran since start_time, as a dict."""
         end_time = self.system.clock.time
-        n_jobs = len(self.system.terminated_queue)
-        total_waiting_time = sum([pcb.waiting_time for pcb in self.system.terminated_queue])
-        average_waiting_time = total_waiting_time / n_jobs
-        print(f"\n{n_jobs} jobs completed in {end_time - start_time} time units (start: {start_time}, end: {end_time})\nThroughput: {n_jobs / (end_time - start_time)}\nAverage waiting time: {average_waiting_time}")
+        terminated = self.system.terminated_queue
+        n_jobs = len(terminated)
+        elapsed = end_time - start_time
+        metrics = {
+            'algorithm': self.scheduling_algorithm,
+            'jobs': n_jobs,
+            'start': start_time,
+            'end': end_time,
+            'elapsed': elapsed,
+            'throughput': n_jobs / elapsed,
+            'average_waiting_time': sum([pcb.waiting_time for pcb in terminated]) / n_jobs,
+            'average_turnaround_time': sum([pcb.turnaround_time for pcb in terminated]) / n_jobs,
+            'average_response_time': sum([pcb.response_time for pcb in terminated]) / n_jobs,
+            'idle_time': self.idle_time,
+            'utilization': (elapsed - self.idle_time) / elapsed,
+            'preemptions': sum([pcb.preemptions for pcb in terminated]),
+            'context_switches': sum([core.context_switches for core in self.system.cores]),
+            'context_switch_time': sum([core.context_switch_time for core in self.system.cores]),
+        }
+        if self.system.paging:
+            metrics['tlb_hits'] = sum([core.tlb.hits for core in self.system.cores])
+            metrics['tlb_misses'] = sum([core.tlb.misses for core in self.system.cores])
+            metrics['page_faults'] = sum([pcb.page_faults for pcb in terminated])
+            metrics['page_fault_time'] = sum([pcb.page_fault_time for pcb in terminated])
+            metrics['cow_copies'] = sum([pcb.cow_copies for pcb in terminated])
+        if not self.system.paging:
+            memory_manager = self.system.memory_manager
+            samples = memory_manager.fragmentation_samples
+            totals = memory_manager.fragmentation_totals if samples else memory_manager.fragmentation()
+            samples = samples or 1
+            metrics['compactions'] = memory_manager.compactions
+            metrics['compaction_time'] = memory_manager.compaction_time
+            metrics['bytes_compacted'] = memory_manager.bytes_compacted
+            metrics['average_holes'] = totals['holes'] / samples
+            metrics['average_largest_hole'] = totals['largest_hole'] / samples
+            metrics['average_memory_utilization'] = totals['utilization'] / samples
+        if self.system.swapper is not None:
+            metrics['swap_outs'] = self.system.swapper.swap_outs
+            metrics['swap_ins'] = self.system.swapper.swap_ins
+            metrics['swap_bytes_out'] = self.system.swapper.bytes_out
+            metrics['swap_bytes_in'] = self.system.swapper.bytes_in
+        if len(self.system.cores) > 1:
+            metrics['core_utilization'] = [core.busy_time / elapsed for core in self.system.cores]
+            metrics['steals'] = self.policy.steals
+        return metrics
+
+    def print_metrics(self, start_time):
+        self.metrics = metrics = self.compute_metrics(start_time)
+        print(f"\nScheduling algorithm: {metrics['algorithm']}")
+        print(f"{metrics['jobs']} jobs completed in {metrics['elapsed']} time units (start: {metrics['start']}, end: {metrics['end']})\nThroughput: {metrics['throughput']}\nAverage waiting time: {metrics['average_waiting_time']}\nAverage turnaround time: {metrics['average_turnaround_time']}\nAverage response time: {metrics['average_response_time']}\nIdle time: {metrics['idle_time']}\nCPU utilization: {metrics['utilization']}\nPreemptions: {metrics['preemptions']}\nContext switches: {metrics['context_switches']} (overhead: {metrics['context_switch_time']} time units)")
+        if self.system.paging:
+            print(f"TLB hits: {metrics['tlb_hits']}, misses: {metrics['tlb_misses']}")
+            print(f"Page faults: {metrics['page_faults']} (latency: {metrics['page_fault_time']} time units)")
+            print(f"Copy-on-write copies: {metrics['cow_copies']}")
+        if not self.system.paging:
+            print(f"Compactions: {metrics['compactions']} ({metrics['bytes_compacted']} bytes moved, overhead: {metrics['compaction_time']} time units)")
+            print(f"Average holes: {metrics['average_holes']}, average largest hole: {metrics['average_largest_hole']}, average memory utilization: {metrics['average_memory_utilization']}")
+        if self.system.swapper is not None:
+            print(f"Swap outs: {metrics['swap_outs']} ({metrics['swap_bytes_out']} bytes), swap ins: {metrics['swap_ins']} ({metrics['swap_bytes_in']} bytes)")
+        if len(self.system.cores) > 1:
+            for i, utilization in enumerate(metrics['core_utilization']):
+                print(f"Core {i} utilization: {utilization}")
+            print(f"Work steals: {metrics['steals']}")
@@ -0,0 +1,194 @@
+from collections import deque
+from constants import PCBState
+
+try:
+    from .EventQueue import EventQueue
+except ImportError:
+    from EventQueue import EventQueue
+
+
+class SchedulingPolicy:
+    """
+        A scheduling algorithm together with the ready queue it picks from.
+        enqueue, dequeue and peek are O(1) or O(log n).
+    """
+    name = None
+    quantum = None # Instructions a process may run before it is preempted, None to never preempt
+
+    def enqueue(self, pcb):
+        raise NotImplementedError("Each policy must implement its own enqueue method")
+
+    def dequeue(self):
+        raise NotImplementedError("Each policy must implement its own dequeue method")
+
+    def peek(self):
+        raise NotImplementedError("Each policy must implement its own peek method")
+
+    def remove(self, pcb):
+        """ Take pcb out of the ready queue. Raises ValueError if it is not in it."""
+        self.queue.remove(pcb)
+
+    def time_quantum(self, pcb):
+        """ Time quantum for the next run of pcb."""
+        return self.quantum
+
+    def update(self, pcb, burst, time):
+        """ Called at time, after pcb has run on the CPU for burst time units."""
+        pass
+
+    def age(self, time):
+        """ Called at time, before the next process is picked."""
+        pass
+
+    def __len__(self):
+        return len(self.queue)
+
+    def __iter__(self):
+        return iter(self.queue)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class FCFSPolicy(SchedulingPolicy):
+    """ First come first served, the ready queue is a FIFO deque."""
+    name = 'FCFS'
+
+    def __init__(self):
+        self.queue = deque()
+
+    def enqueue(self, pcb):
+        self.queue.append(pcb)
+
+    def dequeue(self):
+        return self.queue.popleft()
+
+    def peek(self):
+        return self.queue[0]
+
+
+class RoundRobinPolicy(FCFSPolicy):
+    """ Round robin, processes that use up their quantum go to the back of the deque."""
+    name = 'RR'
+
+    def __init__(self, quantum=10):
+        super().__init__()
+        self.quantum = quantum
+
+
+class ShortestJobFirstPolicy(SchedulingPolicy):
+    """
+        Shortest job first, keyed on each process's estimated next CPU burst.
+        The estimate starts at the number of instructions in the program and
+        is then an exponential average of the bursts it actually ran.
+    """
+    name = 'SJF'
+
+    def __init__(self, alpha=0.5):
+        self.alpha = alpha
+        self.queue = EventQueue('burst_estimate')
+
+    def enqueue(self, pcb):
+        if pcb.burst_estimate is None:
+            pcb.burst_estimate = (pcb.code_end - pcb.code_start + 1) // 6
+        self.queue.push(pcb)
+
+    def dequeue(self):
+        return self.queue.pop()
+
+    def peek(self):
+        return self.queue.peek()
+
+    def update(self, pcb, burst, time):
+        pcb.burst_estimate = self.alpha * burst + (1 - self.alpha) * pcb.burst_estimate
+
+
+class PriorityPolicy(SchedulingPolicy):
+    """ Priority scheduling, the lowest pcb.priority value runs first."""
+    name = 'Priority'
+
+    def __init__(self):
+        self.queue = EventQueue('priority')
+
+    def enqueue(self, pcb):
+        self.queue.push(pcb)
+
+    def dequeue(self):
+        return self.queue.pop()
+
+    def peek(self):
+        return self.queue.peek()
+
+
+class MultilevelFeedbackQueuePolicy(SchedulingPolicy):
+    """
+        Multi-level feedback queue, one deque per level with its own quantum.
+        A process that uses up its whole quantum moves down a level, one that
+        blocks for I/O moves up a level. Every aging_interval time units all
+        processes are moved back to the top level so none of them starve.
+    """
+    name = 'MLFQ'
+
+    def __init__(self, quanta=(5, 10, 20), aging_interval=200):
+        self.quanta = quanta
+        self.aging_interval = aging_interval
+        self.levels = [deque() for _ in quanta]
+        self.last_aging = 0
+
+    def enqueue(self, pcb):
+        if not pcb.level_history:
+            pcb.level_history.append((pcb.arrival_time, pcb.level))
+        self.levels[pcb.level].append(pcb)
+
+    def dequeue(self):
+        for level in self.levels:
+            if level:
+                return level.popleft()
+        raise IndexError("dequeue from an empty ready queue")
+
+    def peek(self):
+        for level in self.levels:
+            if level:
+                return level[0]
+        raise IndexError("peek at an empty ready queue")
+
+    def remove(self, pcb):
+        self.levels[pcb.level].remove(pcb)
+
+    def time_quantum(self, pcb):
+        return self.quanta[pcb.level]
+
+    def update(self, pcb, burst, time):
+        pcb.level_time[pcb.level] = pcb.level_time.get(pcb.level, 0) + burst
+
+        if pcb.state == PCBState.READY and burst >= self.quanta[pcb.level]:
+            self._move(pcb, min(pcb.level + 1, len(self.levels) - 1), time)
+        elif pcb.state == PCBState.WAITING:
+            self._move(pcb, max(pcb.level - 1, 0), time)
+
+    def age(self, time):
+        if time - self.last_aging < self.aging_interval:
+            return
+        self.last_aging = time
+
+        for level in self.levels[1:]:
+            while level:
+                pcb = level.popleft()
+                self._move(pcb, 0, time)
+                self.levels[0].append(pcb)
+
+    def _move(self, pcb, level, time):
+        if level != pcb.level:
+            pcb.level = level
+            pcb.level_history.append((time, level))
+
+    def __len__(self):
+        return sum(len(level) for level in self.levels)
+
+    def __iter__(self):
+        return (pcb for level in self.levels for pcb in level)
+
+
+SCHEDULING_POLICIES = {
+    policy.name: policy for policy in (FCFSPolicy, ShortestJobFirstPolicy, RoundRobinPolicy, PriorityPolicy, MultilevelFeedbackQueuePolicy)
+}
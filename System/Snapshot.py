@@ -0,0 +1,133 @@
+import mmap
+import os
+import pickle
+import random
+import struct
+from hardware.Memory import Memory
+from hardware.MemoryDump import MemoryDump
+
+
+def fields(obj, exclude=()):
+    """ The attributes of obj, other than the ones in exclude. """
+    return {name: value for name, value in vars(obj).items() if name not in exclude}
+
+
+class Snapshot:
+    """
+        A saved System that can be restored later to carry on where it was.
+
+        A snapshot file is a header, the pickled state of the System (clock,
+        processes and queues, scheduler, memory manager, CPUs, error log...)
+        and then its memory as one raw block starting on a page boundary:
+            header  magic b'OSXS', version, flags, state length,
+                    memory offset, memory size                    (HEADER)
+        Restoring maps the block copy-on-write instead of reading it, so it
+        costs the same for any memory size and the file is never changed.
+        Sparse memories are stored as a MemoryDump of what was written
+        instead, flagged with SPARSE.
+
+        The System is rebuilt from the options it was created with, so the
+        instruction cache and translated blocks start out empty.
+    """
+    MAGIC = b'OSXS'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHHQQQ')
+    SPARSE = 1
+
+    def __init__(self, options, state, memory):
+        self.options = options
+        self.state = state
+        self.memory = memory
+
+    @classmethod
+    def capture(cls, system):
+        """ The state of system, without its memory. """
+        memory_manager = system.memory_manager
+        state = {
+            'clock': system.clock.time,
+            'pid': system.pid,
+            'errors': system.errors,
+            'random': random.getstate(),
+            'job_queue': system.job_queue,
+            'io_queue': system.io_queue,
+            'terminated_queue': system.terminated_queue,
+            'scheduler': fields(system.scheduler, ('system',)),
+            'memory_manager': fields(memory_manager, ('system', 'memory', 'instruction_cache', 'image_cache')),
+            'cores': [{name: getattr(core, name) for name in core.saved_state if hasattr(core, name)} for core in system.cores],
+            'swapper': None,
+        }
+        swapper = system.swapper
+        if swapper is not None:
+            state['swapper'] = fields(swapper, ('system', 'memory_manager', 'policy', 'file', 'store'))
+            state['swapped'] = {pid: swapper.store[start:start + length] for pid, (start, length) in swapper.slots.items()}
+        return state
+
+    @classmethod
+    def save(cls, system, path):
+        """ Write a snapshot of system to path. """
+        options = dict(system.options, memory_size=system.memory.size, memory_file=None)
+        state = pickle.dumps((options, cls.capture(system)), protocol=pickle.HIGHEST_PROTOCOL)
+        memory = system.memory
+        sparse = memory.backend == 'sparse'
+        granularity = mmap.ALLOCATIONGRANULARITY # Where a mapping may start
+        offset = -(-(cls.HEADER.size + len(state)) // granularity) * granularity
+
+        temporary = path + '.tmp' # Replaced in one go, a system restored from path may have it mapped
+        with open(temporary, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, cls.SPARSE if sparse else 0, len(state), offset, memory.size))
+            f.write(state)
+            f.write(bytes(offset - f.tell()))
+            if sparse:
+                MemoryDump(memory).write_binary(f, nonzero=True)
+            else:
+                f.write(memory.view)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """ Read the snapshot at path, mapping its memory. """
+        with open(path, 'rb') as f:
+            header = f.read(cls.HEADER.size)
+            if len(header) < cls.HEADER.size:
+                raise ValueError(f"{path} is not a snapshot")
+            magic, version, flags, state_length, offset, size = cls.HEADER.unpack(header)
+            if magic != cls.MAGIC:
+                raise ValueError(f"{path} is not a snapshot")
+            if version != cls.VERSION:
+                raise ValueError(f"Unsupported snapshot version {version}")
+            options, state = pickle.loads(f.read(state_length))
+
+            if flags & cls.SPARSE:
+                memory = Memory(size, 'sparse')
+                f.seek(offset)
+                _, records = MemoryDump.read_binary(f)
+                for start, data in records:
+                    memory[start:start + len(data)] = data
+                memory.dirty[:] = bytes(len(memory.dirty))
+            else:
+                memory = Memory(size, 'mmap', path, offset)
+        return cls(options, state, memory)
+
+    def apply(self, system):
+        """ Put the saved state into system, freshly built from the saved options around the saved memory. """
+        state = self.state
+        system.clock.time = state['clock']
+        system.pid = state['pid']
+        system.errors = state['errors']
+        random.setstate(state['random'])
+        system.job_queue = state['job_queue']
+        system.io_queue = state['io_queue']
+        system.terminated_queue = state['terminated_queue']
+
+        vars(system.scheduler).update(state['scheduler'])
+        system.ready_queue = system.scheduler.policy
+        vars(system.memory_manager).update(state['memory_manager'])
+        for core, saved in zip(system.cores, state['cores']):
+            vars(core).update(saved)
+
+        if state['swapper'] is not None:
+            swapper = system.swapper
+            vars(swapper).update(state['swapper'])
+            for pid, data in state['swapped'].items():
+                start, length = swapper.slots[pid]
+                swapper.store[start:start + length] = data
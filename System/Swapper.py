@@ -0,0 +1,136 @@
+import mmap
+import tempfile
+from constants import PCBState
+
+try:
+    from .FreeList import FreeList
+except ImportError:
+    from FreeList import FreeList
+
+
+def longest_wait(candidates, pcb):
+    """ The process whose I/O completes last, it has the longest to go before it needs its memory. """
+    return max(candidates, key=lambda candidate: candidate.wait_until)
+
+def largest(candidates, pcb):
+    """ The process with the largest image, so the fewest processes are swapped out. """
+    return max(candidates, key=lambda candidate: candidate.byte_size)
+
+SWAP_POLICIES = {
+    'longest_wait': longest_wait,
+    'largest': largest,
+}
+
+
+class Swapper:
+    """
+        Moves the memory of processes blocked on I/O out to a backing store
+        when a job does not fit in memory, and back in when their I/O has
+        completed and before they are ready to run again.
+
+        The backing store is a file mapped into memory, so an image goes in
+        and out with a single slice copy. Space in it is handed out by a
+        FreeList. The victim policy picks which of the blocked processes to
+        swap out; it is one of SWAP_POLICIES or any function taking the
+        candidates and the process that needs the room.
+    """
+    def __init__(self, system, policy='longest_wait', path=None, size=None):
+        if not callable(policy) and policy not in SWAP_POLICIES:
+            raise ValueError(f"Unknown swap policy: {policy}. Choose from {', '.join(SWAP_POLICIES)}")
+        self.system = system
+        self.memory_manager = system.memory_manager
+        self.policy = policy if callable(policy) else SWAP_POLICIES[policy]
+        self.size = size if size is not None else 4 * self.memory_manager.memory.size
+
+        self.file = open(path, 'w+b') if path else tempfile.TemporaryFile()
+        self.file.truncate(self.size)
+        self.store = mmap.mmap(self.file.fileno(), self.size)
+        self.free_list = FreeList(self.size, 'first')
+        self.slots = {} # pid -> (start, length) of a swapped out image
+        self.pending = [] # Swapped out processes whose I/O has completed, waiting for memory
+
+        self.swap_outs = 0
+        self.swap_ins = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+    def is_swapped(self, pcb):
+        return pcb.pid in self.slots
+
+    def candidates(self, exclude=None):
+        """ Processes blocked on I/O whose memory can be swapped out. """
+        return [pcb for pcb in self.system.io_queue
+                if pcb is not exclude and pcb.state == PCBState.WAITING and not self.is_swapped(pcb)
+                and self.memory_manager.read_image(pcb) is not None]
+
+    def make_room(self, pcb):
+        """
+            Swap out blocked processes until pcb fits in memory. Returns False,
+            without swapping out any, if it would not fit even once all of them were.
+        """
+        if self.memory_manager.check_memory_available(pcb):
+            return True
+        if not self.memory_manager.check_memory_available(pcb, self.candidates(exclude=pcb)):
+            return False
+
+        while not self.memory_manager.check_memory_available(pcb):
+            candidates = self.candidates(exclude=pcb)
+            if not candidates or not self.swap_out(self.policy(candidates, pcb)):
+                return False
+        return True
+
+    def swap_out(self, pcb):
+        """ Copy pcb's image to the backing store and free its memory. """
+        data = self.memory_manager.read_image(pcb)
+        start = self.free_list.find(len(data))
+        if start is None:
+            self.system.print(f"Swap space is full, cannot swap out {pcb}")
+            return False
+
+        self.free_list.allocate(len(data), start)
+        self.store[start:start + len(data)] = data
+        self.slots[pcb.pid] = (start, len(data))
+        self.memory_manager.free_memory(pcb)
+        pcb.base = None
+        pcb.page_table = None
+
+        self.swap_outs += 1
+        self.bytes_out += len(data)
+        self.system.print(f"Swapped out {pcb} ({len(data)} bytes)")
+        return True
+
+    def swap_in(self, pcb):
+        """ Bring pcb's image back into memory, swapping out others if needed. Returns False if it does not fit. """
+        if not self.make_room(pcb) or not self.memory_manager.allocate_memory(pcb):
+            return False
+
+        start, length = self.slots.pop(pcb.pid)
+        self.memory_manager.write_image(pcb, self.store[start:start + length])
+        self.free_list.free(start, length)
+        if self.memory_manager.instruction_cache is not None:
+            self.memory_manager.instruction_cache.load(pcb.code_start, pcb.code_end, pcb.mapping())
+
+        self.swap_ins += 1
+        self.bytes_in += length
+        self.system.print(f"Swapped in {pcb} ({length} bytes)")
+        return True
+
+    def io_complete(self, pcbs):
+        """
+            Of the processes whose I/O completed, and those still waiting to be
+            swapped in, the ones that are in memory and can be made ready.
+        """
+        self.pending.extend(pcbs)
+        ready = []
+        for pcb in list(self.pending):
+            if not self.is_swapped(pcb) or self.swap_in(pcb):
+                self.pending.remove(pcb)
+                ready.append(pcb)
+        return ready
+
+    def close(self):
+        self.store.close()
+        self.file.close()
+
+    def __repr__(self):
+        return f"<Swapper size={self.size} swapped={len(self.slots)} outs={self.swap_outs} ins={self.swap_ins}>"
@@ -0,0 +1,136 @@
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from tabulate import tabulate
+
+try:
+    from .System import System
+except ImportError:
+    from System import System
+
+
+# Options that can be changed on a system restored from a snapshot
+WARM_START_OPTIONS = ('scheduling_algorithm', 'quantum', 'context_switch_cost', 'seed')
+
+
+def warm_start(snapshot, options):
+    """ The System saved to snapshot, with options applied to it."""
+    system = System.load_snapshot(snapshot)
+    if 'scheduling_algorithm' in options:
+        system.scheduler.set_algorithm(options['scheduling_algorithm'])
+    if 'quantum' in options:
+        system.scheduler.quantum = options['quantum']
+    if 'context_switch_cost' in options:
+        system.context_switch_cost = options['context_switch_cost']
+        for core in system.cores:
+            core.context_switch_cost = options['context_switch_cost']
+    return system
+
+
+def run_configuration(programs, configuration, snapshot=None):
+    """
+        Run programs on a fresh System built from configuration, returns its
+        metrics. With a snapshot the System is restored from it instead and
+        only the WARM_START_OPTIONS of configuration apply; without programs
+        it carries on with the jobs left in its queues.
+    """
+    options = dict(configuration)
+    seed = options.pop('seed', None)
+    if snapshot is None:
+        random.seed(seed) # I/O waits are random, a seed makes the run repeatable
+        system = System(**options)
+    else:
+        system = warm_start(snapshot, options)
+        if seed is not None:
+            random.seed(seed) # Otherwise the snapshot's own random state carries on
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if programs:
+            system.call('execute', *programs)
+        else:
+            system.call('resume')
+
+    result = dict(configuration)
+    if system.scheduler.metrics is None:
+        result['error'] = '; '.join(str(error) for error in system.errors) or 'No jobs completed'
+    else:
+        result.update(system.scheduler.metrics)
+    return result
+
+
+class Sweep:
+    """
+        Runs one workload under every combination of a parameter grid, each
+        configuration in its own System inside a process pool.
+
+        A sweep specification is a dict, or a JSON file, such as
+            {"programs": ["programs/p1.osx", 0, "programs/p2.osx", 3],
+             "grid": {"scheduling_algorithm": ["FCFS", "RR"], "quantum": [null, 5]}}
+        where programs are the program / arrival time pairs System.execute takes
+        and the grid keys are System constructor arguments, or seed.
+
+        With "snapshot": "file" every configuration starts from the System
+        saved in that snapshot instead of a fresh one, so a shared setup phase
+        runs once. The grid is then limited to WARM_START_OPTIONS, and without
+        programs each configuration carries on with the snapshot's own jobs.
+    """
+    def __init__(self, spec):
+        if isinstance(spec, str):
+            with open(spec) as file:
+                spec = json.load(file)
+        self.snapshot = spec.get('snapshot')
+        self.programs = [str(arg) for arg in spec.get('programs', [])]
+        self.grid = spec.get('grid', {})
+        self.results = []
+        if self.snapshot is None and not self.programs:
+            raise ValueError("A sweep needs programs to run, or a snapshot to carry on from")
+        if self.snapshot is not None:
+            fixed = [name for name in self.grid if name not in WARM_START_OPTIONS]
+            if fixed:
+                raise ValueError(f"Cannot change {', '.join(fixed)} of a snapshot, only {', '.join(WARM_START_OPTIONS)}")
+
+    def configurations(self):
+        names = list(self.grid)
+        return [dict(zip(names, values)) for values in itertools.product(*self.grid.values())]
+
+    def run(self, workers=None):
+        """ Run every configuration, by default on as many processes as the host has cores."""
+        configurations = self.configurations()
+        workers = workers or os.cpu_count() or 1
+        chunksize = max(1, len(configurations) // (workers * 4))
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            self.results = list(pool.map(run_configuration, itertools.repeat(self.programs),
+                                         configurations, itertools.repeat(self.snapshot), chunksize=chunksize))
+        return self.results
+
+    def table(self):
+        return tabulate(self.results, headers='keys', tablefmt='grid')
+
+    def save(self, filepath):
+        with open(filepath, 'w') as file:
+            json.dump(self.results, file, indent=2)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Run a workload under every configuration of a parameter grid.")
+    parser.add_argument('spec', help="sweep specification JSON file")
+    parser.add_argument('-o', '--output', help="write the results to this JSON file")
+    parser.add_argument('-w', '--workers', type=int, help="number of worker processes, defaults to the host's cores")
+    args = parser.parse_args(args)
+
+    sweep = Sweep(args.spec)
+    sweep.run(args.workers)
+    print(sweep.table())
+    if args.output:
+        sweep.save(args.output)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,45 +5,89 @@ import random
 
 try:
     from hardware.CPU import CPU
+    from hardware.PagedCPU import PagedCPU
     from hardware.Clock import Clock
+    from hardware.InstructionCache import InstructionCache
+    from hardware.MemoryDump import MemoryDump
+    from hardware.Checkpoints import Checkpoints
     from .PCB import PCB
+    from .EventQueue import EventQueue
     from .Scheduler import Scheduler
     from .MemoryManager import MemoryManager
+    from .PagedMemoryManager import PagedMemoryManager
+    from .Swapper import Swapper
+    from .ImageCache import ImageCache
+    from .Verifier import Verifier
+    from .Snapshot import Snapshot
 except ImportError:
     sys.path.append(
         os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
     )
     from hardware.CPU import CPU
+    from hardware.PagedCPU import PagedCPU
     from hardware.Clock import Clock
+    from hardware.InstructionCache import InstructionCache
+    from hardware.MemoryDump import MemoryDump
+    from hardware.Checkpoints import Checkpoints
     from PCB import PCB
+    from EventQueue import EventQueue
     from Scheduler import Scheduler
     from MemoryManager import MemoryManager
+    from PagedMemoryManager import PagedMemoryManager
+    from Swapper import Swapper
+    from ImageCache import ImageCache
+    from Verifier import Verifier
+    from Snapshot import Snapshot
 
 from constants import USER_MODE, KERNEL_MODE, SYSTEM_CODES, PCBState, CHILD_EXEC_PROGRAM
 
 
 class System:
-    def __init__(self):
+    def __init__(self, engine='interpreter', scheduling_algorithm='FCFS', quantum=None, context_switch_cost=0, cores=1, memory_size='1K', memory_backend=None, memory_file=None, allocation_policy='best', compaction=False, compaction_cost=1, page_size=None, tlb_size=16, demand_paging=False, page_fault_cost=10, swapping=False, swap_policy='longest_wait', swap_file=None, swap_size=None, snapshot_interval=None, snapshot_file='snapshot.bin', image_cache_size=16 * 1024 * 1024, image_cache_files=False, verify=True):
+        self.options = {name: value for name, value in locals().items() if name != 'self'} # Rebuilt from on restore
+        self.engine = engine
+        self.context_switch_cost = context_switch_cost
         self.clock = Clock()
-        self.scheduler = Scheduler(self)
-        self.memory_manager = MemoryManager(self, '1K')
+        self.scheduler = Scheduler(self, scheduling_algorithm, quantum, cores)
+        self.paging = page_size is not None
+        if self.paging:
+            self.memory_manager = PagedMemoryManager(self, memory_size, page_size, demand_paging, page_fault_cost, memory_backend, memory_file)
+        else:
+            self.memory_manager = MemoryManager(self, memory_size, allocation_policy, compaction, compaction_cost, memory_backend, memory_file)
         self.memory = self.memory_manager.memory
-        self.CPU = CPU(self.memory, self)
+        self.instruction_cache = InstructionCache(self.memory, CPU.predecode)
+        self.memory_manager.instruction_cache = self.instruction_cache
+        self.image_cache = ImageCache(image_cache_size, CPU.predecode, image_cache_files) # One read per program file, see ImageCache
+        self.memory_manager.image_cache = self.image_cache
+        self.memory_manager.verifier = Verifier() if verify else None # Rejects bad programs when they are loaded
+        self.swapper = Swapper(self, swap_policy, swap_file, swap_size) if swapping else None
+        if self.paging:
+            self.cores = [PagedCPU(self.memory, self, tlb_size) for _ in range(cores)]
+        else:
+            self.cores = [CPU(self.memory, self) for _ in range(cores)]
+        self.CPU = self.cores[0]
         self.mode = USER_MODE
         self.verbose = False
         self.errors = []
+        self.checkpoints = None # Incremental checkpoints of the memory, see checkpoint
+        self.snapshot_interval = snapshot_interval # Clock ticks between snapshots to snapshot_file while scheduling
+        self.snapshot_file = snapshot_file
         self.system_codes = SYSTEM_CODES
         self.pid = 0
 
         # Process management queues
-        self.ready_queue = []
-        self.job_queue = []
-        self.io_queue = []
+        self.ready_queue = self.scheduler.policy
+        self.job_queue = EventQueue('arrival_time')
+        self.io_queue = EventQueue('wait_until')
         self.terminated_queue = []
 
         self.commands = {
             'load': self.handle_load,
             'coredump': self.coredump,
+            'checkpoint': self.checkpoint,
+            'snapshot': self.snapshot,
+            'restore': self.restore,
+            'resume': self.resume,
             'errordump': self.errordump,
             "run": self.run_program,
             "registers": lambda: print(self.CPU),
@@ -86,6 +130,26 @@ class System:
             self.system_code(103)
 
     def execute(self, *args):
+        args = list(args)
+        if '-a' in args: # Optional scheduling algorithm, i.e. -a SJF
+            i = args.index('-a')
+            if i + 1 == len(args):
+                self.system_code(103, f"Please specify one of the scheduling algorithms: {', '.join(self.scheduler.scheduling_algorithms)}")
+                return None
+            if not self.scheduler.set_algorithm(args[i + 1]):
+                return None
+            del args[i:i + 2]
+
+        priorities = [] # Optional priority of each program in order, i.e. -p 2,1 (lower runs first under Priority)
+        if '-p' in args:
+            i = args.index('-p')
+            try:
+                priorities = [int(priority) for priority in str(args[i + 1]).split(',')]
+            except (IndexError, ValueError):
+                self.system_code(103, "Please specify the priorities of the programs as integers, i.e. -p 2,1")
+                return None
+            del args[i:i + 2]
+
         if len(args) < 2 or len(args) % 2 != 0:
             self.system_code(103)
             print(
@@ -100,7 +164,9 @@ class System:
             
             if program_info:
                 pcb = self.create_pcb(program_info, arrival_time)
-                self.job_queue.append(pcb)
+                if i // 2 < len(priorities):
+                    pcb.priority = priorities[i // 2]
+                self.job_queue.push(pcb)
             else:
                 return None
         
@@ -126,18 +192,18 @@ class System:
 
         return pcb
 
-    def run_pcb(self, pcb):
+    def run_pcb(self, pcb, quantum=None):
         pcb.running()
         self.print(f"Running program: {pcb}")
 
-        self.CPU.run_program(pcb, self.verbose)
+        self.CPU.run_program(pcb, self.verbose, quantum)
 
     def handle_load(self, filepath):
         program_info = self.memory_manager.prepare_program(filepath)
         if program_info:
             pcb = self.create_pcb(program_info, self.clock.time)
             self.memory_manager.load_to_memory(pcb)
-            self.job_queue.append(pcb)
+            self.job_queue.push(pcb)
         # Display state table after command execution
         if self.verbose:
             self.display_state_table()
@@ -181,12 +247,15 @@ class System:
 
         program = args[0]
 
-        pcb = None
-        for job in self.job_queue + self.ready_queue:
-            if job.file == program:
-                pcb = job
+        # Take the program out of whichever queue holds it, so it is not also run from there later
+        for queue in (self.job_queue, self.ready_queue):
+            pcb = next((job for job in queue if job.file == program), None)
+            if pcb is not None:
+                queue.remove(pcb)
                 break
-        self.job_queue.remove(pcb)
+        else:
+            self.system_code(101, f"Program {program} is not loaded.")
+            return None
         self.print(f"Running program: {pcb}")
         
         pcb.start_time = self.clock.time
@@ -202,14 +271,92 @@ class System:
 
         return pcb.registers[0]
 
-    def coredump(self):
-        if self.verbose:
+    def coredump(self, *args):
+        """
+            Dump the memory, i.e. coredump [start end] [-z] [-p] [-b] [-o file]
+                start end   only the addresses start..end-1
+                -z          leave out rows that are all zero
+                -p          the memory of each process, under a line naming it
+                -b          binary format, see MemoryDump, to memory.bin
+                -o file     write to file instead of memory.txt / memory.bin
+        """
+        args = list(args)
+        flags = {flag for flag in ('-z', '-p', '-b') if flag in args}
+        args = [arg for arg in args if arg not in flags]
+        binary = '-b' in flags
+        filepath = 'memory.bin' if binary else 'memory.txt'
+        if '-o' in args:
+            i = args.index('-o')
+            if i + 1 == len(args):
+                self.system_code(103, "Please specify the file to dump the memory to.")
+                return None
+            filepath = args[i + 1]
+            del args[i:i + 2]
+        if len(args) not in (0, 2):
+            self.system_code(103, "Please specify both the start and the end address of the memory to dump.")
+            return None
+        start, end = (int(args[0]), int(args[1])) if args else (0, None)
+
+        dump = MemoryDump(self.memory)
+        regions = [(str(pcb), first, last) for pcb, first, last in self.memory_manager.regions()] if '-p' in flags else None
+        if self.verbose and not binary:
             print("Coredump:")
-            print(self.memory)
+            self._write_dump(dump, sys.stdout, start, end, '-z' in flags, regions)
+            return None
+        if binary:
+            with open(filepath, 'wb') as f:
+                dump.write_binary(f, start, end, '-z' in flags, regions)
         else:
-            with open('memory.txt', 'w', encoding='utf-8') as f:
-                f.write(str(self.memory))
-            print("Memory dumped to memory.txt")
+            with open(filepath, 'w', encoding='utf-8') as f:
+                self._write_dump(dump, f, start, end, '-z' in flags, regions)
+        print(f"Memory dumped to {filepath}")
+
+    def checkpoint(self, directory='checkpoints'):
+        """ Save the memory written since the last checkpoint to directory, see Checkpoints. """
+        if self.checkpoints is None or self.checkpoints.directory != directory:
+            self.checkpoints = Checkpoints(self.memory, directory)
+        entry = self.checkpoints.checkpoint(self.clock.time)
+        print(f"Checkpoint {entry['index']} saved to {directory} ({entry['pages']} pages written since the last one)")
+        return entry
+
+    def snapshot(self, filepath=None):
+        """ Save the whole system to filepath, see Snapshot. """
+        filepath = filepath or self.snapshot_file
+        Snapshot.save(self, filepath)
+        self.print(f"Snapshot saved to {filepath} at time {self.clock.time}")
+        return filepath
+
+    def restore(self, filepath=None):
+        """ Replace this system with the one saved to filepath. """
+        filepath = filepath or self.snapshot_file
+        snapshot = Snapshot.load(filepath)
+        self.memory.close()
+        if self.swapper is not None:
+            self.swapper.close()
+        mode = self.mode
+        self.__init__(**dict(snapshot.options, memory_size=snapshot.memory))
+        snapshot.apply(self)
+        self.mode = mode
+        print(f"Restored {filepath} at time {self.clock.time}")
+
+    @classmethod
+    def load_snapshot(cls, filepath):
+        """ A new system restored from the snapshot at filepath. """
+        snapshot = Snapshot.load(filepath)
+        system = cls(**dict(snapshot.options, memory_size=snapshot.memory))
+        snapshot.apply(system)
+        return system
+
+    def resume(self):
+        """ Carry on scheduling the jobs left in the queues, after a restore. """
+        self.scheduler.schedule_jobs(resume=True)
+
+    def _write_dump(self, dump, file, start, end, nonzero, regions):
+        if regions is None:
+            file.write('\n')
+            dump.write_hex(file, start, end, nonzero)
+        else:
+            dump.write_regions(file, regions, nonzero)
 
     def errordump(self):
         if self.verbose:
@@ -263,18 +410,24 @@ class System:
 
         parent_pcb.registers[0] = new_pid
         child_pcb.registers[0] = 0
+        self.memory_manager.fork(parent_pcb, child_pcb)
 
         parent_pcb.state = PCBState.READY
         child_pcb.state = PCBState.READY
 
         self.print(f"Forked child process: {child_pcb}")
 
-        self.ready_queue.append(child_pcb)
+        self.ready_queue.enqueue(child_pcb)
         # self.ready_queue.append(parent_pcb) This will be done by the scheduler
 
         # self.run_pcb(child_pcb)
 
-    def exec(self, pcb):
+    def exec(self, pcb, cpu=None):
+        """
+            Replace the program of pcb with CHILD_EXEC_PROGRAM, which goes on
+            running on cpu, the core that made the call. Returns True when
+            cpu is to carry on stepping it, on several cores.
+        """
         filepath = CHILD_EXEC_PROGRAM
         # arrival_time = self.clock.time
 
@@ -292,7 +445,15 @@ class System:
             # pcb.arrival_time = arrival_time
 
             self.memory_manager.load_to_memory(pcb)
-            self.run_pcb(pcb)
+            self.scheduler.memory_freed = True # The old image was given up
+            if len(self.cores) > 1 and cpu is not None:
+                # Cores run in lockstep, the core loads the new program and steps it from the next tick on
+                cpu.dispatch(pcb, self.verbose, cpu.remaining if cpu.remaining > 0 else None)
+                return True
+            if len(self.cores) > 1:
+                pcb.state = PCBState.READY # Waits for its turn on any core
+            else:
+                self.run_pcb(pcb)
         else:
             return None
 
@@ -331,6 +492,7 @@ class System:
 
         # Add entries from all queues
         add_queue_entries("Job Queue", self.job_queue)
+        add_queue_entries("Job Queue", self.scheduler.waiting)
         add_queue_entries("Ready Queue", self.ready_queue)
         add_queue_entries("I/O Queue", self.io_queue)
         add_queue_entries("Terminated", self.terminated_queue)
@@ -0,0 +1,111 @@
+from constants import instructions
+from hardware.CPU import THREE_REGISTER_OPS, TWO_REGISTER_OPS, IMMEDIATE_OPS
+
+try:
+    from .DecodedImage import DecodedImage
+except ImportError:
+    from DecodedImage import DecodedImage
+
+
+class Verifier:
+    """
+        Checks a program image once, when it is loaded, instead of the CPU
+        finding out while it runs:
+            - every instruction of the code has a known opcode         (103)
+            - every register operand is one of R0..R11                 (108)
+            - every static branch target is inside the code            (110)
+              and on an instruction, or just past the last one         (105)
+        Branch targets are where the CPU really jumps to, so the loader is
+        added to the target of BEQ and not to the other branches. BX jumps
+        to a register and is checked by the CPU when it runs.
+
+        Only bad instructions and branches the program can reach from its
+        entry point, by falling through, branching or returning from a BL,
+        reject the image. The rest, such as data after the code or code
+        only reached through BX, are warnings.
+    """
+    num_registers = 12
+
+    def verify(self, image):
+        """ (code, message) of every problem that rejects image, empty if there is none. Checked once per image. """
+        if image.problems is None:
+            self._check(image)
+        return image.problems
+
+    def warnings(self, image):
+        """ (code, message) of every problem that does not reject image. """
+        if image.warnings is None:
+            self._check(image)
+        return image.warnings
+
+    def _check(self, image):
+        decoded = image.decoded
+        if decoded is None:
+            decoded = image.decoded = DecodedImage.build(image)
+        if decoded.problems is None:
+            decoded.problems = self.check(decoded)
+            decoded.save() # Kept in its cache file, so the next load does not check it again
+        problems = [(code, fatal, self.describe(decoded, code, address, image.path)) for code, fatal, address in decoded.problems]
+        image.problems = [(code, message) for code, fatal, message in problems if fatal]
+        image.warnings = [(code, message) for code, fatal, message in problems if not fatal]
+
+    def check(self, decoded):
+        """ (code, fatal, address) of every problem of decoded, fatal when it rejects the image. """
+        problems = []
+        reached = self.reached(decoded)
+        end = decoded.pc + 6 * len(decoded)
+        for i, (opcode, flags, a, b, c, _, target) in enumerate(decoded):
+            address = decoded.pc + 6 * i
+            if not flags & DecodedImage.VALID:
+                problems.append((103, address in reached, address))
+                continue
+
+            name = instructions[opcode]
+            if name in THREE_REGISTER_OPS:
+                registers = (a, b, c)
+            elif name in TWO_REGISTER_OPS:
+                registers = (a, b)
+            elif name in IMMEDIATE_OPS or name == 'BX':
+                registers = (a,)
+            else:
+                registers = ()
+            if any(register >= self.num_registers for register in registers):
+                problems.append((108, address in reached, address))
+
+            if flags & DecodedImage.BRANCH:
+                if not decoded.pc <= target <= end:
+                    problems.append((110, address in reached, address))
+                elif (target - decoded.pc) % 6:
+                    problems.append((105, address in reached, address))
+        return problems
+
+    def reached(self, decoded):
+        """ Addresses of the instructions of decoded that can run, following fall through, static branches and BL returns. """
+        reached, stack = set(), [decoded.pc]
+        while stack:
+            address = stack.pop()
+            record = decoded.record(address)
+            if record is None or address in reached:
+                continue # Past the code or between instructions, see the warnings
+            reached.add(address)
+            opcode, flags, a, *_, target = record
+            if not flags & DecodedImage.VALID:
+                continue
+            name = instructions[opcode]
+            if flags & DecodedImage.BRANCH:
+                stack.append(target)
+            if name not in ('B', 'BX') and not (name == 'SWI' and a == 1):
+                stack.append(address + 6)
+        return reached
+
+    def describe(self, decoded, code, address, filepath=None):
+        """ The message of the problem code found at address. """
+        opcode, *_, target = decoded.record(address)
+        name = instructions.get(opcode)
+        if code == 103:
+            return f"Invalid instruction at address {address} of {filepath}"
+        if code == 108:
+            return f"Invalid register in {name} at address {address} of {filepath}"
+        if code == 110:
+            return f"{name} at address {address} of {filepath} branches to {target}, outside of its code"
+        return f"{name} at address {address} of {filepath} branches to {target}, between instructions"
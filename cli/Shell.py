@@ -1,8 +1,18 @@
-import subprocess
+import os
+import sys
 
 try:
+    from System.Sweep import Sweep
+    from System.Assembler import Assembler
+    from System.Optimizer import Optimizer
     from .Modes import Modes
 except ImportError:
+    sys.path.append(
+        os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    )
+    from System.Sweep import Sweep
+    from System.Assembler import Assembler
+    from System.Optimizer import Optimizer
     from Modes import Modes
 
 class ShellMode(Modes):
@@ -29,6 +39,8 @@ class ShellMode(Modes):
                 return None
             if cmd == 'osx':
                 self.execute_terimal_command(args)
+            elif cmd == 'sweep':
+                self.run_sweep(args)
             else:
                 self.handle_command(cmd, args)
             
@@ -36,16 +48,36 @@ class ShellMode(Modes):
     def handle_command(self, cmd, args):
         self.System.call(cmd, *args)
 
-    def execute_terimal_command(self, args):
+    def run_sweep(self, args):
+        if not args:
+            print("Usage: sweep <spec.json> [<results.json>]")
+            return
         try:
-            args.insert(0, 'osx')
-            result = subprocess.run(args, text=True, capture_output=True)
-            print(result.stdout)
-            
-        except subprocess.CalledProcessError as e:
+            sweep = Sweep(args[0])
+            sweep.run()
+            print(sweep.table())
+            if len(args) > 1:
+                sweep.save(args[1])
+                print(f"Results saved to {args[1]}")
+        except (OSError, ValueError, KeyError) as e:
             print(f"Error: {e}")
-            print(e.stderr)
-        except Exception as e:
+
+    def execute_terimal_command(self, args):
+        """ Assemble a program, i.e. osx programs/add.asm 50, optimized with -O """
+        optimizer = None
+        if '-O' in args:
+            optimizer = Optimizer()
+            args.remove('-O')
+        if not args:
+            print("Usage: osx <program.asm> [<memory_location>] [-O]")
+            return
+        try:
+            loader = int(args[1]) if len(args) > 1 else 0
+            output = Assembler(optimizer).assemble_file(args[0], loader)
+            print(f"Assembled {args[0]} to {output}")
+            if optimizer is not None:
+                print(optimizer.report())
+        except (OSError, ValueError) as e:
             print(f"Error: {e}")
 
 if __name__ == '__main__':
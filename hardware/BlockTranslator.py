@@ -0,0 +1,197 @@
+from .Memory import MemoryAccessError
+
+
+class BlockTranslator:
+    """
+        Translates basic blocks of pre-decoded instructions into Python functions.
+
+        A block runs straight-line from its first instruction up to and including
+        the first branch or SWI, or any instruction that writes the program counter.
+        The generated function keeps the registers it touches in local variables,
+        writes them back when it leaves and charges the clock and the PCB's
+        execution time for every instruction it ran, so its effect is the same as
+        running the block one step at a time in CPU.run_program.
+
+        Every generated function has the signature block(cpu, r, clock, pcb) where r
+        is the CPU's register list, and a length attribute with the number of
+        instructions in the block. If a memory access faults, the registers, program
+        counter and clock are left as the interpreter would leave them before the
+        MemoryAccessError is raised again.
+    """
+    branches = ("_b", "_bl", "_bx", "_bne", "_bgt", "_blt", "_beq")
+    memory_ops = ("_str", "_strb", "_ldr", "_ldrb")
+    conditions = {"_bne": "!= 0", "_bgt": "> 0", "_blt": "< 0", "_beq": "== 0"}
+
+    def __init__(self, num_registers=12, z=9, pc=11, lr=5):
+        self.num_registers = num_registers
+        self.z = z
+        self.pc = pc
+        self.lr = lr
+
+    def translate(self, table, address, code_end, relocation=0):
+        """
+            Translate the block starting at address, or return None if the
+            instruction at address can not be translated. relocation is the
+            base register offset added to the addresses of loads and stores.
+        """
+        body = []
+        used = set()
+        faults = False
+        count = 0
+        next_address = address
+        pc_written = False
+
+        while next_address < code_end and not pc_written:
+            entry = table.get(next_address)
+            if entry is None:
+                entry = table.fill(next_address)
+                if entry is None:
+                    break
+            handler, operands = entry
+            name = handler.__name__
+            if not self._valid_registers(name, operands):
+                break
+
+            next_address += 6
+            count += 1
+
+            if name == "_swi":
+                body.extend(self._writeback(used, next_address))
+                body.extend(self._charge(count - 1))
+                body.append(f"cpu._swi({operands!r})")
+                body.append("if cpu.running:")
+                body.extend("    " + line for line in self._charge(1))
+                return self._compile(address, count, body, used, faults)
+
+            reads, writes, lines = self._translate_instruction(name, operands, next_address, relocation)
+            if self.pc in reads:
+                body.append(f"r{self.pc} = {next_address}")
+            if name in self.memory_ops:
+                body.append(f"step = {count}")
+            used.update(reads, writes)
+            body.extend(lines)
+            faults = faults or name in self.memory_ops
+
+            if name in ("_str", "_strb"):
+                # Leave the block if the store overwrote cached code
+                body.append("if hit:")
+                body.extend("    " + line for line in self._writeback(used, next_address))
+                body.extend("    " + line for line in self._charge(count))
+                body.append("    return")
+
+            pc_written = self.pc in writes
+
+        if count == 0:
+            return None
+
+        body.extend(self._writeback(used, f"r{self.pc}" if pc_written else next_address))
+        body.extend(self._charge(count))
+        return self._compile(address, count, body, used, faults)
+
+    def _valid_registers(self, name, operands):
+        """ Blocks end before any register operand the interpreter would reject. """
+        if name in ("_mvi", "_adr"):
+            registers = operands[:1]
+        elif name == "_bx" or name not in self.branches + ("_swi",):
+            registers = operands
+        else:
+            registers = ()
+        return all(register < self.num_registers for register in registers)
+
+    def _translate_instruction(self, name, operands, next_address, relocation=0):
+        """ Returns the registers read and written and the lines of one instruction. """
+        z, pc = self.z, self.pc
+        offset = f" + {relocation}" if relocation else ""
+
+        if name in ("_add", "_sub", "_mul", "_and"):
+            a, b, c = operands
+            operator = {"_add": "+", "_sub": "-", "_mul": "*", "_and": "&"}[name]
+            return {b, c}, {a}, [f"r{a} = r{b} {operator} r{c}"]
+
+        if name == "_div":
+            a, b, c = operands
+            return {b, c}, {a}, [
+                f"if r{c} == 0:",
+                "    cpu.system_call(104)",
+                "    print('Division by zero')",
+                "else:",
+                f"    r{a} = r{b} // r{c}",
+            ]
+
+        if name == "_mov":
+            a, b = operands
+            return {b}, {a}, [f"r{a} = r{b}"]
+
+        if name in ("_mvi", "_adr"):
+            a, value = operands
+            return set(), {a}, [f"r{a} = {value}"]
+
+        if name == "_str":
+            a, b = operands
+            return {a, b}, set(), [
+                f"cpu.write_word(r{b}{offset}, r{a})",
+                f"hit = cpu.invalidate(r{b}{offset}, 4)",
+            ]
+
+        if name == "_strb":
+            a, b = operands
+            return {a, b}, set(), [
+                f"cpu.write_byte(r{b}{offset}, cpu.read_byte(r{a}{offset}) & 0xFF)",
+                f"hit = cpu.invalidate(r{b}{offset}, 1)",
+            ]
+
+        if name == "_ldr":
+            a, b = operands
+            return {b}, {a}, [f"r{a} = cpu.read_word(r{b}{offset})"]
+
+        if name == "_ldrb":
+            a, b = operands
+            return {b}, {a}, [f"r{a} = cpu.read_byte(r{b}{offset})"]
+
+        if name in ("_cmp", "_orr", "_eor"):
+            a, b = operands
+            operator = {"_cmp": "-", "_orr": "|", "_eor": "^"}[name]
+            return {a, b}, {z}, [f"r{z} = r{a} {operator} r{b}"]
+
+        if name == "_b":
+            return set(), {pc}, [f"r{pc} = {operands[0]}"]
+
+        if name == "_bl":
+            return set(), {pc, self.lr}, [f"r{pc} = {operands[0]}", f"r{self.lr} = {next_address}"]
+
+        if name == "_bx":
+            return {operands[0]}, {pc}, [f"r{pc} = r{operands[0]}"]
+
+        target = operands[0]
+        if name == "_beq":
+            target = f"{target} + pcb.loader"
+        return {z}, {pc}, [f"r{pc} = {target} if r{z} {self.conditions[name]} else {next_address}"]
+
+    def _writeback(self, used, pc_value):
+        lines = [f"r[{register}] = r{register}" for register in sorted(used) if register != self.pc]
+        lines.append(f"r[{self.pc}] = {pc_value}")
+        return lines
+
+    def _charge(self, count):
+        if count == 0:
+            return []
+        return [f"clock.time += {count}", f"pcb.execution_time += {count}"]
+
+    def _compile(self, address, length, body, used, faults):
+        prologue = [f"r{register} = r[{register}]" for register in sorted(used) if register != self.pc]
+        if faults:
+            # The instruction number step faulted, the ones before it completed
+            body = ["try:"] + ["    " + line for line in body] + [
+                "except MemoryAccessError:",
+                *("    " + line for line in self._writeback(used, f"{address} + 6 * step")),
+                *("    " + line for line in self._charge("step - 1")),
+                "    raise",
+            ]
+        source = f"def block_{address}(cpu, r, clock, pcb):\n"
+        source += "".join(f"    {line}\n" for line in prologue + body)
+
+        namespace = {"MemoryAccessError": MemoryAccessError}
+        exec(compile(source, f"<block {address}>", "exec"), namespace)
+        block = namespace[f"block_{address}"]
+        block.length = length
+        return block
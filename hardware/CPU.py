@@ -1,11 +1,47 @@
-from constants import instructions
+from constants import instructions, PCBState
+from .BlockTranslator import BlockTranslator
+from .Memory import MemoryAccessError
 import struct
 
+# Operand layout of each instruction, used to unpack operands once at decode time
+THREE_REGISTER_OPS = ("ADD", "SUB", "MUL", "DIV", "AND")
+TWO_REGISTER_OPS = ("MOV", "STR", "STRB", "LDR", "LDRB", "CMP", "ORR", "EOR")
+IMMEDIATE_OPS = ("MVI", "ADR")
+BRANCH_OPS = ("B", "BL", "BNE", "BGT", "BLT", "BEQ")
+
 
 class CPU:
+    # What a snapshot saves of a CPU, everything else is rebuilt with it
+    saved_state = ('registers', 'pcb', 'relocation', 'mapping', 'context_switches', 'context_switch_time', 'busy_time')
+
     def __init__(self, memory, system):
         self.memory = memory
         self.system = system
+
+        # Bind the memory's raw access path once
+        self.view = memory.view
+        self.read_word = memory.read_word
+        self.write_word = memory.write_word
+        self.read_byte = memory.read_byte
+        self.write_byte = memory.write_byte
+        self.instruction_cache = system.instruction_cache
+        self.invalidate = self.instruction_cache.invalidate
+        self.engine = system.engine
+        self.translator = BlockTranslator()
+        self.relocation = 0 # Base register, added to every memory address of the running program
+        self.mapping = 0 # Relocation or page table the instruction cache decodes the running program through
+
+        # Context switches, each one charged context_switch_cost clock ticks
+        self.pcb = None
+        self.context_switch_cost = system.context_switch_cost
+        self.context_switches = 0
+        self.context_switch_time = 0
+
+        # Lockstep execution, one instruction per clock tick (see dispatch and step)
+        self.stall = 0
+        self.remaining = -1
+        self.table = None
+        self.busy_time = 0
         num_registers = 12
         self.registers = [0 for _ in range(num_registers)]
         self.sp = 6  # Stack Pointer
@@ -61,37 +97,215 @@ class CPU:
     #     if verbose: self.verbose = True
     #     self.setPC(pcb['start_line'])
     
-    def run_program(self, pcb, verbose=False):
+    def run_program(self, pcb, verbose=False, quantum=None):
+        """
+            Run pcb until it ends, blocks or, if a quantum is given, has
+            executed quantum instructions and is preempted.
+        """
         # pcb['start_time'] = self.system.clock.time
         if verbose: self.verbose = True
 
         # Restor CPU state from PCB
+        self.system.clock += self._restore(pcb)
+
+        self.running = True
+
+        try:
+            if self.engine == 'blocks' and not self.verbose:
+                self._run_blocks(pcb, quantum)
+            else:
+                self._run_instructions(pcb, quantum)
+        except MemoryAccessError as e:
+            self._memory_fault(str(e))
+
+    def _restore(self, pcb):
+        """
+            Load the CPU state saved in pcb. Returns the context switch cost
+            to charge, which is 0 unless another process ran last.
+        """
+        cost = 0
+        if self.pcb is not pcb:
+            self.context_switches += 1
+            cost = self.context_switch_cost
+            self.context_switch_time += cost
+
         self.pcb = pcb
+        self.relocation = pcb.relocation()
+        self.mapping = pcb.mapping()
         self.registers = pcb.registers.copy()
         self.registers[self.pc] = pcb.pc
+        return cost
 
+    def dispatch(self, pcb, verbose=False, quantum=None):
+        """
+            Load pcb to be run one clock tick at a time by step(). Used to run
+            several CPUs in lockstep on a shared clock, which the caller advances.
+        """
+        if verbose: self.verbose = True
+        self.stall = self._restore(pcb) # The context switch holds this CPU for its cost
+        self.remaining = quantum or -1
+        self.table = self.instruction_cache.table(pcb.code_start, pcb.code_end, self.mapping)
         self.running = True
 
-        while self.running and self.registers[self.pc] < pcb['code_end']:
-            instruction = self._fetch()
-            opcode, operands = self._decode(instruction)
+    def step(self):
+        """ Run one clock tick of the dispatched program. Returns False once it stopped running. """
+        if self.stall:
+            self.stall -= 1
+            return True
 
+        pcb = self.pcb
+        registers = self.registers
+        if not self.running:
+            return False
 
-            if not self._execute(opcode, operands, pcb):
-                break
+        try:
+            entry = self.table.get(registers[self.pc])
+            if entry is None:
+                if registers[self.pc] >= pcb.code_end: # Only a miss can have left the code
+                    self._leave(pcb, len(self.memory) - self.relocation)
+                    self.running = False
+                    return False
+                entry = self.table.fill(registers[self.pc])
+            if entry is None:
+                instruction = self._fetch()
+                opcode, operands = self._decode(instruction)
+                if not self._execute(opcode, operands, pcb):
+                    return False
+            else:
+                handler, operands = entry
+                registers[self.pc] += 6
+                handler(self, operands)
+                if not self.running:
+                    return False
+        except MemoryAccessError as e:
+            self._memory_fault(str(e))
+            return False
+
+        pcb.execution_time += 1
+
+        self.remaining -= 1
+        if self.remaining == 0:
+            self._leave(pcb, len(self.memory) - self.relocation, preempt=True)
+            return False
+        return True
+
+    def _preempt(self, pcb):
+        """ Save the CPU state into pcb and hand it back to the scheduler as ready. """
+        pcb.registers = self.registers.copy()
+        pcb.pc = self.registers[self.pc]
+        pcb.preempted()
+        self.verbose = False
+        self.running = False
+
+    def _run_instructions(self, pcb, quantum=None):
+        """ Run the program one instruction at a time. """
+        # Pre-decoded instructions of this code range, anything else is fetched and decoded
+        table = self.instruction_cache.table(pcb.code_start, pcb.code_end, self.mapping)
+        registers = self.registers
+        pc = self.pc
+        limit = len(self.memory) - self.relocation
+        remaining = quantum or -1 # Never reaches 0 without a quantum
+
+        code_end = pcb.code_end
+
+        # The table only holds instructions of the code, so only a miss can have left it
+        while self.running:
+            entry = table.get(registers[pc])
+            if entry is None:
+                if registers[pc] >= code_end:
+                    self._leave(pcb, limit)
+                    break
+                entry = table.fill(registers[pc]) # Read from the decoded image the first time it is reached
+            if entry is None:
+                instruction = self._fetch()
+                opcode, operands = self._decode(instruction)
+
+                if not self._execute(opcode, operands, pcb):
+                    break
+            else:
+                handler, operands = entry
+                registers[pc] += 6
+                handler(self, operands)
+                if not self.running:
+                    break
 
             self.system.clock.increment()
             pcb.execution_time += 1
 
-            if self.registers[self.pc] >= len(self.memory):
-                self.system_call(110)
-                print("End of memory reached")
-                self.verbose = False
+            remaining -= 1
+            if remaining == 0:
+                self._leave(pcb, limit, preempt=True)
+                break
+
+    def _run_blocks(self, pcb, quantum=None):
+        """
+            Run the program one translated basic block at a time. Addresses that
+            can not be translated are interpreted one instruction at a time.
+        """
+        relocation = self.relocation
+        table = self.instruction_cache.table(pcb.code_start, pcb.code_end, self.mapping)
+        blocks = self.instruction_cache.blocks(pcb.code_start, pcb.code_end, self.mapping)
+        registers = self.registers
+        clock = self.system.clock
+        pc = self.pc
+        limit = len(self.memory) - relocation
+        remaining = quantum or float('inf')
+
+        code_end = pcb.code_end
+
+        # Blocks are only translated inside the code, so only a miss can have left it
+        while self.running:
+            address = registers[pc]
+            block = blocks.get(address)
+            if block is None:
+                if address >= code_end:
+                    self._leave(pcb, limit)
+                    break
+                block = self.translator.translate(table, address, code_end, relocation) or CPU._step
+                blocks[address] = block
+            if block.length > remaining: # Finish the quantum one instruction at a time
+                block = CPU._step
+
+            execution_time = pcb.execution_time
+            block(self, registers, clock, pcb)
+            if not self.running:
                 break
 
+            remaining -= pcb.execution_time - execution_time
+            if remaining == 0:
+                self._leave(pcb, limit, preempt=True)
+                break
+
+    def _leave(self, pcb, limit, preempt=False):
+        """
+            Stop running pcb once it left its code, or used up its quantum and
+            is preempted. The code ends inside the memory, so the program
+            counter only needs checking against the end of memory on the way
+            out, and not after every instruction.
+        """
+        if self.registers[self.pc] >= limit:
+            self._memory_fault("End of memory reached")
+        elif preempt:
+            self._preempt(pcb)
+
+    def _memory_fault(self, message):
+        """ Stop the program after an access outside of the memory. """
+        self.system_call(110)
+        print(message)
+        self.verbose = False
+        self.running = False
+
+    def _step(self, registers, clock, pcb):
+        """ Fetch, decode and execute a single instruction. """
+        instruction = self._fetch()
+        opcode, operands = self._decode(instruction)
+        if self._execute(opcode, operands, pcb):
+            clock.increment()
+            pcb.execution_time += 1
+
     def _execute(self, opcode, operands, pcb):
         if opcode == "SWI":
-            return self._swi(operands, pcb)
+            return self._swi(operands)
             
 
         elif opcode in self.ops:
@@ -105,8 +319,9 @@ class CPU:
             self.running = False
             return False
 
-    def _swi(self, operands, pcb):
-        swi = int(operands[0])
+    def _swi(self, operands):
+        pcb = self.pcb
+        swi = operands[0]
         if self.verbose:
             print(f"\tSWI\t{swi}")
         if swi == 1: # End of file
@@ -146,7 +361,8 @@ class CPU:
             return
         
         elif swi == 11: # EXEC
-            self.system.exec(pcb)
+            if self.system.exec(pcb, self):
+                return True # This core runs the new program
             self.verbose = False
             self.running = False
             return
@@ -163,7 +379,7 @@ class CPU:
             ADD R1 R2 R3 
             R1 = R2 + R3
         """
-        first_register, second_register, third_register, _, _ = operands
+        first_register, second_register, third_register = operands
         self.registers[first_register] = self.registers[second_register] + self.registers[third_register]
         if self.verbose:
             print(f"\tADD\t{self.registers[second_register] + self.registers[third_register]} ({third_register}) = {self.registers[second_register]} ({second_register}) + {self.registers[third_register]} ({third_register})\t{self.registers}")
@@ -173,7 +389,7 @@ class CPU:
             SUB R1 R2 R3
             R1 = R2 - R3
         """
-        first_register, second_register, third_register, _, _ = operands
+        first_register, second_register, third_register = operands
         self.registers[first_register] = self.registers[second_register] - self.registers[third_register]
         if self.verbose:
             print(f"\tSUB\t{self.registers[second_register] - self.registers[third_register]} ({third_register}) = {self.registers[second_register]} ({second_register}) - {self.registers[third_register]} ({third_register})\t{self.registers}")
@@ -183,7 +399,7 @@ class CPU:
             MUL R1 R2 R3
             R1 = R2 * R3
         """
-        first_register, second_register, third_register, _, _ = operands
+        first_register, second_register, third_register = operands
         self.registers[first_register] = self.registers[second_register] * self.registers[third_register]
         if self.verbose:
             print(f"\tMUL\t{self.registers[second_register] * self.registers[third_register]} ({third_register}) = {self.registers[second_register]} ({second_register}) * {self.registers[third_register]} ({third_register})\t{self.registers}")
@@ -195,7 +411,7 @@ class CPU:
             R1 = R2 / R3
         """
 
-        first_register, second_register, third_register, _, _ = operands
+        first_register, second_register, third_register = operands
         if self.registers[third_register] == 0:
             self.system_call(104)
             print("Division by zero")
@@ -212,7 +428,7 @@ class CPU:
             MOV R1 R2
             R1 <= R2
         """
-        first_register, second_register, *_= operands
+        first_register, second_register = operands
         self.registers[first_register] = self.registers[second_register]
         if self.verbose:
             print(f"\tMOV\tR{first_register} <= R{second_register}\t\t\t{self.registers}")
@@ -224,9 +440,7 @@ class CPU:
             MVI R1 10
             R1 <= 10
         """
-        register = operands[0]
-        immediate_value_bytes = operands[1:5]
-        immediate_value = struct.unpack('<I', bytes(immediate_value_bytes))[0]
+        register, immediate_value = operands
         self.registers[register] = immediate_value
         if self.verbose:
             print(f"\tMVI\tR{register} <= {immediate_value}\t\t\t{self.registers}")
@@ -237,9 +451,7 @@ class CPU:
             ADR R1 0x1000
             R1 <= 0x1000
         """
-        register = operands[0]
-        address_bytes = operands[1:5]
-        address = struct.unpack('<I', bytes(address_bytes))[0]
+        register, address = operands
         self.registers[register] = address
         if self.verbose:
             print(f"\tADR\tR{register} <= {address}\t\t\t{self.registers}")
@@ -251,10 +463,11 @@ class CPU:
             STR R1 R2
             MEM[R2] <= R1
         """    
-        source_register, addess_register, *rest = operands
-        address = self.registers[addess_register]
+        source_register, addess_register = operands
+        address = self.registers[addess_register] + self.relocation
         value = self.registers[source_register]
-        self.memory[address:address+4] = struct.pack('<I', value)
+        self.write_word(address, value)
+        self.invalidate(address, 4)
         if self.verbose:
             print(f" - STR {source_register} <= MEM[{addess_register}]")
 
@@ -265,10 +478,11 @@ class CPU:
             STRB R1 R2
             MEM[R2] <= byte(memory[R1])
         """    
-        source_register, addess_register, *rest = operands
-        address = self.registers[addess_register]
-        value = self.memory[self.registers[source_register]]
-        self.memory[address] = value & 0xFF
+        source_register, addess_register = operands
+        address = self.registers[addess_register] + self.relocation
+        value = self.read_byte(self.registers[source_register] + self.relocation)
+        self.write_byte(address, value & 0xFF)
+        self.invalidate(address, 1)
         if self.verbose:
             print(f" - STRB {source_register} <= MEM[{addess_register}]")
 
@@ -278,9 +492,9 @@ class CPU:
             LDR R1 R2
             R1 <= MEM[R2]
         """    
-        source_register, addess_register, *rest = operands
-        address = self.registers[addess_register]
-        value = struct.unpack('<I', self.memory[address:address+4])[0]
+        source_register, addess_register = operands
+        address = self.registers[addess_register] + self.relocation
+        value = self.read_word(address)
         self.registers[source_register] = value
         if self.verbose:
             print(f" - LDR {source_register} <= MEM[{addess_register}]")
@@ -291,9 +505,9 @@ class CPU:
             LDRB R1 R2
             R1 <= byte(MEM[R2])
         """    
-        source_register, addess_register, *rest = operands
-        address = self.registers[addess_register]
-        value = self.memory[address]
+        source_register, addess_register = operands
+        address = self.registers[addess_register] + self.relocation
+        value = self.read_byte(address)
         self.registers[source_register] = value
         if self.verbose:
             print(f" - LDRB {source_register} <= MEM[{addess_register}]")
@@ -302,8 +516,7 @@ class CPU:
         """
             Branch to address
         """
-        address_bytes = operands[0:4]
-        address = struct.unpack('<I', bytes(address_bytes))[0]
+        address = operands[0]
         self.setPC(address)
         if self.verbose:
             print(f" - B {address}")
@@ -312,8 +525,7 @@ class CPU:
         """
             Branch to address and link
         """
-        address_bytes = operands[0:4]
-        address = struct.unpack('<I', bytes(address_bytes))[0]
+        address = operands[0]
         pc = self.registers[self.pc]
         self.setPC(address)
         self.registers[5] = pc
@@ -334,8 +546,7 @@ class CPU:
         """
             Jump to label if Z register is not zero
         """
-        address_bytes = operands[0:4]
-        address = struct.unpack('<I', bytes(address_bytes))[0]
+        address = operands[0]
         is_not_zero = self.registers[self.z] != 0
         if is_not_zero:
             self.setPC(address)
@@ -346,8 +557,7 @@ class CPU:
         """
             Jump to label if Z register is greater than zero
         """
-        address_bytes = operands[0:4]
-        address = struct.unpack('<I', bytes(address_bytes))[0]
+        address = operands[0]
         if self.registers[self.z] > 0:
             self.setPC(address)
             if self.verbose:
@@ -357,8 +567,7 @@ class CPU:
         """
             Jump to label if Z register is less than zero
         """
-        address_bytes = operands[0:4]
-        address = struct.unpack('<I', bytes(address_bytes))[0]
+        address = operands[0]
         if self.registers[self.z] < 0:
             self.setPC(address)
             if self.verbose:
@@ -368,8 +577,7 @@ class CPU:
         """
             Jump to label if Z register is equal to zero
         """
-        address_bytes = operands[0:4]
-        address = struct.unpack('<I', bytes(address_bytes))[0] + self.pcb.loader
+        address = operands[0] + self.pcb.loader
         
         if self.registers[self.z] == 0:
             self.setPC(address)
@@ -380,7 +588,7 @@ class CPU:
         """
             Compare two registers
         """
-        first_register, second_register, *_ = operands
+        first_register, second_register = operands
         val1 = self.registers[first_register]
         val2 = self.registers[second_register]
         val = val1 - val2
@@ -391,7 +599,7 @@ class CPU:
             AND R1 R2
             RZ = R1 & R2
         """
-        first_register, second_register, third_register, _, _ = operands
+        first_register, second_register, third_register = operands
         val2 = self.registers[second_register]
         val3 = self.registers[third_register]
         val = val2 & val3
@@ -404,7 +612,7 @@ class CPU:
             ORR R1 R2
             RZ = R1 | R2
         """
-        first_register, second_register, *rest = operands
+        first_register, second_register = operands
         val1 = self.registers[first_register]
         val2 = self.registers[second_register]
         val = val1 | val2
@@ -417,7 +625,7 @@ class CPU:
             EOR R1 R2
             RZ = R1 ^ R2
         """
-        first_register, second_register, *rest = operands
+        first_register, second_register = operands
         val1 = self.registers[first_register]
         val2 = self.registers[second_register]
         val = val1 ^ val2
@@ -430,17 +638,44 @@ class CPU:
             Decode instruction into opcode and operands
         """
         opcode = instructions[instruction[0]]
-        operands = instruction[1:]
+        operands = self.unpack_operands(opcode, instruction)
         return opcode, operands
 
+    @staticmethod
+    def unpack_operands(opcode, instruction):
+        """
+            Unpack the operands of an instruction into register indices and
+            32-bit immediates, according to the layout of its opcode
+        """
+        if opcode in THREE_REGISTER_OPS:
+            return instruction[1], instruction[2], instruction[3]
+        if opcode in TWO_REGISTER_OPS:
+            return instruction[1], instruction[2]
+        if opcode in IMMEDIATE_OPS:
+            return instruction[1], struct.unpack_from('<I', instruction, 2)[0]
+        if opcode in BRANCH_OPS:
+            return struct.unpack_from('<I', instruction, 1)
+        return (instruction[1],) # BX register, SWI code
+
+    @classmethod
+    def predecode(cls, instruction):
+        """
+            Decode an instruction into a (handler, operands) entry for the
+            instruction cache, or None if it can not be decoded
+        """
+        opcode = instructions.get(instruction[0])
+        if opcode is None or len(instruction) < 6:
+            return None
+        return cls.handlers[opcode], cls.unpack_operands(opcode, instruction)
+
     
     
     def _fetch(self):
         """
             Fetch the next instruction
         """
-        pc = self.registers[self.pc]
-        instruction = self.memory[pc:pc+6]
+        pc = self.registers[self.pc] + self.relocation
+        instruction = self.view[pc:pc+6]
         self.registers[self.pc] += 6
         return instruction
     
@@ -452,3 +687,8 @@ class CPU:
         return str(self.registers)
 
 
+# Unbound handler of every opcode, shared by the instruction cache of all CPUs
+CPU.handlers = {opcode: getattr(CPU, '_' + opcode.lower()) for opcode in instructions.values()}
+
+# A single step runs like a translated block of one instruction
+CPU._step.length = 1
@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+
+try:
+    from .Memory import Memory
+    from .MemoryDump import MemoryDump
+except ImportError:
+    from Memory import Memory
+    from MemoryDump import MemoryDump
+
+
+class Checkpoints:
+    """
+        A chain of incremental memory dumps in a directory.
+
+        The first checkpoint holds everything that is not zero, each later one
+        only the pages written since the checkpoint before it, found through
+        the memory's dirty map, so its cost follows how much was written and
+        not the size of the memory. Every checkpoint is a binary MemoryDump,
+        listed in manifest.json with the clock time it was taken at. rebuild
+        replays the chain up to any checkpoint.
+    """
+    MANIFEST = 'manifest.json'
+    VERSION = 1
+
+    def __init__(self, memory, directory):
+        self.memory = memory
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = {
+            'version': self.VERSION,
+            'memory_size': memory.size,
+            'page_size': 1 << memory.dirty_shift,
+            'checkpoints': [],
+        }
+
+    def checkpoint(self, time=None):
+        """ Save the pages written since the last checkpoint, returns its manifest entry. """
+        index = len(self.manifest['checkpoints'])
+        filename = f"checkpoint-{index:04d}.bin"
+        dump = MemoryDump(self.memory)
+        pages = self.memory.dirty_pages(clear=True)
+        shift = self.memory.dirty_shift
+        with open(os.path.join(self.directory, filename), 'wb') as f:
+            if index == 0:
+                dump.write_binary(f, nonzero=True)
+            else:
+                regions = [(None, first << shift, min(last << shift, self.memory.size)) for first, last in pages]
+                dump.write_binary(f, regions=regions)
+
+        entry = {
+            'index': index,
+            'time': time,
+            'file': filename,
+            'full': index == 0,
+            'pages': sum(last - first for first, last in pages),
+        }
+        self.manifest['checkpoints'].append(entry)
+        with open(os.path.join(self.directory, self.MANIFEST), 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        return entry
+
+    @classmethod
+    def load_manifest(cls, directory):
+        with open(os.path.join(directory, cls.MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest.get('version') != cls.VERSION:
+            raise ValueError(f"Unsupported checkpoint version {manifest.get('version')}")
+        return manifest
+
+    @classmethod
+    def rebuild(cls, directory, index=None):
+        """ A Memory holding the contents at checkpoint index, the last one by default. """
+        manifest = cls.load_manifest(directory)
+        checkpoints = manifest['checkpoints']
+        if not checkpoints:
+            raise ValueError(f"No checkpoints in {directory}")
+        index = len(checkpoints) - 1 if index is None else index
+        if not 0 <= index < len(checkpoints):
+            raise ValueError(f"No checkpoint {index} in {directory}, there are {len(checkpoints)}")
+
+        memory = Memory(manifest['memory_size'])
+        for entry in checkpoints[:index + 1]:
+            with open(os.path.join(directory, entry['file']), 'rb') as f:
+                _, records = MemoryDump.read_binary(f)
+            for start, data in records:
+                memory[start:start + len(data)] = data
+        return memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the memory at a checkpoint from a chain of incremental checkpoints.")
+    parser.add_argument('directory', help="directory holding manifest.json and the checkpoints")
+    parser.add_argument('-n', '--index', type=int, default=None, help="checkpoint to rebuild, the last one by default")
+    parser.add_argument('-o', '--output', default='memory.bin', help="file to write the memory to")
+    parser.add_argument('--hex', action='store_true', help="write a hex dump instead of a binary one")
+    args = parser.parse_args()
+
+    memory = Checkpoints.rebuild(args.directory, args.index)
+    dump = MemoryDump(memory)
+    if args.hex:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            dump.write_hex(f)
+    else:
+        with open(args.output, 'wb') as f:
+            dump.write_binary(f)
+    print(f"Memory rebuilt to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
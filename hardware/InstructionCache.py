@@ -0,0 +1,231 @@
+class Table(dict):
+    """
+        The pre-decoded entries of one code range, by address. A table loaded
+        from a DecodedImage starts out empty and reads an entry from its
+        records the first time the CPU misses it, see fill. Addresses whose
+        bytes were written over since are not read from the records again.
+    """
+    __slots__ = ('source', 'dropped')
+
+    def __init__(self, entries=(), source=None):
+        super().__init__(entries)
+        self.source = source
+        self.dropped = set() # Addresses the source is out of date for
+
+    def fill(self, address):
+        """ Read the entry at address from the source, None if it has none. """
+        if self.source is None or address in self.dropped:
+            return None
+        entry = self.source.entry(address)
+        if entry is not None:
+            self[address] = entry
+        return entry
+
+    def drop(self, address):
+        """ Forget the entry at address, whether it was read yet or not. Returns it, None if there was none. """
+        entry = self.pop(address, None)
+        if self.source is not None and address not in self.dropped:
+            self.dropped.add(address)
+            if entry is None:
+                entry = self.source.entry(address)
+        return entry
+
+
+class InstructionCache:
+    """
+        Decode-once cache of the code ranges loaded into memory.
+
+        Each loaded code range is turned into a table mapping the address of
+        every instruction to a pre-decoded entry (handler, operands), so the
+        CPU can skip fetch and decode for it. Entries are dropped when a store
+        writes over the bytes they were decoded from.
+
+        Basic blocks translated from a table are kept next to it, and are all
+        dropped as soon as any entry of the table is invalidated.
+
+        Tables are keyed by the program's addresses. The mapping of a code
+        range says where those addresses are in physical memory: a relocation
+        offset, or a page table (see PageTable.segments) when memory is paged.
+        release and invalidate use physical addresses.
+    """
+    page_shift = 8 # Code ranges are indexed by 256 byte pages for invalidation
+
+    def __init__(self, memory, decoder):
+        self.memory = memory
+        self.decoder = decoder
+        self.tables = {} # key -> Table of address -> (handler, operands)
+        self.translated = {} # key -> {address: block}
+        self.segments = {} # key -> [(physical start, physical end, offset)]
+        self.mappings = {} # key -> mapping the table was decoded through
+        self.pages = {}  # page -> [key]
+
+    def key(self, start, end, mapping=0):
+        if isinstance(mapping, int):
+            return (start + mapping, end + mapping)
+        return (start, end, mapping)
+
+    def load(self, start, end, mapping=0, decoded=None):
+        """
+            Decode the code range start..end (inclusive), placed in memory by
+            mapping, into a new table. decoded has the entries of the same
+            bytes already, such as the program image that was just loaded:
+            a dict of them or a DecodedImage they are read from when reached.
+        """
+        view = self.memory.view
+        if isinstance(mapping, int):
+            segments = [(start + mapping, end + mapping, mapping)]
+            read = lambda address: view[address+mapping:address+mapping+6]
+        else:
+            segments = mapping.segments(start, end)
+            read = lambda address: mapping.read(view, address, 6)
+
+        key = self.key(start, end, mapping)
+        for physical_start, physical_end, _ in segments:
+            self.release(physical_start, physical_end)
+        if key in self.tables:
+            self._forget(key)
+
+        if isinstance(decoded, dict):
+            table = Table(decoded)
+        elif decoded is not None:
+            table = Table(source=decoded)
+        else:
+            table = Table()
+            for address in range(start, end - 4, 6):
+                instruction = read(address)
+                entry = self.decoder(instruction) if instruction is not None else None
+                if entry is not None:
+                    table[address] = entry
+
+        self.tables[key] = table
+        self.translated[key] = {}
+        self.segments[key] = segments
+        self.mappings[key] = mapping
+        for page in self._pages(segments):
+            self.pages.setdefault(page, []).append(key)
+        return table
+
+    def table(self, start, end, mapping=0):
+        """ Get the table for a code range, decoding it if it is not cached yet. """
+        key = self.key(start, end, mapping)
+        table = self.tables.get(key)
+        if table is None or self.mappings[key] != mapping:
+            table = self.load(start, end, mapping)
+        return table
+
+    def blocks(self, start, end, mapping=0):
+        """ Get the translated blocks of a code range. """
+        self.table(start, end, mapping)
+        return self.translated[self.key(start, end, mapping)]
+
+    def refresh(self, start, end, mapping, first, last):
+        """
+            Decode the instructions of the code range start..end touching the
+            addresses first..last, after the page holding them was mapped.
+        """
+        key = self.key(start, end, mapping)
+        table = self.tables.get(key)
+        if table is None:
+            return self.load(start, end, mapping)
+
+        view = self.memory.view
+        address = start + max(0, -(-(first - 5 - start) // 6)) * 6
+        for address in range(address, min(last + 1, end - 4), 6):
+            if address not in table:
+                instruction = mapping.read(view, address, 6)
+                entry = self.decoder(instruction) if instruction is not None else None
+                if entry is not None:
+                    table[address] = entry
+        self._reindex(key, mapping.segments(start, end))
+        return table
+
+    def drop(self, start, end):
+        """ Forget the entries decoded from the physical range start..end, after its page was unmapped. """
+        for key in self._overlapping(start, end):
+            table = self.tables[key]
+            for physical_start, physical_end, offset in self.segments[key]:
+                if physical_start <= end and start <= physical_end:
+                    for instruction in range(max(physical_start, start) - 5, min(physical_end, end) + 1):
+                        table.drop(instruction - offset)
+            self.translated[key].clear()
+            mapping = self.mappings[key]
+            if isinstance(mapping, int):
+                self._forget(key)
+            else:
+                self._reindex(key, mapping.segments(key[0], key[1]))
+
+    def discard(self, start, end, mapping=0):
+        """ Forget the table of one code range, leaving other tables on the same memory alone. """
+        key = self.key(start, end, mapping)
+        if key in self.tables:
+            self._forget(key)
+
+    def release(self, start, end):
+        """ Forget every table overlapping the physical range start..end (inclusive). """
+        for key in self._overlapping(start, end):
+            self._forget(key)
+
+    def invalidate(self, address, length):
+        """
+            Drop the entries decoded from any of the bytes address..address+length-1.
+            Returns True if any cached code was overwritten.
+        """
+        if (address >> self.page_shift) not in self.pages and \
+                ((address + length - 1) >> self.page_shift) not in self.pages:
+            return False
+
+        hit = False
+        end = address + length - 1
+        for key in self._overlapping(address, end):
+            table = self.tables[key]
+            dropped = []
+            for physical_start, physical_end, offset in self.segments[key]:
+                if physical_start <= end and address <= physical_end:
+                    dropped += [table.drop(instruction - offset) for instruction in range(address - 5, address + length)]
+            if any(dropped):
+                self.translated[key].clear()
+                hit = True
+        return hit
+
+    def _forget(self, key):
+        del self.tables[key]
+        del self.translated[key]
+        del self.mappings[key]
+        for page in self._pages(self.segments.pop(key)):
+            keys = self.pages[page]
+            keys.remove(key)
+            if not keys:
+                del self.pages[page]
+
+    def _reindex(self, key, segments):
+        """ Move key over to the physical ranges of its new segments. """
+        for page in self._pages(self.segments[key]):
+            keys = self.pages[page]
+            keys.remove(key)
+            if not keys:
+                del self.pages[page]
+        self.segments[key] = segments
+        for page in self._pages(segments):
+            self.pages.setdefault(page, []).append(key)
+
+    def _pages(self, segments):
+        """ Every cache page the segments touch, once each. """
+        pages = set()
+        for physical_start, physical_end, _ in segments:
+            pages.update(range(physical_start >> self.page_shift, (physical_end >> self.page_shift) + 1))
+        return pages
+
+    def _overlapping(self, start, end):
+        keys = set()
+        for page in range(start >> self.page_shift, (end >> self.page_shift) + 1):
+            for key in self.pages.get(page, ()):
+                if key in keys:
+                    continue
+                for physical_start, physical_end, _ in self.segments[key]:
+                    if physical_start <= end and start <= physical_end:
+                        keys.add(key)
+                        break
+        return keys
+
+    def __len__(self):
+        return sum(len(table) for table in self.tables.values())
@@ -1,11 +1,135 @@
+import io
+import mmap
+import re
+import struct
+from .SparseBuffer import SparseBuffer
+from .MemoryDump import MemoryDump
+
+WORD = struct.Struct('<I')
+
+
+class MemoryAccessError(IndexError):
+    """ Raised when an access falls outside of the memory. """
+
+
+def unpack_sparse_word(view, address):
+    return WORD.unpack(view[address:address + 4])
+
+def pack_sparse_word(view, address, value):
+    view[address:address + 4] = WORD.pack(value)
+
+
 class Memory:
-    def __init__(self, size='1K'):
+    """
+        The physical memory, stored in one of three backends:
+            'bytearray' allocated and zeroed up front, used for small memories
+            'mmap'      an anonymous mapping, or a file mapping when path is
+                        given, whose pages only take up space once touched
+            'sparse'    a SparseBuffer allocating 64K chunks on first write
+        By default the backend is picked by size, see default_backend.
+        With an offset the mmap backend maps an existing file from offset on
+        copy-on-write instead, so writes never reach the file, which is how a
+        snapshot's memory is restored without reading it.
+
+        Every write marks the pages it touches in the dirty map, one byte per
+        page, so checkpoints only need to save the pages written since the
+        last one. Pages are 256 bytes, or larger for memories over 256M so the
+        map stays under a megabyte.
+    """
+    backends = ('bytearray', 'mmap', 'sparse')
+    mmap_size = 1024 * 1024 # Memories this large or larger are mapped
+    sparse_size = 1024 * 1024 * 1024 # and from this size on they are sparse
+
+    def __init__(self, size='1K', backend=None, path=None, offset=None):
         self.size = self.calculate_size(size)
         self.cols = 6
         self.rows = self.size // self.cols
-        self._memory = bytearray(self.size)
+        self.backend = backend or self.default_backend(self.size, path)
+        if self.backend not in self.backends:
+            raise ValueError(f"Unknown memory backend: {self.backend}. Choose from {', '.join(self.backends)}")
+        self.path = path
+        self._file = None
+        self.dirty_shift = max(8, (self.size >> 20).bit_length())
+        self.dirty = bytearray((self.size >> self.dirty_shift) + 1) # 1 for each page written to
+
+        # Raw buffer interface, bound once by the CPU
+        self.unpack_word = WORD.unpack_from
+        self.pack_word = WORD.pack_into
+        if self.backend == 'sparse':
+            self._memory = SparseBuffer(self.size)
+            self.view = self._memory
+            self.unpack_word = unpack_sparse_word
+            self.pack_word = pack_sparse_word
+        elif self.backend == 'mmap':
+            if path and offset is not None:
+                self._file = open(path, 'rb')
+                self._memory = mmap.mmap(self._file.fileno(), self.size, access=mmap.ACCESS_COPY, offset=offset)
+            elif path:
+                self._file = open(path, 'w+b')
+                self._file.truncate(self.size)
+                self._memory = mmap.mmap(self._file.fileno(), self.size)
+            else:
+                self._memory = mmap.mmap(-1, self.size, flags=mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS)
+            self.view = memoryview(self._memory)
+        else:
+            self._memory = bytearray(self.size)
+            self.view = memoryview(self._memory)
+
+    def default_backend(self, size, path=None):
+        if path or self.mmap_size <= size < self.sparse_size:
+            return 'mmap'
+        if size >= self.sparse_size:
+            return 'sparse'
+        return 'bytearray'
+
+    def mark(self, start, length):
+        """ Mark the pages of start..start+length-1 dirty. """
+        first = start >> self.dirty_shift
+        last = ((start + length - 1) >> self.dirty_shift) + 1
+        self.dirty[first:last] = b'\x01' * (last - first)
+
+    def dirty_pages(self, clear=False):
+        """ (first, last) runs of pages written to since the map was last cleared, in order. """
+        runs = [match.span() for match in re.finditer(rb'\x01+', self.dirty)]
+        if clear:
+            for first, last in runs:
+                self.dirty[first:last] = bytes(last - first)
+        return runs
+
+    def zero(self, start, end):
+        """ Clear start..end-1 in bulk. Whole pages of an anonymous mapping are handed back to the OS instead. """
+        if end > start:
+            self.mark(start, end - start)
+        if self.backend == 'sparse':
+            self._memory.zero(start, end)
+            return
+        if self.backend == 'mmap' and self._file is None and hasattr(mmap, 'MADV_DONTNEED'):
+            first = -(-start // mmap.PAGESIZE) * mmap.PAGESIZE
+            last = end // mmap.PAGESIZE * mmap.PAGESIZE
+            if first < last:
+                self._memory.madvise(mmap.MADV_DONTNEED, first, last - first) # Reads as zero from now on
+                self.view[start:first] = bytes(first - start)
+                self.view[last:end] = bytes(end - last)
+                return
+        self.view[start:end] = bytes(end - start)
+
+    def extents(self):
+        """ (start, end) runs of memory that may hold non-zero bytes, in address order. """
+        if self.backend == 'sparse':
+            return self._memory.extents()
+        return [(0, self.size)]
+
+    def close(self):
+        """ Unmap an mmap backed memory. """
+        if self.backend == 'mmap':
+            self.view.release()
+            self._memory.close()
+            if self._file:
+                self._file.close()
 
     def calculate_size(self, size):
+        if isinstance(size, int):
+            return size
         size_int = int(size[:-1])
         size_char = size[-1]
 
@@ -22,37 +146,56 @@ class Memory:
         return f"<Memory size={self.size} bytes>"
 
     def __str__(self):
-        string = '\n'
-        l = 0
-        for i in range(self.rows):
-            if i % 5 == 0:
-                _ = ''
-            string += f"{l}-{l+5}: "
-            l += 6
-            for j in range(self.cols):
-                index = i * self.cols + j
-                if index < len(self._memory):
-                    string += f"{self._memory[index]:02X} "
-                else:
-                    string += "   "
-            string += '\n'
-        return string
+        string = io.StringIO()
+        string.write('\n')
+        MemoryDump(self, self.cols).write_hex(string)
+        return string.getvalue()
     
     def __getitem__(self, key):
-        if isinstance(key, int):
-            return self._memory[key]
-        elif isinstance(key, slice):
+        try:
             return self._memory[key]
-        else:
+        except TypeError:
             raise TypeError('Tried to get from memory with invalid access type.')
     
     def __setitem__(self, key, value):
-        if isinstance(key, int):
-            self._memory[key] = value
-        elif isinstance(key, slice):
+        try:
             self._memory[key] = value
-        else:
+        except TypeError:
             raise TypeError("Tried to store in memory with invalid access type")
+        if isinstance(key, slice):
+            start, stop, _ = key.indices(self.size)
+            if stop > start:
+                self.mark(start, stop - start)
+        else:
+            self.mark(key % self.size, 1)
+
+    def check_bounds(self, address, length=1):
+        """ Raise MemoryAccessError unless address..address+length-1 is inside the memory. """
+        if address < 0 or address + length > self.size:
+            raise MemoryAccessError(f"Out of bounds memory access at address {address}")
+
+    def read_word(self, address):
+        self.check_bounds(address, 4)
+        return self.unpack_word(self.view, address)[0]
+
+    def write_word(self, address, value):
+        self.check_bounds(address, 4)
+        self.pack_word(self.view, address, value)
+        self.dirty[address >> self.dirty_shift] = 1
+        self.dirty[(address + 3) >> self.dirty_shift] = 1
+
+    def read_byte(self, address):
+        self.check_bounds(address)
+        return self._memory[address]
+
+    def write_byte(self, address, value):
+        self.check_bounds(address)
+        self._memory[address] = value
+        self.dirty[address >> self.dirty_shift] = 1
+
+    def fetch(self, address):
+        """ Instruction at address, as a view into the memory. """
+        return self.view[address:address+6]
 
     def __len__(self):
         return len(self._memory)
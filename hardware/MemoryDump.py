@@ -0,0 +1,102 @@
+import struct
+
+
+class MemoryDump:
+    """
+        Streams the contents of a Memory to a file as it reads it, so a dump
+        never holds more than one block of memory and its text at a time.
+
+        The hex format has one row of cols bytes per line,
+            0-5: 16 00 64 00 00 00
+        optionally limited to an address range, to rows that are not all zero,
+        or to labelled regions such as the memory of each process.
+
+        The binary format is a header followed by records of raw memory:
+            header  magic b'OSXD', version, flags, memory size  (HEADER)
+            record  start address, length                      (RECORD)
+                    followed by length bytes of memory
+        With nonzero set, blocks of block_size zero bytes are left out.
+    """
+    MAGIC = b'OSXD'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHHQ')
+    RECORD = struct.Struct('<QQ')
+    block_size = 4096
+
+    def __init__(self, memory, cols=6):
+        self.memory = memory
+        self.cols = cols
+
+    def ranges(self, start=0, end=None, nonzero=False):
+        """ The parts of start..end-1 to dump, skipping memory that was never written when nonzero is set. """
+        end = self.memory.size if end is None else min(end, self.memory.size)
+        if start >= end:
+            return []
+        if not nonzero:
+            return [(start, end)]
+        return [(max(start, first), min(end, last)) for first, last in self.memory.extents()
+                if first < end and start < last]
+
+    def write_hex(self, file, start=0, end=None, nonzero=False):
+        """ Write the rows of start..end-1 to file as text, rows are counted from start. """
+        cols = self.cols
+        width = 3 * cols # Characters of the bytes of a row
+        zero_row = '00 ' * cols
+        step = cols * (self.block_size // cols)
+        for first, last in self.ranges(start, end, nonzero):
+            first -= (first - start) % cols # Keep rows aligned with start
+            for block_start in range(first, last, step):
+                block = bytes(self.memory[block_start:min(block_start + step, last)])
+                if nonzero and block.count(0) == len(block):
+                    continue
+                text = block.hex(' ').upper() + ' '
+                text += ' ' * (-len(text) % width) # Pad a partial last row
+                rows = zip(range(block_start, block_start + len(block), cols), range(0, len(text), width))
+                file.write(''.join([f"{address}-{address + cols - 1}: {text[i:i + width]}\n" for address, i in rows
+                                    if not nonzero or text[i:i + width] != zero_row]))
+
+    def write_regions(self, file, regions, nonzero=False):
+        """ Write each (label, start, end) region under a header line naming it. """
+        for label, start, end in regions:
+            file.write(f"# {label} {start}-{end - 1}\n")
+            self.write_hex(file, start, end, nonzero)
+
+    def write_binary(self, file, start=0, end=None, nonzero=False, regions=None):
+        """ Write start..end-1, or each (label, start, end) region, to the binary file as records of raw memory. """
+        file.write(self.HEADER.pack(self.MAGIC, self.VERSION, 0, self.memory.size))
+        bounds = [(start, end)] if regions is None else [(first, last) for _, first, last in regions]
+        ranges = [extent for first, last in bounds for extent in self.ranges(first, last, nonzero)]
+        for first, last in ranges:
+            record_start = None
+            for block_start in range(first, last, self.block_size):
+                block_end = min(block_start + self.block_size, last)
+                if nonzero and self.memory[block_start:block_end].count(0) == block_end - block_start:
+                    if record_start is not None:
+                        self._write_record(file, record_start, block_start)
+                        record_start = None
+                elif record_start is None:
+                    record_start = block_start
+            if record_start is not None:
+                self._write_record(file, record_start, last)
+
+    def _write_record(self, file, start, end):
+        file.write(self.RECORD.pack(start, end - start))
+        for block_start in range(start, end, self.block_size):
+            file.write(self.memory[block_start:min(block_start + self.block_size, end)])
+
+    @classmethod
+    def read_binary(cls, file):
+        """ Memory size and list of (start, bytes) records of a binary dump. """
+        magic, version, _, size = cls.HEADER.unpack(file.read(cls.HEADER.size))
+        if magic != cls.MAGIC:
+            raise ValueError("Not a memory dump")
+        if version != cls.VERSION:
+            raise ValueError(f"Unsupported memory dump version {version}")
+        records = []
+        while True:
+            header = file.read(cls.RECORD.size)
+            if not header:
+                break
+            start, length = cls.RECORD.unpack(header)
+            records.append((start, file.read(length)))
+        return size, records
@@ -0,0 +1,103 @@
+from .Memory import MemoryAccessError
+
+
+class PageFault(MemoryAccessError):
+    """ Raised when a page that is not mapped is accessed. """
+    def __init__(self, page):
+        super().__init__(f"Page fault on page {page}")
+        self.page = page
+
+
+class PageTable:
+    """
+        Maps the virtual pages of a process to physical frames.
+
+        Page numbers are virtual addresses shifted right by page_shift, so an
+        address is translated to (frame << page_shift) | (address & page_mask).
+        Looking up a page that is not mapped raises a PageFault. Pages that
+        have been written to since they were mapped are kept in dirty, and
+        pages shared copy-on-write with another page table in cow.
+    """
+    def __init__(self, page_size):
+        if page_size <= 0 or page_size & (page_size - 1):
+            raise ValueError(f"Page size must be a power of two, got {page_size}")
+        self.page_size = page_size
+        self.page_shift = page_size.bit_length() - 1
+        self.page_mask = page_size - 1
+        self.frames = {} # page -> frame
+        self.dirty = set()
+        self.cow = set()
+
+    def map(self, page, frame):
+        self.frames[page] = frame
+
+    def unmap(self, page):
+        self.dirty.discard(page)
+        self.cow.discard(page)
+        return self.frames.pop(page, None)
+
+    def copy(self):
+        """ A page table mapping the same pages to the same frames. """
+        page_table = PageTable(self.page_size)
+        page_table.frames = dict(self.frames)
+        page_table.dirty = set(self.dirty)
+        page_table.cow = set(self.cow)
+        return page_table
+
+    def lookup(self, page):
+        """ Frame of page, raises PageFault if it is not mapped. """
+        frame = self.frames.get(page)
+        if frame is None:
+            raise PageFault(page)
+        return frame
+
+    def translate(self, address):
+        return (self.lookup(address >> self.page_shift) << self.page_shift) | (address & self.page_mask)
+
+    def pages(self, start, end):
+        """ Pages covering the addresses start..end (inclusive). """
+        return range(start >> self.page_shift, (end >> self.page_shift) + 1)
+
+    def segments(self, start, end):
+        """
+            The mapped parts of start..end (inclusive) as (physical start,
+            physical end, offset) tuples, where physical = virtual + offset.
+            Neighbouring pages in neighbouring frames form a single segment.
+        """
+        segments = []
+        for page in self.pages(start, end):
+            frame = self.frames.get(page)
+            if frame is None:
+                continue
+            offset = (frame - page) << self.page_shift
+            first = max(start, page << self.page_shift) + offset
+            last = min(end, ((page + 1) << self.page_shift) - 1) + offset
+            if segments and segments[-1][2] == offset and segments[-1][1] + 1 == first:
+                segments[-1] = (segments[-1][0], last, offset)
+            else:
+                segments.append((first, last, offset))
+        return segments
+
+    def read(self, view, address, length):
+        """ The bytes at address..address+length-1 of view, None if any of them is not mapped. """
+        chunks = []
+        while length > 0:
+            frame = self.frames.get(address >> self.page_shift)
+            if frame is None:
+                return None
+            offset = address & self.page_mask
+            n = min(length, self.page_size - offset)
+            physical = (frame << self.page_shift) | offset
+            chunks.append(view[physical:physical+n])
+            address += n
+            length -= n
+        return chunks[0] if len(chunks) == 1 else b''.join(chunks)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __iter__(self):
+        return iter(sorted(self.frames.items()))
+
+    def __repr__(self):
+        return f"<PageTable page_size={self.page_size} frames={dict(self)}>"
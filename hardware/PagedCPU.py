@@ -0,0 +1,137 @@
+from .CPU import CPU
+from .Memory import WORD
+from .PageTable import PageFault
+from .TLB import TLB
+
+
+class PagedCPU(CPU):
+    """
+        CPU whose addresses are virtual and translated through the running
+        process's page table, with a TLB in front of it. Instruction fetch,
+        loads and stores all go through translate. An access to a page that
+        is not mapped is handed to the memory manager, which maps it or raises
+        a MemoryAccessError like any other bad access. The time the fault took
+        is charged to the clock, or stalls this CPU when it runs in lockstep.
+        A store to a page shared copy-on-write first gets the page a frame of
+        its own from the memory manager.
+    """
+    saved_state = CPU.saved_state + ('tlb', 'page_table', 'page_size', 'page_shift', 'page_mask')
+
+    def __init__(self, memory, system, tlb_size=16):
+        super().__init__(memory, system)
+        self.tlb = TLB(tlb_size)
+        self.page_table = None
+        self.lockstep = False
+
+        # Loads and stores take virtual addresses
+        self.read_word = self._read_word
+        self.write_word = self._write_word
+        self.read_byte = self._read_byte
+        self.write_byte = self._write_byte
+        self.invalidate = self._invalidate
+
+    def run_program(self, pcb, verbose=False, quantum=None):
+        self.lockstep = False
+        super().run_program(pcb, verbose, quantum)
+
+    def dispatch(self, pcb, verbose=False, quantum=None):
+        self.lockstep = True
+        super().dispatch(pcb, verbose, quantum)
+
+    def _restore(self, pcb):
+        cost = super()._restore(pcb)
+        if pcb.page_table is not self.page_table:
+            # Translations of the last address space are no longer valid
+            self.tlb.flush()
+            self.page_table = pcb.page_table
+            self.page_size = pcb.page_table.page_size
+            self.page_shift = pcb.page_table.page_shift
+            self.page_mask = pcb.page_table.page_mask
+        return cost
+
+    def translate(self, address):
+        """ Physical address of the virtual address. """
+        try:
+            frame = self.tlb.lookup(address >> self.page_shift, self.page_table)
+        except PageFault as fault:
+            frame = self._page_fault(fault.page)
+        return (frame << self.page_shift) | (address & self.page_mask)
+
+    def _page_fault(self, page):
+        frame, latency = self.system.memory_manager.page_fault(self.pcb, page)
+        self.tlb.insert(page, frame)
+        if self.lockstep:
+            self.stall += latency
+        else:
+            self.system.clock += latency
+        return frame
+
+    def _copy_on_write(self, page):
+        self.system.memory_manager.copy_on_write(self.pcb, page)
+        self.tlb.invalidate(page)
+
+    def _chunks(self, address, length):
+        """ (physical address, length) of each page touched by address..address+length-1. """
+        while length > 0:
+            n = min(length, self.page_size - (address & self.page_mask))
+            yield self.translate(address), n
+            address += n
+            length -= n
+
+    def _read(self, address, length):
+        return b''.join(self.view[physical:physical+n] for physical, n in self._chunks(address, length))
+
+    def _write(self, address, data):
+        for page in range(address >> self.page_shift, ((address + len(data) - 1) >> self.page_shift) + 1):
+            if page in self.page_table.cow:
+                self._copy_on_write(page)
+        i = 0
+        for physical, n in list(self._chunks(address, len(data))):
+            self.view[physical:physical+n] = data[i:i+n]
+            self.memory.mark(physical, n)
+            self.page_table.dirty.add((address + i) >> self.page_shift)
+            i += n
+
+    def _read_word(self, address):
+        if (address & self.page_mask) <= self.page_size - 4:
+            return self.memory.read_word(self.translate(address))
+        return WORD.unpack(self._read(address, 4))[0]
+
+    def _write_word(self, address, value):
+        if (address & self.page_mask) <= self.page_size - 4:
+            page = address >> self.page_shift
+            if page in self.page_table.cow:
+                self._copy_on_write(page)
+            self.memory.write_word(self.translate(address), value)
+            self.page_table.dirty.add(page)
+        else:
+            self._write(address, WORD.pack(value))
+
+    def _read_byte(self, address):
+        return self.memory.read_byte(self.translate(address))
+
+    def _write_byte(self, address, value):
+        page = address >> self.page_shift
+        if page in self.page_table.cow:
+            self._copy_on_write(page)
+        self.memory.write_byte(self.translate(address), value)
+        self.page_table.dirty.add(page)
+
+    def _invalidate(self, address, length):
+        hit = False
+        for physical, n in self._chunks(address, length):
+            hit = self.instruction_cache.invalidate(physical, n) or hit
+        return hit
+
+    def _fetch(self):
+        """
+            Fetch the next instruction
+        """
+        pc = self.registers[self.pc]
+        if (pc & self.page_mask) <= self.page_size - 6:
+            physical = self.translate(pc)
+            instruction = self.view[physical:physical+6]
+        else:
+            instruction = self._read(pc, 6)
+        self.registers[self.pc] += 6
+        return instruction
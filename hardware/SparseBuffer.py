@@ -0,0 +1,99 @@
+class SparseBuffer:
+    """
+        Byte buffer that only allocates the chunks that have been written to.
+        Chunks that were never written read as zero, and zeroing a whole chunk
+        drops it again. Supports the indexing and slicing of a bytearray, with
+        slices read as bytes, so it can stand in for the memoryview of a
+        Memory.
+    """
+    chunk_size = 64 * 1024
+
+    def __init__(self, size):
+        self.size = size
+        self.chunks = {} # chunk index -> bytearray(chunk_size)
+
+    def _range(self, key):
+        start, stop, step = key.indices(self.size)
+        if step != 1:
+            raise ValueError("SparseBuffer slices must be contiguous")
+        return start, max(start, stop)
+
+    def _spans(self, start, stop):
+        """ (chunk index, offset in chunk, length) of each chunk touched by start..stop-1. """
+        while start < stop:
+            index, offset = divmod(start, self.chunk_size)
+            length = min(stop - start, self.chunk_size - offset)
+            yield index, offset, length
+            start += length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop = self._range(key)
+            parts = []
+            for index, offset, length in self._spans(start, stop):
+                chunk = self.chunks.get(index)
+                parts.append(bytes(chunk[offset:offset + length]) if chunk is not None else bytes(length))
+            return parts[0] if len(parts) == 1 else b''.join(parts)
+
+        if key < 0:
+            key += self.size
+        if not 0 <= key < self.size:
+            raise IndexError("SparseBuffer index out of range")
+        chunk = self.chunks.get(key // self.chunk_size)
+        return chunk[key % self.chunk_size] if chunk is not None else 0
+
+    def __setitem__(self, key, value):
+        if not isinstance(key, slice):
+            if key < 0:
+                key += self.size
+            if not 0 <= key < self.size:
+                raise IndexError("SparseBuffer index out of range")
+            self[key:key + 1] = bytes([value])
+            return
+
+        start, stop = self._range(key)
+        data = value if isinstance(value, (bytes, bytearray, memoryview)) else bytes(value)
+        if len(data) != stop - start:
+            raise ValueError("SparseBuffer slice assignment cannot change its size")
+        data = memoryview(data).cast('B')
+        position = 0
+        for index, offset, length in self._spans(start, stop):
+            part = data[position:position + length]
+            chunk = self.chunks.get(index)
+            if chunk is None:
+                if not any(part):
+                    position += length
+                    continue # Still zero, no need to allocate it
+                chunk = self.chunks[index] = bytearray(self.chunk_size)
+            chunk[offset:offset + length] = part
+            position += length
+
+    def zero(self, start, stop):
+        """ Clear start..stop-1, dropping the chunks it covers entirely. """
+        for index, offset, length in self._spans(start, stop):
+            if length == self.chunk_size:
+                self.chunks.pop(index, None)
+            elif index in self.chunks:
+                self.chunks[index][offset:offset + length] = bytes(length)
+
+    def extents(self):
+        """ (start, end) of each run of allocated chunks, in address order. """
+        extents = []
+        for index in sorted(self.chunks):
+            start = index * self.chunk_size
+            end = min(start + self.chunk_size, self.size)
+            if extents and extents[-1][1] == start:
+                extents[-1] = (extents[-1][0], end)
+            else:
+                extents.append((start, end))
+        return extents
+
+    def resident(self):
+        """ Bytes actually allocated. """
+        return len(self.chunks) * self.chunk_size
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return f"<SparseBuffer size={self.size} chunks={len(self.chunks)}>"
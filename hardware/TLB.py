@@ -0,0 +1,49 @@
+from collections import OrderedDict
+
+
+class TLB:
+    """
+        Translation lookaside buffer, a small fully associative cache of
+        page -> frame translations in front of the page table. When it is
+        full the least recently used translation is evicted.
+    """
+    def __init__(self, size=16):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, page, page_table):
+        """ Frame of page, walking page_table on a miss. """
+        frame = self.entries.get(page)
+        if frame is not None:
+            self.hits += 1
+            self.entries.move_to_end(page)
+            return frame
+
+        self.misses += 1
+        frame = page_table.lookup(page)
+        self.insert(page, frame)
+        return frame
+
+    def insert(self, page, frame):
+        self.entries[page] = frame
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, page):
+        """ Forget the translation of page, after it was unmapped. """
+        self.entries.pop(page, None)
+
+    def flush(self):
+        self.entries.clear()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return f"<TLB size={self.size} hits={self.hits} misses={self.misses}>"
@@ -0,0 +1,61 @@
+import unittest
+import sys
+import os
+import io
+import glob
+import struct
+import tempfile
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.Assembler import Assembler, AssemblerError
+from System.System import System
+from cli.Shell import ShellMode
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# .osx files that were not assembled again after their source changed: mov.osx lacks the final SWI 1, load_test_1/2.osx the SWI 2
+STALE = ('tests/ops/mov.asm', 'tests/programs/load_test_1.asm', 'tests/programs/load_test_2.asm')
+
+class TestAssembler(unittest.TestCase):
+    def test_same_bytes_as_osx(self):
+        sources = [path for path in glob.glob(os.path.join(ROOT, '**', '*.asm'), recursive=True) if os.path.exists(path[:-4] + '.osx') and os.path.relpath(path, ROOT) not in STALE]
+        self.assertGreater(len(sources), 40)
+        for path in sources:
+            with open(path[:-4] + '.osx', 'rb') as f:
+                expected = f.read()
+            loader = struct.unpack('III', expected[:12])[2]
+            with open(path) as f:
+                self.assertEqual(Assembler().assemble(f.read(), loader, path), expected, path)
+
+    def test_labels_data_and_aliases(self):
+        image = Assembler().assemble("VALUE .WORD -1\nCHAR .BYTE 'x'\nLOOP:\n  mvi r1 0x10 ; comment\n  EOR R0 R1 Z\n  BNE LOOP\n  ADR R2 CHAR\n", 40)
+        self.assertEqual(struct.unpack('III', image[:12]), (29, 5, 40))
+        self.assertEqual(image[12:17], b'\xff\xff\xff\xffx')
+        self.assertEqual(image[17:23], bytes([22, 1, 16, 0, 0, 0]))
+        self.assertEqual(image[23:29], bytes([15, 0, 1, 9, 0x20, 0x20]))
+        self.assertEqual(image[29:35], bytes([8, 5, 0, 0, 0, 0x20]))
+        self.assertEqual(image[35:41], bytes([0, 2, 4, 0, 0, 0]))
+
+    def test_errors(self):
+        for source, line in (("MVI R1 1\nFOO R1", 2), ("ADD R0 R1", 1), ("MOV R0 R12", 1), ("B NOWHERE", 1), ("A MVI R0 1\nA SWI 1", 2)):
+            with self.assertRaises(AssemblerError) as error:
+                Assembler().assemble(source)
+            self.assertEqual(error.exception.line, line, source)
+
+    def test_assembled_program_runs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'add.asm')
+            with open(source, 'w') as f:
+                f.write("START MVI R1 2 ;\n      MVI R2 3 ;\n      ADD R0 R1 R2 ;\n      SWI 1 ;\n")
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                ShellMode(System()).execute_terimal_command([source, '100'])
+            self.assertIn('Assembled', output.getvalue())
+
+            system = System()
+            with contextlib.redirect_stdout(io.StringIO()):
+                system.call('execute', os.path.join(directory, 'add.osx'), 0)
+            self.assertEqual(system.terminated_queue[0].registers[0], 5)
+            self.assertEqual(system.terminated_queue[0].loader, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import sys
+import os
+import io
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+
+class TestBlockEngine(unittest.TestCase):
+    def setUp(self):
+        self.system = System(engine='blocks')
+        self.bl_file  = os.path.join(os.path.dirname(__file__), 'ops/bl.osx')
+        self.bne_file = os.path.join(os.path.dirname(__file__), 'ops/bne.osx')
+        self.div_file = os.path.join(os.path.dirname(__file__), 'ops/div.osx')
+        self.ldr_file = os.path.join(os.path.dirname(__file__), 'ops/ldr.osx')
+        return super().setUp()
+
+    def run_file(self, system, filepath):
+        system.call('load', filepath)
+        system.call('run', filepath)
+        return system.CPU.registers
+
+    def test_bl(self):
+        self.assertEqual(self.run_file(self.system, self.bl_file)[0], 300)
+
+    def test_bne(self):
+        self.assertEqual(self.run_file(self.system, self.bne_file)[0], 1)
+
+    def test_div(self):
+        self.assertEqual(self.run_file(self.system, self.div_file)[0], 2)
+
+    def test_ldr(self):
+        self.assertEqual(self.run_file(self.system, self.ldr_file)[0], 300)
+
+    def test_matches_interpreter(self):
+        reference = System()
+        for filepath in (self.bl_file, self.bne_file, self.div_file, self.ldr_file):
+            registers = self.run_file(self.system, filepath)
+            self.assertEqual(registers, self.run_file(reference, filepath))
+            self.assertEqual(self.system.clock.time, reference.clock.time)
+
+    def test_fork_matches_interpreter(self):
+        reference = System()
+        with contextlib.redirect_stdout(io.StringIO()) as blocks_output:
+            self.system.call('execute', 'programs/fork.osx', 0)
+        with contextlib.redirect_stdout(io.StringIO()) as reference_output:
+            reference.call('execute', 'programs/fork.osx', 0)
+
+        self.assertEqual(blocks_output.getvalue(), reference_output.getvalue())
+        self.assertEqual(
+            [pcb.execution_time for pcb in self.system.terminated_queue],
+            [pcb.execution_time for pcb in reference.terminated_queue])
+
+    def test_blocks_are_cached(self):
+        self.system.handle_load(self.bl_file)
+        pcb = self.system.job_queue[0]
+        self.system.CPU.run_program(pcb)
+        self.assertTrue(self.system.instruction_cache.blocks(pcb.code_start, pcb.code_end))
+
+
+if __name__ == "__main__":
+    unittest.main()
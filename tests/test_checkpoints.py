@@ -0,0 +1,80 @@
+import unittest
+import sys
+import os
+import io
+import tempfile
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+from hardware.Memory import Memory
+from hardware.Checkpoints import Checkpoints
+
+class TestDirtyPages(unittest.TestCase):
+    def test_writes_mark_pages(self):
+        memory = Memory('4K')
+        self.assertEqual(memory.dirty_pages(), [])
+        memory.write_word(254, 1) # Across pages 0 and 1
+        memory.write_byte(1024, 1)
+        memory[3000:3001] = b'x'
+        memory.zero(2048, 2304)
+        self.assertEqual(memory.dirty_pages(clear=True), [(0, 2), (4, 5), (8, 9), (11, 12)])
+        self.assertEqual(memory.dirty_pages(), [])
+
+    def test_large_memories_have_larger_pages(self):
+        self.assertEqual(Memory('1K').dirty_shift, 8)
+        self.assertLessEqual(len(Memory('4G').dirty), 1024 * 1024)
+
+    def test_stores_and_loads_mark_pages(self):
+        for options in ({}, {'engine': 'blocks'}, {'page_size': 16}):
+            system = System(memory_size='4K', **options)
+            with contextlib.redirect_stdout(io.StringIO()):
+                system.call('execute', 'tests/ops/str.osx', 0)
+            self.assertEqual(system.memory.dirty_pages(clear=True), [(0, 1)])
+            system.memory_manager.free_memory(system.terminated_queue[0])
+            self.assertEqual(system.memory.dirty_pages(), [(0, 1)])
+
+
+class TestCheckpoints(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_chain(self):
+        memory = Memory('64K')
+        checkpoints = Checkpoints(memory, self.path)
+        memory.write_word(100, 1)
+        memory.write_word(60000, 2)
+        first = checkpoints.checkpoint(time=0)
+        before = bytes(memory[0:memory.size])
+
+        memory.write_word(100, 3)
+        second = checkpoints.checkpoint(time=10)
+        self.assertTrue(first['full'])
+        self.assertEqual(second['pages'], 1)
+        self.assertEqual(os.path.getsize(os.path.join(self.path, second['file'])), 16 + 16 + 256)
+        third = checkpoints.checkpoint(time=20)
+        self.assertEqual(third['pages'], 0)
+
+        self.assertEqual(bytes(Checkpoints.rebuild(self.path, 0)[0:memory.size]), before)
+        self.assertEqual(bytes(Checkpoints.rebuild(self.path)[0:memory.size]), bytes(memory[0:memory.size]))
+        manifest = Checkpoints.load_manifest(self.path)
+        self.assertEqual([entry['time'] for entry in manifest['checkpoints']], [0, 10, 20])
+        with self.assertRaises(ValueError):
+            Checkpoints.rebuild(self.path, 3)
+
+    def test_checkpoint_command(self):
+        system = System()
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('checkpoint', self.path)
+            system.call('execute', 'tests/ops/str.osx', 0)
+            system.call('checkpoint', self.path)
+        rebuilt = Checkpoints.rebuild(self.path)
+        self.assertEqual(rebuilt.read_word(4), 100)
+        self.assertEqual(len(system.checkpoints.manifest['checkpoints']), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
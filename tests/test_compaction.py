@@ -0,0 +1,144 @@
+import unittest
+import sys
+import os
+import io
+import random
+import contextlib
+from collections import deque
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+from System.PCB import PCB
+from constants import PCBState
+
+# Two 46 byte jobs fill 92 of 128 bytes, the 78 byte job only fits once the hole of the first is joined with the last one
+JOBS = ('programs/IO.osx', 0, 'programs/IO.osx', 0, 'tests/ops/eor.osx', 1)
+
+class TestCompaction(unittest.TestCase):
+    def setUp(self):
+        self.system = System(memory_size='128B', compaction=True, compaction_cost=1)
+        self.memory_manager = self.system.memory_manager
+
+    def allocate(self, pid, byte_size, state=PCBState.WAITING):
+        pcb = PCB(pid, 0, state=state)
+        pcb.loader = 0
+        pcb.byte_size = byte_size
+        self.assertTrue(self.memory_manager.allocate_memory(pcb))
+        self.memory_manager.memory[pcb.base:pcb.base + byte_size] = bytes([pid]) * byte_size
+        return pcb
+
+    def test_compact_slides_images_down(self):
+        first = self.allocate(1, 40)
+        second = self.allocate(2, 40)
+        self.memory_manager.free_memory(first)
+        self.assertEqual(self.memory_manager.fragmentation()['holes'], 2)
+
+        moved = self.memory_manager.compact()
+        self.assertEqual(moved, 40)
+        self.assertEqual(second.base, 0)
+        self.assertEqual(second.relocation(), 0)
+        self.assertEqual(bytes(self.memory_manager.memory[0:40]), bytes([2]) * 40)
+        self.assertEqual(bytes(self.memory_manager.memory[40:80]), bytes(40))
+        self.assertEqual(list(self.memory_manager.free_list), [(40, 128)])
+        self.assertEqual(self.system.clock.time, 10) # One tick per word moved
+
+    def test_running_images_stay(self):
+        first = self.allocate(1, 40)
+        second = self.allocate(2, 40, PCBState.RUNNING)
+        third = self.allocate(3, 40)
+        self.memory_manager.free_memory(first)
+
+        self.memory_manager.compact()
+        self.assertEqual(second.base, 40)
+        self.assertEqual(third.base, 80)
+        self.assertEqual(self.memory_manager.compactions, 1)
+
+    def test_only_compacts_when_admission_is_blocked(self):
+        first = self.allocate(1, 40)
+        self.allocate(2, 40)
+        self.memory_manager.free_memory(first)
+        job = PCB(3, 0)
+        job.loader = 0
+
+        job.byte_size = 48 # Fits the hole at the end
+        self.assertTrue(self.memory_manager.check_memory_available(job))
+        job.byte_size = 100 # Does not fit even once compacted
+        self.assertFalse(self.memory_manager.check_memory_available(job))
+        self.assertEqual(self.memory_manager.compactions, 0)
+
+        job.byte_size = 60
+        self.assertTrue(self.memory_manager.allocate_memory(job))
+        self.assertEqual(self.memory_manager.compactions, 1)
+        self.assertEqual(job.base, 40)
+
+    def test_check_changes_nothing(self):
+        first = self.allocate(1, 40)
+        self.allocate(2, 40)
+        first.state = PCBState.TERMINATED
+        job = PCB(3, 0)
+        job.loader = 0
+        job.byte_size = 80 # Fits once the image of the terminated job is reclaimed and memory compacted
+
+        self.assertTrue(self.memory_manager.check_memory_available(job))
+        self.assertIs(self.memory_manager.memory_map[0]['pcb'], first)
+        self.assertEqual(self.memory_manager.compactions, 0)
+        self.assertEqual(self.system.clock.time, 0)
+
+        self.assertTrue(self.memory_manager.allocate_memory(job))
+        self.assertEqual(self.memory_manager.compactions, 1)
+        self.assertEqual(job.base, 40)
+
+    def test_shared_image_is_kept(self):
+        parent = self.allocate(1, 40)
+        child = PCB(2, 0)
+        child.base = parent.base
+        parent.children.append(child)
+        parent.state = PCBState.TERMINATED
+
+        self.memory_manager.free_memory(parent)
+        self.assertIn(parent.base, self.memory_manager.memory_map)
+        job = PCB(3, 0)
+        job.loader = 0
+        job.byte_size = 100
+        self.assertFalse(self.memory_manager.check_memory_available(job))
+
+        child.state = PCBState.TERMINATED
+        self.assertTrue(self.memory_manager.allocate_memory(job))
+        self.assertEqual(job.base, 0)
+
+    def test_fragmentation(self):
+        first = self.allocate(1, 32)
+        self.allocate(2, 32)
+        self.memory_manager.free_memory(first)
+        stats = self.memory_manager.fragmentation()
+        self.assertEqual(stats['free'], 96)
+        self.assertEqual(stats['holes'], 2)
+        self.assertEqual(stats['largest_hole'], 64)
+        self.assertEqual(stats['utilization'], 0.25)
+        self.assertAlmostEqual(stats['external_fragmentation'], 1 / 3)
+        self.assertEqual(len(self.memory_manager.fragmentation_history), 3)
+
+    def test_fragmentation_history_is_bounded(self):
+        self.memory_manager.fragmentation_history = deque(maxlen=4)
+        for _ in range(5):
+            self.memory_manager.free_memory(self.allocate(1, 32))
+        self.assertEqual(len(self.memory_manager.fragmentation_history), 4)
+        self.assertEqual(self.memory_manager.fragmentation_samples, 10)
+        self.assertEqual(self.memory_manager.fragmentation_totals['holes'], 10)
+        self.assertEqual(self.memory_manager.fragmentation_totals['largest_hole'], 5 * (96 + 128))
+
+    def test_compaction_admits_waiting_job(self):
+        for engine in ('interpreter', 'blocks'):
+            random.seed(2)
+            system = System(engine=engine, memory_size='128B', compaction=True)
+            with contextlib.redirect_stdout(io.StringIO()):
+                system.call('execute', *JOBS)
+            pcbs = sorted(system.terminated_queue, key=lambda pcb: pcb.pid)
+            self.assertEqual([pcb.registers[0] for pcb in pcbs], [1, 1, 0])
+            self.assertEqual(pcbs[2].registers[3], 1)
+            metrics = system.scheduler.metrics
+            self.assertEqual(metrics['compactions'], 1)
+            self.assertEqual(metrics['compaction_time'], 12)
+
+
+if __name__ == "__main__":
+    unittest.main()
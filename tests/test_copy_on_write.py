@@ -0,0 +1,83 @@
+import unittest
+import sys
+import os
+import io
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+
+TARGET = 4 # Address of the word str.osx stores to
+
+class TestCopyOnWrite(unittest.TestCase):
+    def execute(self, system, *args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', *args)
+        return sorted(system.terminated_queue, key=lambda pcb: pcb.pid)
+
+    def fork(self, system, filepath):
+        """ Load filepath and fork it, returns the parent and child pcb. """
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('load', filepath)
+            parent = system.job_queue[0]
+            system.memory_manager.load_to_memory(parent)
+        child = parent.make_child(parent.pid + 1, parent.pc)
+        system.memory_manager.fork(parent, child)
+        return parent, child
+
+    def write(self, system, pcb, address, value):
+        system.CPU.pcb = pcb
+        system.CPU._restore(pcb)
+        system.CPU.write_word(address, value)
+
+    def read(self, system, pcb, address):
+        system.CPU.pcb = pcb
+        system.CPU._restore(pcb)
+        return system.CPU.read_word(address)
+
+    def test_fork_shares_frames(self):
+        system = System(page_size=16)
+        parent, child = self.fork(system, 'tests/ops/str.osx')
+        self.assertEqual(child.page_table.frames, parent.page_table.frames)
+        self.assertIsNot(child.page_table, parent.page_table)
+        self.assertEqual(child.page_table.cow, {0, 1})
+        self.assertEqual(len(system.memory_manager.free_frames), 62)
+
+    def test_write_copies_only_the_written_page(self):
+        system = System(page_size=16)
+        parent, child = self.fork(system, 'tests/ops/str.osx')
+        before = self.read(system, parent, TARGET)
+
+        self.write(system, child, TARGET, 7)
+        self.assertEqual(child.cow_copies, 1)
+        self.assertNotEqual(child.page_table.lookup(0), parent.page_table.lookup(0))
+        self.assertEqual(child.page_table.lookup(1), parent.page_table.lookup(1))
+        self.assertEqual(self.read(system, child, TARGET), 7)
+        self.assertEqual(self.read(system, parent, TARGET), before)
+
+        # The parent is the last one left on the page, so it writes in place
+        self.write(system, parent, TARGET, 8)
+        self.assertEqual(parent.cow_copies, 0)
+        self.assertEqual(parent.page_table.cow, {1})
+
+    def test_frames_are_freed_with_the_last_process(self):
+        system = System(page_size=16)
+        parent, child = self.fork(system, 'tests/ops/str.osx')
+        self.write(system, child, TARGET, 7)
+        memory_manager = system.memory_manager
+
+        memory_manager.free_memory(parent)
+        self.assertEqual(len(memory_manager.free_frames), 62) # Page 1 is still used by the child
+        memory_manager.free_memory(child)
+        self.assertEqual(len(memory_manager.free_frames), 64)
+        self.assertEqual(memory_manager.loaded, {})
+
+    def test_forked_programs_match_contiguous_memory(self):
+        for program in ('programs/fork.osx', 'programs/fork_exec.osx'):
+            reference = self.execute(System(), program, 0)
+            for engine in ('interpreter', 'blocks'):
+                pcbs = self.execute(System(engine=engine, page_size=16), program, 0)
+                self.assertEqual([pcb.registers for pcb in pcbs], [pcb.registers for pcb in reference])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import sys
+import os
+import io
+import tempfile
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+from hardware.Memory import Memory
+from hardware.MemoryDump import MemoryDump
+
+class TestMemoryDump(unittest.TestCase):
+    def setUp(self):
+        self.memory = Memory('64B')
+        self.memory[6:9] = bytes([1, 2, 255])
+        self.memory[60] = 7
+        self.dump = MemoryDump(self.memory)
+
+    def hex(self, *args, **kwargs):
+        file = io.StringIO()
+        self.dump.write_hex(file, *args, **kwargs)
+        return file.getvalue()
+
+    def test_rows(self):
+        lines = self.hex().splitlines()
+        self.assertEqual(len(lines), 11)
+        self.assertEqual(lines[0], "0-5: 00 00 00 00 00 00 ")
+        self.assertEqual(lines[1], "6-11: 01 02 FF 00 00 00 ")
+        self.assertEqual(lines[10], "60-65: 07 00 00 00       ") # Partial last row
+
+    def test_range(self):
+        self.assertEqual(self.hex(7, 10), "7-12: 02 FF 00 " + " " * 9 + "\n")
+
+    def test_nonzero(self):
+        self.assertEqual(self.hex(nonzero=True), "6-11: 01 02 FF 00 00 00 \n60-65: 07 00 00 00       \n")
+
+    def test_regions(self):
+        file = io.StringIO()
+        self.dump.write_regions(file, [('first', 6, 9), ('second', 60, 61)])
+        self.assertEqual(file.getvalue(), "# first 6-8\n6-11: 01 02 FF " + " " * 9 + "\n# second 60-60\n60-65: 07                \n")
+
+    def test_binary_round_trip(self):
+        self.dump.block_size = 16
+        file = io.BytesIO()
+        self.dump.write_binary(file, nonzero=True)
+        file.seek(0)
+        size, records = MemoryDump.read_binary(file)
+        self.assertEqual(size, 64)
+        self.assertEqual(records, [(0, bytes(self.memory[0:16])), (48, bytes(self.memory[48:64]))])
+
+        with self.assertRaises(ValueError):
+            MemoryDump.read_binary(io.BytesIO(bytes(32)))
+
+    def test_sparse_memory_dumps_only_what_was_written(self):
+        memory = Memory('4G')
+        memory.write_word(3 * 1024 * 1024 * 1024, 1)
+        file = io.StringIO()
+        MemoryDump(memory).write_hex(file, nonzero=True)
+        self.assertEqual(file.getvalue(), "3221225472-3221225477: 01 00 00 00 00 00 \n")
+
+
+class TestCoredump(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.system = System()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.system.call('execute', 'tests/ops/str.osx', 0)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def coredump(self, *args):
+        path = os.path.join(self.directory.name, 'memory')
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.system.call('coredump', *args, '-o', path)
+        return path
+
+    def test_full_dump_matches_str(self):
+        with open(self.coredump()) as f:
+            self.assertEqual(f.read(), str(self.system.memory))
+
+    def test_process_regions(self):
+        with open(self.coredump('-p', '-z')) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], "# PCB(pid=1, file=tests/ops/str.osx, state=TERMINATED) 0-31")
+        self.assertEqual(lines[1], "0-5: 64 00 00 00 64 00 ")
+
+    def test_binary_range(self):
+        with open(self.coredump('0', '8', '-b'), 'rb') as f:
+            size, records = MemoryDump.read_binary(f)
+        self.assertEqual(size, 1024)
+        self.assertEqual(records, [(0, bytes(self.system.memory[0:8]))])
+
+    def test_bad_arguments(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.system.call('coredump', '10')
+        self.assertEqual(self.system.errors[-1]['code'], 103)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+import sys
+import os
+import io
+import shutil
+import tempfile
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+from System.ImageCache import ImageCache
+from System.DecodedImage import DecodedImage
+from hardware.CPU import CPU
+
+class TestDecodedImage(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'fork.osx')
+        shutil.copy('programs/fork.osx', self.path)
+        self.image = ImageCache().get(self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_entries_match_the_decoder(self):
+        decoded = DecodedImage.build(self.image)
+        self.assertEqual(decoded.entries(), ImageCache(decoder=CPU.predecode).decode(self.image))
+
+    def test_cache_file_is_written_and_used(self):
+        decoded = DecodedImage.load(self.image)
+        cache_path = DecodedImage.path(self.path)
+        self.assertTrue(os.path.exists(cache_path))
+        self.assertEqual(os.path.getsize(cache_path), DecodedImage.HEADER.size + len(decoded) * DecodedImage.RECORD.size)
+        read = DecodedImage.read(cache_path)
+        self.assertEqual(list(read), list(decoded))
+        self.assertEqual(read.entries(), decoded.entries())
+        self.assertEqual(read.record(decoded.pc + 6), list(decoded)[1])
+        self.assertIsNone(read.record(decoded.pc + 1))
+        self.assertIsNone(read.record(decoded.pc + 6 * len(decoded)))
+
+    def test_stale_cache_file_is_rebuilt(self):
+        DecodedImage.load(self.image)
+        with open(self.path, 'r+b') as f:
+            f.seek(12)
+            f.write(bytes([20, 1])) # SWI 1 as the first instruction
+        image = ImageCache().get(self.path)
+        decoded = DecodedImage.load(image)
+        self.assertEqual(decoded.record(decoded.pc)[0], 20)
+        self.assertEqual(DecodedImage.read(DecodedImage.path(self.path)).digest, image.digest)
+
+        with open(DecodedImage.path(self.path), 'wb') as f:
+            f.write(b'junk')
+        self.assertEqual(list(DecodedImage.load(image)), list(decoded))
+
+    def test_touched_file_keeps_its_cache_file(self):
+        DecodedImage.load(self.image)
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        decoded = DecodedImage.load(ImageCache().get(self.path))
+        self.assertIsInstance(decoded.data, memoryview) # Read from the cache file, not built again
+
+    def test_instruction_cache_reads_entries_when_reached(self):
+        system = System(image_cache_files=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('load', self.path)
+        pcb = system.job_queue.peek()
+        table = system.instruction_cache.table(pcb.code_start, pcb.code_end, pcb.mapping())
+        self.assertEqual(len(table), 0)
+        entries = DecodedImage.build(self.image).entries()
+        self.assertEqual(table.fill(pcb.code_start), entries[pcb.code_start])
+        self.assertIn(pcb.code_start, table)
+
+        # Written over before it was ever read, the record is out of date
+        address = pcb.code_start + 6
+        self.assertTrue(system.instruction_cache.invalidate(address + pcb.relocation(), 1))
+        self.assertIsNone(table.fill(address))
+        self.assertNotIn(address, table)
+
+    def test_system_uses_cache_files(self):
+        system = System(image_cache_files=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', self.path, 0)
+        self.assertTrue(os.path.exists(DecodedImage.path(self.path)))
+        self.assertIsInstance(system.image_cache.get(self.path).decoded, DecodedImage)
+        reference = System()
+        with contextlib.redirect_stdout(io.StringIO()):
+            reference.call('execute', self.path, 0)
+        self.assertEqual(system.clock.time, reference.clock.time)
+        self.assertEqual([pcb.registers for pcb in system.terminated_queue], [pcb.registers for pcb in reference.terminated_queue])
+
+
+if __name__ == "__main__":
+    unittest.main()
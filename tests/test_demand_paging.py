@@ -0,0 +1,61 @@
+import unittest
+import sys
+import os
+import io
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+
+LONG_JOB = 'programs/metrics/example_1/p1.osx'
+
+class TestDemandPaging(unittest.TestCase):
+    def execute(self, system, *args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', *args)
+        return sorted(system.terminated_queue, key=lambda pcb: pcb.pid)
+
+    def test_nothing_is_read_on_load(self):
+        system = System(page_size=16, demand_paging=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('load', LONG_JOB)
+        pcb = system.job_queue[0]
+        self.assertEqual(len(pcb.page_table), 0)
+        self.assertEqual(len(system.memory_manager.free_frames), 64)
+
+    def test_pages_fault_in_on_first_use(self):
+        system = System(page_size=16, demand_paging=True, page_fault_cost=10)
+        pcb, = self.execute(system, LONG_JOB, 0)
+        reference, = self.execute(System(), LONG_JOB, 0)
+
+        self.assertEqual(pcb.registers, reference.registers)
+        self.assertEqual(pcb.page_faults, 10) # 150 bytes on 16 byte pages
+        self.assertEqual(pcb.page_fault_time, 100)
+        self.assertEqual(pcb.end_time, reference.end_time + 100)
+        self.assertEqual(system.scheduler.metrics['page_faults'], 10)
+
+    def test_clean_pages_are_dropped(self):
+        # Two programs of three pages each share three frames
+        programs = ('tests/ops/bl.osx', 0, 'tests/ops/bl.osx', 0)
+        reference = self.execute(System(scheduling_algorithm='RR', quantum=1), *programs)
+        for engine in ('interpreter', 'blocks'):
+            system = System(engine=engine, scheduling_algorithm='RR', quantum=1, memory_size='48B',
+                            page_size=16, demand_paging=True, page_fault_cost=0)
+            pcbs = self.execute(system, *programs)
+            self.assertEqual([pcb.registers for pcb in pcbs], [pcb.registers for pcb in reference])
+            self.assertGreater(sum(pcb.page_faults for pcb in pcbs), 6)
+
+    def test_written_pages_are_dirty(self):
+        system = System(page_size=16, demand_paging=True)
+        pcb, = self.execute(system, 'tests/ops/str.osx', 0)
+        self.assertEqual(pcb.page_table.dirty, {0})
+
+    def test_faults_stall_a_core_in_lockstep(self):
+        system = System(cores=2, page_size=16, demand_paging=True, page_fault_cost=5)
+        first, second = self.execute(system, 'tests/ops/ldr.osx', 0, 'tests/ops/ldr.osx', 0)
+        self.assertEqual(first.registers[0], 300)
+        self.assertEqual(second.registers[0], 300)
+        self.assertEqual(first.end_time, first.execution_time + first.page_fault_time)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.EventQueue import EventQueue
+from System.PCB import PCB
+
+class TestEventQueue(unittest.TestCase):
+    def setUp(self):
+        self.queue = EventQueue('arrival_time')
+        self.pcbs = []
+        for pid, arrival_time in enumerate([30, 10, 20, 10]):
+            pcb = PCB(pid, 0)
+            pcb.arrival_time = arrival_time
+            self.pcbs.append(pcb)
+            self.queue.push(pcb)
+        return super().setUp()
+
+    def test_order(self):
+        self.assertEqual([pcb.pid for pcb in self.queue], [1, 3, 2, 0])
+        self.assertEqual(self.queue.peek().pid, 1)
+
+    def test_pop_due(self):
+        due = self.queue.pop_due(20)
+        self.assertEqual([pcb.pid for pcb in due], [1, 3, 2])
+        self.assertEqual(len(self.queue), 1)
+
+    def test_next_key(self):
+        self.assertEqual(self.queue.next_key(), 10)
+        self.assertEqual(len(self.queue), 4)
+        self.queue.pop_due(30)
+        self.assertEqual(self.queue.next_key(), None)
+
+    def test_remove(self):
+        self.queue.remove(self.pcbs[1])
+        self.assertEqual([pcb.pid for pcb in self.queue], [3, 2, 0])
+        with self.assertRaises(ValueError):
+            self.queue.remove(self.pcbs[1])
+        self.assertEqual(len(self.queue), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
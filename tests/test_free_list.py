@@ -0,0 +1,78 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.FreeList import FreeList
+
+class TestFreeList(unittest.TestCase):
+    def test_allocate_at(self):
+        free_list = FreeList(100)
+        self.assertEqual(free_list.allocate(10, 20), 20)
+        self.assertEqual(list(free_list), [(0, 20), (30, 100)])
+        self.assertIsNone(free_list.allocate(10, 25))
+        self.assertFalse(free_list.fits_at(15, 10))
+        self.assertTrue(free_list.fits_at(10, 10))
+
+    def test_free_merges_neighbours(self):
+        free_list = FreeList(100)
+        free_list.allocate(10, 0)
+        free_list.allocate(10, 10)
+        free_list.allocate(10, 20)
+        free_list.free(0, 10)
+        free_list.free(20, 10)
+        self.assertEqual(list(free_list), [(0, 10), (20, 100)])
+        free_list.free(10, 10)
+        self.assertEqual(list(free_list), [(0, 100)])
+        self.assertEqual(free_list.largest(), 100)
+
+    def test_best_fit(self):
+        free_list = FreeList(100)
+        free_list.allocate(10, 20)
+        free_list.allocate(10, 35)
+        # Holes: 0-20, 30-35, 45-100
+        self.assertEqual(free_list.allocate(5), 30)
+        self.assertEqual(free_list.allocate(15), 0)
+        self.assertEqual(free_list.free_space(), 100 - 40)
+
+    def test_first_fit(self):
+        free_list = FreeList(100, 'first')
+        free_list.allocate(10, 20)
+        free_list.allocate(10, 35)
+        self.assertEqual(free_list.allocate(5), 0)
+        self.assertEqual(free_list.allocate(10), 5)
+        self.assertEqual(free_list.allocate(50), 45)
+        self.assertIsNone(free_list.allocate(10))
+
+    def test_free_space_follows_merges(self):
+        free_list = FreeList(100)
+        for start in range(0, 100, 10):
+            free_list.allocate(10, start)
+        self.assertEqual(free_list.free_space(), 0)
+        for start in (30, 10, 20, 90):
+            free_list.free(start, 10)
+        self.assertEqual(list(free_list), [(10, 40), (90, 100)])
+        self.assertEqual(free_list.free_space(), 40)
+        copy = free_list.copy()
+        copy.allocate(25)
+        self.assertEqual((copy.free_space(), free_list.free_space()), (15, 40))
+
+    def test_many_holes(self):
+        for policy in ('first', 'best'):
+            free_list = FreeList(10000, policy)
+            for start in range(0, 10000, 10):
+                free_list.allocate(5, start)
+            free_list.free(5000, 5) # Joins a 15 byte hole at 4995
+            self.assertEqual(len(free_list), 999)
+            self.assertEqual(free_list.largest(), 15)
+            self.assertEqual(free_list.hole_at(5007), 4995)
+            self.assertEqual(free_list.find(5), 5)
+            self.assertEqual(free_list.allocate(12), 4995)
+            self.assertIsNone(free_list.find(6))
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            FreeList(100, 'worst')
+
+
+if __name__ == "__main__":
+    unittest.main()
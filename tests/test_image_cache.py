@@ -0,0 +1,81 @@
+import unittest
+import sys
+import os
+import io
+import shutil
+import tempfile
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+from System.ImageCache import ImageCache
+from hardware.CPU import CPU
+from hardware.InstructionCache import InstructionCache
+from constants import CHILD_EXEC_PROGRAM
+
+class TestImageCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'eor.osx')
+        shutil.copy('tests/ops/eor.osx', self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_header_and_body(self):
+        image = ImageCache().get('programs/IO.osx')
+        self.assertEqual((image.byte_size, image.loader), (46, 0))
+        self.assertEqual(len(image.body), 46)
+
+    def test_hits(self):
+        cache = ImageCache()
+        first = cache.get(self.path)
+        self.assertIs(cache.get(self.path), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_changed_file_is_read_again(self):
+        cache = ImageCache()
+        first = cache.get(self.path)
+        with open(self.path, 'ab') as f:
+            f.write(bytes(6))
+        self.assertIsNot(cache.get(self.path), first)
+        self.assertEqual(cache.misses, 2)
+        self.assertEqual(cache.used, 78)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ImageCache(budget=100)
+        cache.get(self.path) # 78 bytes
+        cache.get('tests/ops/str.osx') # 32 bytes, over budget
+        self.assertEqual(list(cache.images), ['tests/ops/str.osx'])
+        self.assertEqual((cache.used, cache.evictions), (32, 1))
+
+        cache = ImageCache(budget=0)
+        cache.get(self.path)
+        self.assertEqual(len(cache), 0)
+
+    def test_missing_file(self):
+        with self.assertRaises(FileNotFoundError):
+            ImageCache().get('programs/missing.osx')
+
+    def test_decoded_matches_memory(self):
+        system = System()
+        image = system.image_cache.get(self.path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', self.path, 0)
+        end = image.loader + image.byte_size - 1
+        entries = InstructionCache(system.memory, CPU.predecode).load(image.pc, end, 0)
+        self.assertEqual(system.image_cache.decode(image).entries(), entries) # The DecodedImage the Verifier built
+        self.assertEqual(ImageCache(decoder=CPU.predecode).decode(ImageCache().get(self.path)), entries)
+        self.assertIsNone(ImageCache().decode(ImageCache().get(self.path))) # No decoder
+
+    def test_one_read_per_program(self):
+        system = System(memory_size='4K')
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', *[arg for i in range(20) for arg in (self.path, str(i))])
+            system.call('execute', 'programs/fork_exec.osx', 0)
+        self.assertEqual(len(system.terminated_queue), 22)
+        self.assertEqual(system.image_cache.misses, 3)
+        self.assertIn(CHILD_EXEC_PROGRAM, system.image_cache.images)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+
+class TestInstructionCache(unittest.TestCase):
+    def setUp(self):
+        self.system = System(verify=False) # Tables decoded from memory, see test_decoded_image for ones read from a DecodedImage
+        self.add_file = os.path.join(os.path.dirname(__file__), 'ops/add.osx')
+        self.str_file = os.path.join(os.path.dirname(__file__), 'ops/str.osx')
+        return super().setUp()
+
+    def test_load_decodes_code_range(self):
+        self.system.handle_load(self.add_file)
+        pcb = self.system.job_queue[0]
+        table = self.system.instruction_cache.table(pcb.code_start, pcb.code_end)
+
+        self.assertEqual(len(table), 4)
+        handler, operands = table[pcb.code_start]
+        self.assertEqual(handler.__name__, '_mvi')
+        self.assertEqual(operands, (1, 100))
+
+    def test_store_invalidates_code(self):
+        self.system.handle_load(self.add_file)
+        pcb = self.system.job_queue[0]
+        table = self.system.instruction_cache.table(pcb.code_start, pcb.code_end)
+
+        self.system.CPU.registers[0] = 0
+        self.system.CPU.registers[1] = pcb.code_start + 8
+        self.system.CPU._str((0, 1))
+
+        self.assertNotIn(pcb.code_start + 6, table)
+        self.assertIn(pcb.code_start, table)
+        self.assertIn(pcb.code_start + 12, table)
+
+    def test_run_with_cache(self):
+        self.system.call('load', self.add_file)
+        self.system.call('run', self.add_file)
+        self.assertEqual(self.system.CPU.registers[0], 300)
+
+    def test_free_releases_table(self):
+        self.system.call('execute', self.str_file, 0)
+        pcb = self.system.terminated_queue[0]
+        self.system.memory_manager.free_memory(pcb)
+        self.assertEqual(len(self.system.instruction_cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+import sys
+import os
+import io
+import struct
+import tempfile
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+from hardware.Memory import Memory, MemoryAccessError
+
+class TestMemory(unittest.TestCase):
+    def setUp(self):
+        self.memory = Memory('1K')
+        return super().setUp()
+
+    def test_words(self):
+        self.memory.write_word(100, 300)
+        self.assertEqual(self.memory.read_word(100), 300)
+        self.assertEqual(self.memory[100:104], struct.pack('<I', 300))
+
+    def test_bytes(self):
+        self.memory.write_byte(5, 97)
+        self.assertEqual(self.memory.read_byte(5), 97)
+        self.assertEqual(self.memory[5], 97)
+
+    def test_out_of_bounds(self):
+        with self.assertRaises(MemoryAccessError):
+            self.memory.read_word(1022)
+        with self.assertRaises(MemoryAccessError):
+            self.memory.write_byte(-1, 0)
+        self.assertEqual(len(self.memory), 1024)
+
+    def test_fetch_is_a_view(self):
+        self.memory[0:6] = bytes([22, 1, 100, 0, 0, 0])
+        instruction = self.memory.fetch(0)
+        self.assertIsInstance(instruction, memoryview)
+        self.assertEqual(bytes(instruction), bytes([22, 1, 100, 0, 0, 0]))
+
+
+class TestMemoryBackends(unittest.TestCase):
+    def test_backend_by_size(self):
+        self.assertEqual(Memory('1K').backend, 'bytearray')
+        self.assertEqual(Memory('4M').backend, 'mmap')
+        self.assertEqual(Memory('4G').backend, 'sparse')
+        self.assertEqual(Memory('1K', 'sparse').backend, 'sparse')
+        with self.assertRaises(ValueError):
+            Memory('1K', 'disk')
+
+    def test_backends_behave_alike(self):
+        for backend in Memory.backends:
+            memory = Memory('2M', backend)
+            memory.write_word(70000, 300)
+            memory.write_byte(5, 97)
+            memory[65534:65538] = bytes([1, 2, 3, 4]) # Across two sparse chunks
+            self.assertEqual(memory.read_word(70000), 300)
+            self.assertEqual(memory.read_byte(5), 97)
+            self.assertEqual(memory[65534:65538], bytes([1, 2, 3, 4]))
+            self.assertEqual(bytes(memory.view[65535:65537]), bytes([2, 3]))
+            self.assertEqual(memory[1000000], 0)
+            self.assertEqual(len(memory), 2 * 1024 * 1024)
+            with self.assertRaises(MemoryAccessError):
+                memory.read_word(len(memory) - 2)
+
+            memory.zero(0, 1024 * 1024)
+            self.assertEqual(memory[0:1024 * 1024], bytes(1024 * 1024))
+            memory.close()
+
+    def test_sparse_memory_allocates_on_write(self):
+        memory = Memory('4G')
+        self.assertEqual(memory.view.resident(), 0)
+        memory[0:4] = [0, 0, 0, 0]
+        self.assertEqual(memory.view.resident(), 0)
+        memory.write_word(3 * 1024 * 1024 * 1024, 7)
+        self.assertEqual(memory.view.resident(), memory.view.chunk_size)
+        memory.zero(3 * 1024 * 1024 * 1024, 3 * 1024 * 1024 * 1024 + memory.view.chunk_size)
+        self.assertEqual(memory.view.resident(), 0)
+
+    def test_file_backed_memory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'memory')
+            memory = Memory('64K', path=path)
+            self.assertEqual(memory.backend, 'mmap')
+            memory.write_word(100, 300)
+            memory.close()
+            with open(path, 'rb') as f:
+                f.seek(100)
+                self.assertEqual(struct.unpack('<I', f.read(4))[0], 300)
+
+    def test_programs_run_on_every_backend(self):
+        for backend in Memory.backends:
+            for engine in ('interpreter', 'blocks'):
+                system = System(engine=engine, memory_backend=backend)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    system.call('execute', 'tests/ops/str.osx', 0, 'programs/fork.osx', 0)
+                pcb = system.terminated_queue[0]
+                self.assertEqual(system.memory.read_word(pcb.base + 4), 100)
+                self.assertEqual(len(system.terminated_queue), 3)
+
+
+class TestOutOfBoundsAccess(unittest.TestCase):
+    def setUp(self):
+        # MVI R1 2000 ; LDR R0 [R1] ; SWI 1
+        code = bytes([22, 1]) + struct.pack('<I', 2000) + bytes([4, 0, 1, 0, 0, 0, 20, 1, 0, 0, 0, 0])
+        handle, self.file = tempfile.mkstemp(suffix='.osx')
+        with os.fdopen(handle, 'wb') as f:
+            f.write(struct.pack('III', len(code), 0, 0) + code)
+        return super().setUp()
+
+    def tearDown(self):
+        os.remove(self.file)
+        return super().tearDown()
+
+    def run_system(self, engine):
+        system = System(engine=engine)
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('load', self.file)
+            system.call('run', self.file)
+        return system
+
+    def test_fault_is_reported(self):
+        for engine in ('interpreter', 'blocks'):
+            system = self.run_system(engine)
+            self.assertEqual(system.errors[-1]['code'], 110)
+            self.assertEqual(system.clock.time, 1)
+            self.assertEqual(system.CPU.registers[1], 2000)
+            self.assertEqual(system.CPU.registers[11], 12)
+
+
+if __name__ == "__main__":
+    unittest.main()
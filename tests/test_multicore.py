@@ -0,0 +1,91 @@
+import unittest
+import sys
+import os
+import io
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+
+P1 = 'programs/metrics/example_1/p1.osx'
+P2 = 'programs/metrics/example_1/p2.osx'
+P3 = 'programs/metrics/example_1/p3.osx'
+
+class TestMultiCore(unittest.TestCase):
+    def execute(self, system, *args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', *args)
+        return {pcb.file: pcb for pcb in system.terminated_queue}
+
+    def test_single_core_is_default(self):
+        system = System()
+        self.assertEqual(len(system.cores), 1)
+        self.assertIs(system.CPU, system.cores[0])
+
+    def test_cores_share_memory(self):
+        system = System(cores=2)
+        self.assertIs(system.cores[0].memory, system.cores[1].memory)
+
+    def test_jobs_run_in_parallel(self):
+        single = System()
+        single_pcbs = self.execute(single, P1, 0, P2, 0)
+        dual = System(cores=2)
+        dual_pcbs = self.execute(dual, P1, 0, P2, 0)
+
+        self.assertEqual(len(dual_pcbs), 2)
+        self.assertEqual(dual_pcbs[P2].start_time, 0)
+        self.assertLess(dual.clock.time, single.clock.time)
+        for pcb in dual_pcbs.values():
+            self.assertEqual(pcb.execution_time, single_pcbs[pcb.file].execution_time)
+        for core in dual.cores:
+            self.assertGreater(core.busy_time, 0)
+
+    def test_work_stealing(self):
+        system = System(cores=2)
+        pcbs = self.execute(system, P1, 0, P2, 0, P3, 0)
+        self.assertEqual(len(pcbs), 3)
+        self.assertEqual(system.scheduler.policy.steals, 1)
+        self.assertLessEqual(system.clock.time, sum(pcb.execution_time for pcb in pcbs.values()))
+
+    def test_fork_and_exec(self):
+        system = System(cores=2)
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', 'programs/fork_exec.osx', 0)
+        self.assertEqual(len(system.terminated_queue), 2)
+
+    def test_run_from_ready_queue(self):
+        system = System(cores=2)
+        system.handle_load(P1)
+        system.handle_load(P2)
+        first, second = system.job_queue.pop(), system.job_queue.pop()
+        system.ready_queue.enqueue(first)
+        system.ready_queue.enqueue(second)
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.run_program(second.file)
+        self.assertEqual(list(system.ready_queue), [first])
+        self.assertEqual(system.terminated_queue, [second])
+        self.assertEqual(system.errors, [])
+
+    def test_exec_runs_on_calling_core(self):
+        system = System(cores=2)
+        dispatched = [] # (core, pid, program) of every dispatch
+        for i, core in enumerate(system.cores):
+            def dispatch(pcb, *args, i=i, dispatch=core.dispatch):
+                dispatched.append((i, pcb.pid, pcb.file))
+                dispatch(pcb, *args)
+            core.dispatch = dispatch
+        enqueued = [] # pid of every process put in the ready queue
+        def enqueue(pcb, enqueue=system.ready_queue.enqueue):
+            enqueued.append(pcb.pid)
+            enqueue(pcb)
+        system.ready_queue.enqueue = enqueue
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            system.call('execute', 'programs/fork_exec.osx', 0)
+        self.assertIn('Result of operations: 999', output.getvalue())
+
+        child = next(pcb for pcb in system.terminated_queue if pcb.file == 'programs/child.osx')
+        self.assertEqual(enqueued.count(child.pid), 1) # Only when it was forked, not again after exec
+        runs = [(core, program) for core, pid, program in dispatched if pid == child.pid]
+        self.assertEqual(runs[1:], [(runs[0][0], 'programs/child.osx')]) # The exec'd program went on on the same core
+
+if __name__ == "__main__":
+    unittest.main()
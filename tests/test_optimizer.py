@@ -0,0 +1,97 @@
+import unittest
+import sys
+import os
+import io
+import struct
+import tempfile
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.Assembler import Assembler
+from System.Optimizer import Optimizer
+from System.System import System
+from cli.Shell import ShellMode
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+class TestOptimizer(unittest.TestCase):
+    def run_image(self, image, directory):
+        path = os.path.join(directory, 'program.osx')
+        with open(path, 'wb') as f:
+            f.write(image)
+        system = System()
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            system.call('execute', path, 0)
+        pcb = system.terminated_queue[0]
+        registers = [value for register, value in enumerate(pcb.registers) if register not in (5, 11)] # Link and PC hold code addresses
+        results = [line for line in output.getvalue().splitlines() if line.startswith('Result of operations')]
+        data = bytes(system.memory[0:struct.unpack('III', image[:12])[1]])
+        return results, registers, data
+
+    def assertSameProgram(self, source, optimized, loader=0):
+        self.assertEqual(Assembler(Optimizer()).assemble(source, loader), Assembler().assemble(optimized, loader))
+
+    def test_dead_writes(self):
+        with open(os.path.join(ROOT, 'cpubound2.asm')) as f:
+            source = f.read()
+        optimizer = Optimizer()
+        image = Assembler(optimizer).assemble(source, 0, 'cpubound2.asm')
+        self.assertEqual(optimizer.reports, [{'program': 'cpubound2.asm', 'before': 10, 'after': 8, 'removed': 2, 'note': ''}])
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual(self.run_image(image, directory), self.run_image(Assembler().assemble(source), directory))
+
+    def test_constant_folding(self):
+        self.assertSameProgram("MVI R0 5\nMVI R1 1\nADD R0 R0 R1\nADD R0 R0 R1\nSUB R2 R0 R1\nSWI 1",
+                               "MVI R1 1\nMVI R0 7\nMVI R2 6\nSWI 1")
+        # Negative results do not fit an MVI, and a label starts a new basic block
+        self.assertSameProgram("MVI R1 1\nSUB R0 R9 R1\nL ADD R2 R1 R1\nSWI 1", "MVI R1 1\nSUB R0 R9 R1\nL ADD R2 R1 R1\nSWI 1")
+
+    def test_branches(self):
+        source = ("       MVI R2 1\n       MVI R0 3\n"
+                  "LOOP   SUB R0 R0 R2\n       CMP R0 R2\n       BGT NEXT\n       B DONE\n"
+                  "NEXT   B LOOP\nDONE   MOV R1 R1\n       SWI 2\n       SWI 1\n")
+        optimized = "MVI R2 1\nMVI R0 3\nLOOP SUB R0 R0 R2\nCMP R0 R2\nBGT LOOP\nSWI 2\nSWI 1\n"
+        self.assertSameProgram(source, optimized)
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual(self.run_image(Assembler(Optimizer()).assemble(source), directory),
+                             self.run_image(Assembler().assemble(source), directory))
+
+    def test_calls_and_data(self):
+        for path in ('tests/ops/bl.asm', 'tests/ops/bx.asm', 'tests/ops/str.asm', 'programs/fork.asm'):
+            with open(os.path.join(ROOT, path)) as f:
+                source = f.read()
+            with tempfile.TemporaryDirectory() as directory:
+                self.assertEqual(self.run_image(Assembler(Optimizer()).assemble(source), directory),
+                                 self.run_image(Assembler().assemble(source), directory), path)
+
+    def test_loader_relative_branches(self):
+        # Only BEQ adds the loader: BGT 24 goes back to the SUB at 24, and moves with it
+        source = "MVI R1 1\nMVI R0 3\nMOV R4 R4\nSUB R0 R0 R1\nCMP R0 R1\nBGT 24\nSWI 1"
+        self.assertSameProgram(source, "MVI R1 1\nMVI R0 3\nSUB R0 R0 R1\nCMP R0 R1\nBGT 18\nSWI 1", loader=6)
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual(self.run_image(Assembler(Optimizer()).assemble(source, 6), directory),
+                             self.run_image(Assembler().assemble(source, 6), directory))
+        # B L goes to 12, outside of the code loaded at 100, where every register may be read
+        self.assertSameProgram("MVI R0 1\nMVI R0 2\nL B L", "MVI R0 2\nB 12", loader=100)
+        self.assertSameProgram("MVI R0 1\nB 12\nSWI 1", "MVI R0 1\nSWI 1")
+
+    def test_unsupported_programs(self):
+        optimizer = Optimizer()
+        for source, loader in (("MVI R0 1\nMOV R1 PC\nSWI 1", 0), ("MVI R0 1\nB 9\nSWI 1", 0), ("L MVI R0 1\nMVI R0 2\nADR R1 L\nBX R1", 100)):
+            self.assertEqual(Assembler(optimizer).assemble(source, loader), Assembler().assemble(source, loader))
+        self.assertTrue(all(report['note'] and report['removed'] == 0 for report in optimizer.reports))
+
+    def test_shell_option(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'add.asm')
+            with open(source, 'w') as f:
+                f.write("MVI R1 2\nMVI R1 3\nMOV R0 R0\nSWI 1\n")
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                ShellMode(System()).execute_terimal_command(['-O', source])
+            self.assertIn('Assembled', output.getvalue())
+            self.assertIn(source, output.getvalue())
+            with open(os.path.join(directory, 'add.osx'), 'rb') as f:
+                self.assertEqual(f.read(), Assembler().assemble("MVI R1 3\nSWI 1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
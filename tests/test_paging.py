@@ -0,0 +1,109 @@
+import unittest
+import sys
+import os
+import io
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+from hardware.PageTable import PageTable
+from hardware.TLB import TLB
+from hardware.Memory import MemoryAccessError
+from System.PCB import PCB
+
+class TestPageTable(unittest.TestCase):
+    def test_translate(self):
+        page_table = PageTable(16)
+        page_table.map(0, 3)
+        page_table.map(1, 1)
+        self.assertEqual(page_table.translate(5), 53)
+        self.assertEqual(page_table.translate(17), 17)
+        with self.assertRaises(MemoryAccessError):
+            page_table.translate(40)
+
+    def test_segments(self):
+        page_table = PageTable(16)
+        page_table.map(0, 4)
+        page_table.map(1, 5)
+        page_table.map(2, 1)
+        self.assertEqual(page_table.segments(4, 40), [(68, 95, 64), (16, 24, -16)])
+
+    def test_read_across_pages(self):
+        page_table = PageTable(4)
+        page_table.map(0, 1)
+        page_table.map(1, 0)
+        view = memoryview(bytearray(range(8)))
+        self.assertEqual(bytes(page_table.read(view, 2, 4)), bytes([6, 7, 0, 1]))
+        self.assertIsNone(page_table.read(view, 6, 4))
+
+    def test_page_size_must_be_power_of_two(self):
+        with self.assertRaises(ValueError):
+            PageTable(48)
+
+
+class TestTLB(unittest.TestCase):
+    def test_hits_and_misses(self):
+        page_table = PageTable(16)
+        page_table.map(0, 7)
+        tlb = TLB(2)
+        self.assertEqual(tlb.lookup(0, page_table), 7)
+        self.assertEqual(tlb.lookup(0, page_table), 7)
+        self.assertEqual((tlb.hits, tlb.misses), (1, 1))
+
+    def test_least_recently_used_is_evicted(self):
+        page_table = PageTable(16)
+        for page in range(3):
+            page_table.map(page, page)
+        tlb = TLB(2)
+        tlb.lookup(0, page_table)
+        tlb.lookup(1, page_table)
+        tlb.lookup(0, page_table)
+        tlb.lookup(2, page_table)
+        self.assertEqual(list(tlb.entries), [0, 2])
+
+
+class TestPagedSystem(unittest.TestCase):
+    def execute(self, system, *args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', *args)
+        return sorted(system.terminated_queue, key=lambda pcb: pcb.pid)
+
+    def test_same_results_as_contiguous(self):
+        programs = ('programs/metrics/example_1/p1.osx', 0, 'programs/metrics/example_1/p2.osx', 3, 'tests/ops/bl.osx', 5)
+        expected = [(pcb.registers, pcb.end_time) for pcb in self.execute(System(), *programs)]
+        for engine in ('interpreter', 'blocks'):
+            pcbs = self.execute(System(engine=engine, page_size=16), *programs)
+            self.assertEqual([(pcb.registers, pcb.end_time) for pcb in pcbs], expected)
+
+    def test_pages_go_to_any_frame(self):
+        system = System(page_size=16, scheduling_algorithm='RR', quantum=1)
+        first, second = self.execute(system, 'tests/ops/str.osx', 0, 'tests/ops/str.osx', 0)
+        self.assertEqual(dict(first.page_table), {0: 0, 1: 1})
+        self.assertEqual(dict(second.page_table), {0: 2, 1: 3})
+        self.assertEqual(system.memory.read_word(4), 100)
+        self.assertEqual(system.memory.read_word(32 + 4), 100)
+        self.assertGreater(system.scheduler.metrics['tlb_misses'], 0)
+
+    def test_word_across_pages(self):
+        system = System(page_size=16)
+        pcb = PCB(1, 0)
+        pcb.page_table = PageTable(16)
+        pcb.page_table.map(0, 5)
+        pcb.page_table.map(1, 2)
+        cpu = system.CPU
+        cpu._restore(pcb)
+        cpu.write_word(14, 0x04030201)
+        self.assertEqual(system.memory[94:96], bytearray([1, 2]))
+        self.assertEqual(system.memory[32:34], bytearray([3, 4]))
+        self.assertEqual(cpu.read_word(14), 0x04030201)
+        with self.assertRaises(MemoryAccessError):
+            cpu.read_byte(40)
+
+    def test_access_outside_the_image_faults(self):
+        system = System(page_size=16, verify=False) # Rejected at load otherwise
+        self.execute(system, 'programs/test3.osx', 0)
+        self.assertEqual(system.terminated_queue, [])
+        self.assertEqual(system.errors[0]['code'], 110)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import sys
+import os
+import io
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+
+LONG_JOB = 'programs/metrics/example_1/p1.osx'
+SHORT_JOB = 'programs/metrics/example_1/p2.osx'
+
+class TestPreemption(unittest.TestCase):
+    def execute(self, system, *args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', *args)
+        return {pcb.file: pcb for pcb in system.terminated_queue}
+
+    def test_no_preemption_by_default(self):
+        pcbs = self.execute(System(), LONG_JOB, 0, SHORT_JOB, 0)
+        self.assertEqual(pcbs[LONG_JOB].preemptions, 0)
+        self.assertLessEqual(pcbs[LONG_JOB].end_time, pcbs[SHORT_JOB].start_time)
+
+    def test_round_robin(self):
+        system = System(scheduling_algorithm='RR', quantum=5)
+        pcbs = self.execute(system, LONG_JOB, 0, SHORT_JOB, 0)
+
+        self.assertEqual(pcbs[LONG_JOB].preemptions, pcbs[LONG_JOB].execution_time // 5)
+        self.assertLess(pcbs[SHORT_JOB].end_time, pcbs[LONG_JOB].end_time)
+        self.assertEqual(pcbs[SHORT_JOB].start_time, 5)
+
+    def test_engines_agree(self):
+        results = []
+        for engine in ('interpreter', 'blocks'):
+            system = System(engine=engine, quantum=3)
+            pcbs = self.execute(system, LONG_JOB, 0, SHORT_JOB, 1, 'programs/metrics/example_1/p3.osx', 2)
+            results.append([(pcb.end_time, pcb.execution_time, pcb.preemptions) for pcb in pcbs.values()])
+        self.assertEqual(results[0], results[1])
+
+    def test_context_switch_cost(self):
+        reference = System(quantum=5)
+        self.execute(reference, LONG_JOB, 0, SHORT_JOB, 0)
+        system = System(quantum=5, context_switch_cost=2)
+        self.execute(system, LONG_JOB, 0, SHORT_JOB, 0)
+
+        switches = system.CPU.context_switches
+        self.assertEqual(switches, reference.CPU.context_switches)
+        self.assertEqual(system.CPU.context_switch_time, 2 * switches)
+        self.assertEqual(system.clock.time, reference.clock.time + 2 * switches)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import sys
+import os
+import io
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+
+class TestRelocation(unittest.TestCase):
+    def execute(self, system, *args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', *args)
+        return sorted(system.terminated_queue, key=lambda pcb: pcb.pid)
+
+    def test_programs_for_the_same_address_share_memory(self):
+        # Both programs are compiled for address 0, a round robin keeps both resident
+        system = System(scheduling_algorithm='RR', quantum=1)
+        first, second = self.execute(system, 'tests/ops/ldr.osx', 0, 'tests/ops/ldr.osx', 0)
+
+        self.assertEqual(first.base, 0)
+        self.assertNotEqual(second.base, 0)
+        self.assertEqual(second.relocation(), second.base)
+        self.assertEqual(first.registers[0], 300)
+        self.assertEqual(second.registers[0], 300)
+        self.assertEqual(second.start_time, 1)
+
+    def test_stores_are_relocated(self):
+        for engine in ('interpreter', 'blocks'):
+            system = System(engine=engine, scheduling_algorithm='RR', quantum=1)
+            first, second = self.execute(system, 'tests/ops/str.osx', 0, 'tests/ops/str.osx', 0)
+            # TARGET is the second word of the image
+            self.assertEqual(system.memory.read_word(first.base + 4), 100)
+            self.assertEqual(system.memory.read_word(second.base + 4), 100)
+
+    def test_loader_address_is_preferred(self):
+        system = System()
+        pcbs = self.execute(system, 'programs/metrics/example_1/p2.osx', 0, 'programs/metrics/example_1/p3.osx', 0)
+        self.assertEqual([pcb.base for pcb in pcbs], [200, 300])
+
+    def test_terminated_memory_is_reused(self):
+        system = System()
+        first, second = self.execute(system, 'tests/ops/ldr.osx', 0, 'tests/ops/ldr.osx', 10)
+        self.assertEqual(first.base, 0)
+        self.assertEqual(second.base, 0)
+        self.assertEqual(len(system.memory_manager.memory_map), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -16,7 +16,20 @@ class TestLoadFunction(unittest.TestCase):
         self.system.run_program(self.file)
 
         self.assertEqual(self.system.CPU.registers[0], 300)
+        self.assertEqual(len(self.system.job_queue), 0)
 
+    def test_run_from_ready_queue(self):
+        pcb = self.system.job_queue.pop()
+        self.system.ready_queue.enqueue(pcb)
+        self.system.run_program(self.file)
+
+        self.assertEqual(len(self.system.ready_queue), 0)
+        self.assertEqual(self.system.terminated_queue, [pcb])
+
+    def test_run_unknown_program(self):
+        self.assertIsNone(self.system.run_program('tests/ops/sub.osx'))
+        self.assertEqual(self.system.errors[-1]['code'], 101)
+        self.assertEqual(len(self.system.job_queue), 1)
 
 
 
@@ -0,0 +1,77 @@
+import unittest
+import sys
+import os
+import io
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.system = System()
+        self.file1 = os.path.join(os.path.dirname(__file__), 'programs/load_test_1.osx')
+        self.file2 = os.path.join(os.path.dirname(__file__), 'programs/load_test_2.osx')
+        return super().setUp()
+
+    def execute(self, *args):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.system.call('execute', *args)
+        return output.getvalue()
+
+    def test_fast_forward_to_arrival(self):
+        output = self.execute(self.file1, 5000)
+
+        pcb = self.system.terminated_queue[0]
+        self.assertEqual(pcb.start_time, 5000)
+        self.assertEqual(pcb.waiting_time, 0)
+        self.assertEqual(self.system.scheduler.idle_time, 5000)
+        self.assertLess(output.count('Clock:'), 10)
+
+    def test_idle_between_arrivals(self):
+        self.execute(self.file1, 0, self.file2, 1000)
+
+        pcb1, pcb2 = self.system.terminated_queue
+        self.assertEqual(pcb2.start_time, 1000)
+        self.assertEqual(self.system.scheduler.idle_time, 1000 - pcb1.end_time)
+
+    def test_jobs_out_of_arrival_order(self):
+        self.execute(self.file1, 50, self.file2, 0)
+
+        pcb1 = next(pcb for pcb in self.system.terminated_queue if pcb.file == self.file1)
+        pcb2 = next(pcb for pcb in self.system.terminated_queue if pcb.file == self.file2)
+        self.assertEqual(pcb2.start_time, 0)
+        self.assertEqual(pcb1.start_time, 50)
+
+    def test_jobs_wait_for_memory_to_be_freed(self):
+        system = System(memory_size='64B') # Room for one 46 byte image at a time
+        with contextlib.redirect_stdout(io.StringIO()):
+            program_info = system.memory_manager.prepare_program('programs/IO.osx')
+            first, second = system.create_pcb(program_info, 0), system.create_pcb(program_info, 0)
+            system.job_queue.push(first)
+            system.job_queue.push(second)
+
+            scheduler = system.scheduler
+            scheduler.check_new_jobs()
+            self.assertEqual(list(system.ready_queue), [first])
+            self.assertEqual(scheduler.waiting, [second])
+            self.assertEqual(len(system.job_queue), 0)
+            self.assertIsNone(scheduler.next_event_time())
+
+            system.ready_queue.dequeue()
+            first.terminated(0)
+            scheduler.handle_process_state(first)
+            scheduler.check_new_jobs()
+            self.assertEqual(list(system.ready_queue), [second])
+            self.assertEqual(scheduler.waiting, [])
+
+    def test_waiting_job_runs_once_memory_is_freed(self):
+        system = System(memory_size='64B')
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', 'programs/IO.osx', 0, 'programs/IO.osx', 0)
+        first, second = system.terminated_queue
+        self.assertGreaterEqual(second.start_time, first.end_time)
+        self.assertEqual(system.scheduler.waiting, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
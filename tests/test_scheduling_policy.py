@@ -0,0 +1,140 @@
+import unittest
+import sys
+import os
+import io
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+from System.PCB import PCB
+from System.SchedulingPolicy import FCFSPolicy, ShortestJobFirstPolicy, PriorityPolicy, MultilevelFeedbackQueuePolicy
+from constants import PCBState
+
+LONG_JOB = 'programs/metrics/example_1/p1.osx'
+SHORT_JOB = 'programs/metrics/example_1/p2.osx'
+
+class TestSchedulingPolicy(unittest.TestCase):
+    def make_pcbs(self):
+        pcbs = []
+        for pid, (size, priority) in enumerate([(60, 2), (12, 1), (30, 3)]):
+            pcb = PCB(pid, 0)
+            pcb.code_start, pcb.code_end = 0, size - 1
+            pcb.priority = priority
+            pcbs.append(pcb)
+        return pcbs
+
+    def drain(self, policy):
+        for pcb in self.make_pcbs():
+            policy.enqueue(pcb)
+        return [policy.dequeue().pid for _ in range(len(policy))]
+
+    def test_fcfs(self):
+        self.assertEqual(self.drain(FCFSPolicy()), [0, 1, 2])
+
+    def test_sjf(self):
+        self.assertEqual(self.drain(ShortestJobFirstPolicy()), [1, 2, 0])
+
+    def test_priority(self):
+        self.assertEqual(self.drain(PriorityPolicy()), [1, 0, 2])
+
+    def test_remove(self):
+        for policy in (FCFSPolicy(), ShortestJobFirstPolicy(), PriorityPolicy(), MultilevelFeedbackQueuePolicy()):
+            pcbs = self.make_pcbs()
+            for pcb in pcbs:
+                policy.enqueue(pcb)
+            policy.remove(pcbs[1])
+            self.assertEqual(sorted(pcb.pid for pcb in policy), [0, 2], policy.name)
+            with self.assertRaises(ValueError):
+                policy.remove(pcbs[1])
+
+    def test_sjf_estimate(self):
+        policy = ShortestJobFirstPolicy(alpha=0.5)
+        pcb = self.make_pcbs()[0]
+        policy.enqueue(pcb)
+        policy.update(policy.dequeue(), 2, 0)
+        self.assertEqual(pcb.burst_estimate, 6)
+
+    def test_mlfq_demotes_and_promotes(self):
+        policy = MultilevelFeedbackQueuePolicy(quanta=(2, 4, 8))
+        hog, io_bound = self.make_pcbs()[:2]
+        for pcb in (hog, io_bound):
+            pcb.arrival_time = 0
+            policy.enqueue(pcb)
+
+        pcb = policy.dequeue()
+        pcb.state = PCBState.READY # used its whole quantum
+        policy.update(pcb, 2, 2)
+        policy.enqueue(pcb)
+        self.assertEqual(hog.level, 1)
+        self.assertEqual(policy.time_quantum(hog), 4)
+        self.assertIs(policy.dequeue(), io_bound)
+
+        io_bound.level = 2
+        io_bound.state = PCBState.WAITING
+        policy.update(io_bound, 1, 5)
+        self.assertEqual(io_bound.level, 1)
+        self.assertEqual(hog.level_history, [(0, 0), (2, 1)])
+        self.assertEqual(hog.level_time, {0: 2})
+
+    def test_mlfq_aging(self):
+        policy = MultilevelFeedbackQueuePolicy(quanta=(2, 4), aging_interval=100)
+        pcb = self.make_pcbs()[0]
+        pcb.arrival_time = 0
+        pcb.level = 1
+        policy.enqueue(pcb)
+
+        policy.age(50)
+        self.assertEqual(pcb.level, 1)
+        policy.age(100)
+        self.assertEqual(pcb.level, 0)
+        self.assertIs(policy.peek(), pcb)
+
+
+class TestSchedulingAlgorithm(unittest.TestCase):
+    def execute(self, system, *args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', *args)
+        return {pcb.file: pcb for pcb in system.terminated_queue}
+
+    def test_fcfs_runs_in_arrival_order(self):
+        pcbs = self.execute(System(), LONG_JOB, 0, SHORT_JOB, 0)
+        self.assertLess(pcbs[LONG_JOB].start_time, pcbs[SHORT_JOB].start_time)
+
+    def test_sjf_runs_short_job_first(self):
+        pcbs = self.execute(System(scheduling_algorithm='SJF'), LONG_JOB, 0, SHORT_JOB, 0)
+        self.assertLess(pcbs[SHORT_JOB].start_time, pcbs[LONG_JOB].start_time)
+
+    def test_algorithm_from_execute(self):
+        system = System()
+        pcbs = self.execute(system, '-a', 'SJF', LONG_JOB, 0, SHORT_JOB, 0)
+        self.assertEqual(system.scheduler.scheduling_algorithm, 'SJF')
+        self.assertLess(pcbs[SHORT_JOB].start_time, pcbs[LONG_JOB].start_time)
+
+    def test_priority_from_execute(self):
+        pcbs = self.execute(System(), '-a', 'Priority', '-p', '2,1', LONG_JOB, 0, SHORT_JOB, 0)
+        self.assertEqual((pcbs[LONG_JOB].priority, pcbs[SHORT_JOB].priority), (2, 1))
+        self.assertLess(pcbs[SHORT_JOB].start_time, pcbs[LONG_JOB].start_time)
+
+        pcbs = self.execute(System(), '-a', 'Priority', '-p', '1,2', LONG_JOB, 0, SHORT_JOB, 0)
+        self.assertLess(pcbs[LONG_JOB].start_time, pcbs[SHORT_JOB].start_time)
+
+    def test_invalid_priority(self):
+        system = System()
+        self.execute(system, '-p', 'high', LONG_JOB, 0)
+        self.assertEqual(system.errors[-1]['code'], 103)
+        self.assertEqual(len(system.job_queue), 0)
+
+    def test_mlfq_moves_cpu_bound_job_down(self):
+        pcbs = self.execute(System(scheduling_algorithm='MLFQ'), LONG_JOB, 0, SHORT_JOB, 0)
+        self.assertEqual(pcbs[LONG_JOB].level, 2)
+        self.assertEqual([level for _, level in pcbs[LONG_JOB].level_history], [0, 1, 2])
+        self.assertEqual(pcbs[SHORT_JOB].level, 0)
+
+    def test_unknown_algorithm(self):
+        system = System()
+        self.execute(system, '-a', 'LIFO', LONG_JOB, 0)
+        self.assertEqual(system.errors[-1]['code'], 103)
+        self.assertEqual(len(system.job_queue), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
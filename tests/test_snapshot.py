@@ -0,0 +1,117 @@
+import unittest
+import sys
+import os
+import io
+import pickle
+import random
+import tempfile
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+from System.Snapshot import Snapshot
+from System.EventQueue import EventQueue
+from System.Sweep import Sweep, run_configuration
+from System.PCB import PCB
+
+PROGRAMS = ['programs/IO.osx', '0', 'tests/ops/eor.osx', '3', 'programs/IO.osx', '5', 'programs/fork.osx', '8']
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'snapshot.bin')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_with_snapshots(self, **options):
+        random.seed(3)
+        system = System(memory_size='4K', snapshot_interval=20, snapshot_file=self.path, **options)
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', *PROGRAMS)
+        return system
+
+    def test_resume_matches_uninterrupted_run(self):
+        for options in ({}, {'engine': 'blocks', 'scheduling_algorithm': 'RR'}, {'page_size': 16, 'demand_paging': True}, {'cores': 2}):
+            with self.subTest(**options):
+                system = self.run_with_snapshots(**options)
+                random.seed(99) # The snapshot brings its own random state
+                restored = System.load_snapshot(self.path)
+                self.assertGreater(restored.clock.time, 0)
+                self.assertLess(len(restored.terminated_queue), len(system.terminated_queue))
+                with contextlib.redirect_stdout(io.StringIO()):
+                    restored.call('resume')
+                self.assertEqual(restored.scheduler.metrics, system.scheduler.metrics)
+                self.assertEqual(bytes(restored.memory[0:4096]), bytes(system.memory[0:4096]))
+                self.assertEqual([pcb.pid for pcb in restored.terminated_queue], [pcb.pid for pcb in system.terminated_queue])
+
+    def test_restore_command(self):
+        system = System(memory_size='4K')
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', 'tests/ops/str.osx', 0)
+            system.call('snapshot', self.path)
+            system.call('execute', 'tests/ops/str.osx', 10)
+            system.call('restore', self.path)
+        self.assertEqual(system.pid, 1)
+        self.assertEqual(len(system.terminated_queue), 1)
+        self.assertEqual(system.memory.read_word(4), 100)
+        self.assertEqual(system.memory.backend, 'mmap')
+        system.memory.write_word(4, 7) # Mapped copy-on-write, the snapshot is left as it was
+        self.assertEqual(System.load_snapshot(self.path).memory.read_word(4), 100)
+
+    def test_memory_is_a_raw_block(self):
+        system = System(memory_size='64K')
+        system.memory.write_word(1000, 0xDEADBEEF)
+        system.snapshot(self.path)
+        with open(self.path, 'rb') as f:
+            header = Snapshot.HEADER.unpack(f.read(Snapshot.HEADER.size))
+            f.seek(header[4] + 1000)
+            self.assertEqual(f.read(4), (0xDEADBEEF).to_bytes(4, 'little'))
+        self.assertEqual(header[5], 64 * 1024)
+        self.assertEqual(os.path.getsize(self.path), header[4] + 64 * 1024)
+
+    def test_sparse_memory(self):
+        system = System(memory_size='2G')
+        system.memory.write_word(1024 * 1024 * 1024, 5)
+        system.snapshot(self.path)
+        self.assertLess(os.path.getsize(self.path), 1024 * 1024)
+        restored = System.load_snapshot(self.path)
+        self.assertEqual(restored.memory.backend, 'sparse')
+        self.assertEqual(restored.memory.read_word(1024 * 1024 * 1024), 5)
+
+    def test_not_a_snapshot(self):
+        with open(self.path, 'wb') as f:
+            f.write(bytes(64))
+        with self.assertRaises(ValueError):
+            Snapshot.load(self.path)
+        system = System()
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('restore', self.path)
+        self.assertEqual(system.errors[-1]['code'], 100)
+
+    def test_event_queue_keeps_order(self):
+        queue = EventQueue('arrival_time')
+        for pid in (1, 2):
+            pcb = PCB(pid, 0)
+            pcb.arrival_time = 5
+            queue.push(pcb)
+        queue = pickle.loads(pickle.dumps(queue))
+        pcb = PCB(3, 0)
+        pcb.arrival_time = 5
+        queue.push(pcb)
+        self.assertEqual([pcb.pid for pcb in queue.pop_due(5)], [1, 2, 3])
+
+    def test_warm_started_sweep(self):
+        system = System(memory_size='4K')
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', 'tests/ops/str.osx', 0)
+        system.snapshot(self.path)
+
+        result = run_configuration(PROGRAMS[:4], {'scheduling_algorithm': 'RR', 'quantum': 2, 'seed': 1}, self.path)
+        self.assertEqual(result['jobs'], 3)
+        self.assertEqual(result['algorithm'], 'RR')
+        with self.assertRaises(ValueError):
+            Sweep({'snapshot': self.path, 'grid': {'cores': [1, 2]}})
+
+
+if __name__ == "__main__":
+    unittest.main()
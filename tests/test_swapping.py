@@ -0,0 +1,93 @@
+import unittest
+import sys
+import os
+import io
+import random
+import tempfile
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+from System.Swapper import Swapper
+
+# Three I/O bound jobs of 46 bytes each, memory holds one of them at a time
+JOBS = ('programs/IO.osx', 0, 'programs/IO.osx', 0, 'programs/IO.osx', 0)
+
+class TestSwapping(unittest.TestCase):
+    def execute(self, system, *args):
+        random.seed(1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', *args)
+        return sorted(system.terminated_queue, key=lambda pcb: pcb.pid)
+
+    def test_blocked_jobs_are_swapped_out(self):
+        reference = System(memory_size='64B')
+        expected = self.execute(reference, *JOBS)
+        for options in ({}, {'engine': 'blocks'}, {'page_size': 16}, {'cores': 2}):
+            system = System(memory_size='64B', swapping=True, **options)
+            pcbs = self.execute(system, *JOBS)
+            self.assertEqual([pcb.registers[0] for pcb in pcbs], [pcb.registers[0] for pcb in expected])
+            metrics = system.scheduler.metrics
+            self.assertGreater(metrics['swap_outs'], 0)
+            self.assertEqual(metrics['swap_ins'], metrics['swap_outs'])
+            self.assertEqual(metrics['swap_bytes_out'], 46 * metrics['swap_outs'])
+            self.assertLess(metrics['elapsed'], reference.scheduler.metrics['elapsed'])
+
+    def test_swap_out_and_in(self):
+        system = System(memory_size='64B', swapping=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('load', 'programs/IO.osx')
+            pcb = system.job_queue[0]
+            system.memory_manager.load_to_memory(pcb)
+        image = system.memory_manager.read_image(pcb)
+        swapper = system.swapper
+
+        self.assertTrue(swapper.swap_out(pcb))
+        self.assertTrue(swapper.is_swapped(pcb))
+        self.assertIsNone(pcb.base)
+        self.assertEqual(system.memory_manager.free_list.free_space(), 64)
+
+        self.assertTrue(swapper.swap_in(pcb))
+        self.assertFalse(swapper.is_swapped(pcb))
+        self.assertEqual(system.memory_manager.read_image(pcb), image)
+        self.assertEqual(swapper.free_list.free_space(), swapper.size)
+
+    def test_nothing_is_swapped_out_for_a_job_that_would_not_fit(self):
+        for options in ({}, {'page_size': 16}):
+            system = System(memory_size='64B', swapping=True, **options)
+            with contextlib.redirect_stdout(io.StringIO()):
+                program_info = system.memory_manager.prepare_program('programs/IO.osx')
+                blocked, job = system.create_pcb(program_info, 0), system.create_pcb(program_info, 0)
+                system.memory_manager.load_to_memory(blocked)
+            job.byte_size = 70 # More than all of memory
+            blocked.waiting()
+            blocked.wait_until = 10
+            system.io_queue.push(blocked)
+
+            self.assertEqual(system.swapper.candidates(), [blocked])
+            self.assertFalse(system.swapper.make_room(job))
+            self.assertEqual(system.swapper.swap_outs, 0)
+            self.assertFalse(system.swapper.is_swapped(blocked))
+
+    def test_swap_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'swap')
+            system = System(memory_size='64B', swapping=True, swap_file=path, swap_size=128)
+            self.execute(system, *JOBS)
+            system.swapper.close()
+            self.assertEqual(os.path.getsize(path), 128)
+
+    def test_victim_policy(self):
+        chosen = []
+        def first(candidates, pcb):
+            chosen.append(candidates[0])
+            return candidates[0]
+        system = System(memory_size='64B', swapping=True, swap_policy=first)
+        self.execute(system, *JOBS)
+        self.assertEqual(len(chosen), system.swapper.swap_outs)
+
+        with self.assertRaises(ValueError):
+            System(swapping=True, swap_policy='random')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.Sweep import Sweep, run_configuration
+
+PROGRAMS = ['programs/metrics/example_1/p1.osx', 0, 'programs/metrics/example_1/p2.osx', 2]
+
+class TestSweep(unittest.TestCase):
+    def test_configurations(self):
+        sweep = Sweep({'programs': PROGRAMS, 'grid': {'scheduling_algorithm': ['FCFS', 'RR', 'SJF'], 'quantum': [None, 5]}})
+        configurations = sweep.configurations()
+        self.assertEqual(len(configurations), 6)
+        self.assertIn({'scheduling_algorithm': 'RR', 'quantum': 5}, configurations)
+
+    def test_run_configuration(self):
+        result = run_configuration([str(arg) for arg in PROGRAMS], {'scheduling_algorithm': 'RR', 'quantum': 5, 'seed': 1})
+        self.assertEqual(result['jobs'], 2)
+        self.assertEqual(result['scheduling_algorithm'], 'RR')
+        self.assertIn('average_turnaround_time', result)
+        self.assertIn('average_response_time', result)
+
+    def test_missing_program(self):
+        result = run_configuration(['programs/missing.osx', '0'], {})
+        self.assertIn('error', result)
+
+    def test_run_in_pool(self):
+        sweep = Sweep({'programs': PROGRAMS, 'grid': {'quantum': [None, 3], 'cores': [1, 2]}})
+        results = sweep.run(workers=2)
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(result['jobs'] == 2 for result in results))
+        self.assertEqual([result['quantum'] for result in results], [None, None, 3, 3])
+
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, 'results.json')
+            sweep.save(filepath)
+            with open(filepath) as file:
+                self.assertEqual(json.load(file), results)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import sys
+import os
+import io
+import struct
+import tempfile
+import contextlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from System.System import System
+from System.ImageCache import ImageCache
+from System.Verifier import Verifier
+
+MVI, ADD, B, BEQ, BX, SWI = 22, 16, 7, 11, 6, 20
+
+def instruction(opcode, *operands):
+    if opcode in (B, BEQ):
+        return struct.pack('<BI', opcode, operands[0]) + bytes(1)
+    if opcode == MVI:
+        return struct.pack('<BBI', opcode, operands[0], operands[1])
+    return bytes([opcode, *operands]).ljust(6, b'\x00')
+
+class TestVerifier(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def image(self, *instructions, loader=0):
+        path = os.path.join(self.directory.name, f"program{len(os.listdir(self.directory.name))}.osx")
+        code = b''.join(instructions)
+        with open(path, 'wb') as f:
+            f.write(struct.pack('III', len(code), 0, loader) + code)
+        return path
+
+    def problems(self, *instructions, loader=0):
+        return [code for code, _ in Verifier().verify(ImageCache().get(self.image(*instructions, loader=loader)))]
+
+    def warnings(self, *instructions, loader=0):
+        image = ImageCache().get(self.image(*instructions, loader=loader))
+        self.assertEqual(Verifier().verify(image), [])
+        return [code for code, _ in Verifier().warnings(image)]
+
+    def test_valid_program(self):
+        self.assertEqual(self.problems(instruction(MVI, 0, 1), instruction(B, 12), instruction(SWI, 1)), [])
+        self.assertEqual(self.problems(instruction(B, 12), instruction(SWI, 1)), []) # Just past the last instruction
+
+    def test_shipped_programs(self):
+        for path in ('programs/fork.osx', 'programs/child.osx', 'tests/ops/bl.osx', 'tests/ops/bne.osx', 'tests/ops/bx.osx'):
+            self.assertEqual(Verifier().verify(ImageCache().get(path)), [], path)
+
+    def test_unknown_opcode(self):
+        self.assertEqual(self.problems(instruction(MVI, 0, 1), bytes([99, 0, 0, 0, 0, 0])), [103])
+
+    def test_invalid_register(self):
+        self.assertEqual(self.problems(instruction(ADD, 0, 1, 12), instruction(BX, 20), instruction(SWI, 30)), [108, 108])
+
+    def test_branch_targets(self):
+        self.assertEqual(self.problems(instruction(B, 60), instruction(SWI, 1)), [110])
+        self.assertEqual(self.problems(instruction(B, 4), instruction(SWI, 1)), [105])
+        # BEQ is relative to the loader, the other branches are not
+        self.assertEqual(self.warnings(instruction(BEQ, 6), instruction(SWI, 1), loader=100), [])
+        self.assertEqual(self.problems(instruction(B, 6), instruction(SWI, 1), loader=100), [110])
+        # Branches the program never reaches are only warnings
+        self.assertEqual(self.warnings(instruction(SWI, 1), instruction(B, 60), instruction(B, 4)), [110, 105])
+
+    def test_unreached_code_is_a_warning(self):
+        data = bytes([99, 0, 0, 0, 0, 0])
+        self.assertEqual(self.warnings(instruction(MVI, 0, 1), instruction(SWI, 1), data), [103])
+        self.assertEqual(self.warnings(instruction(B, 12), data, instruction(SWI, 1)), [103])
+        self.assertEqual(self.problems(instruction(MVI, 0, 1), instruction(B, 18), instruction(SWI, 1), data), [103])
+
+    def test_programs_with_bad_branches_are_rejected(self):
+        for path in ('cpubound2.osx', 'iobound.osx', 'programs/newIoBound.osx', 'programs/test2.osx', 'programs/test3.osx'):
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertIsNone(System().memory_manager.prepare_program(path), path)
+                self.assertIsNotNone(System(verify=False).memory_manager.prepare_program(path), path)
+
+    def test_checked_once(self):
+        image = ImageCache().get(self.image(instruction(B, 60)))
+        problems = Verifier().verify(image)
+        self.assertIs(Verifier().verify(image), problems)
+
+    def test_problems_are_kept_in_the_cache_file(self):
+        path = self.image(instruction(ADD, 0, 1, 12), instruction(B, 60), instruction(SWI, 1))
+        image = ImageCache(files=True).get(path)
+        self.assertIsNone(image.decoded.problems)
+        problems = Verifier().verify(image)
+        self.assertEqual([code for code, _ in problems], [108, 110])
+
+        image = ImageCache(files=True).get(path)
+        self.assertEqual(image.decoded.problems, [(108, True, 0), (110, True, 6)])
+        self.assertEqual(Verifier().verify(image), problems)
+        self.assertEqual(Verifier().warnings(image), [])
+
+    def test_rejected_at_load(self):
+        path = self.image(instruction(MVI, 0, 1), instruction(ADD, 0, 1, 13), instruction(SWI, 1))
+        system = System()
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.call('execute', path, 0)
+        self.assertEqual(system.errors[-1]['code'], 108)
+        self.assertEqual(system.pid, 0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertIsNotNone(System(verify=False).memory_manager.prepare_program(path))
+
+    def test_runs_off_the_end_of_memory(self):
+        path = self.image(instruction(MVI, 0, 2000), instruction(BX, 0))
+        for options in ({'engine': 'interpreter'}, {'engine': 'blocks'}, {'cores': 2}):
+            system = System(**options)
+            with contextlib.redirect_stdout(io.StringIO()):
+                system.call('execute', path, 0)
+            self.assertEqual(system.errors[0]['code'], 110)
+
+
+if __name__ == "__main__":
+    unittest.main()